@@ -7,12 +7,15 @@ sys.path.insert(0, parent_dir)
 
 # NOW import the protobuf files
 import auth_pb2, auth_pb2_grpc
+from ttl_cache import TTLCache
 
-import io
+import hashlib
+import threading
+import time
 from datetime import timedelta
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    send_file, flash, make_response
+    flash, make_response, jsonify, Response
 )
 from flask import session as flask_session
 import grpc
@@ -41,6 +44,53 @@ def add_security_headers(resp):
 channel = grpc.insecure_channel("localhost:50051")
 stub = auth_pb2_grpc.AuthServiceStub(channel)
 
+# Request bodies are relayed to gRPC in pieces of this size, never buffered whole
+RELAY_PIECE_SIZE = 1024 * 1024
+
+# Read-only RPC responses per user (quota, file pages, analytics). Every route
+# that changes a user's files invalidates that user's entries; with
+# VIEW_CACHE_WATCH=1 changes made through other front-ends are pushed in too
+# (the auth server must share WATCH_TOKEN with us).
+view_cache = TTLCache(ttl=float(os.environ.get("VIEW_CACHE_TTL", "30")))
+
+def cached_rpc(email, name, rpc_request):
+    """Call a read-only AuthService RPC through view_cache."""
+    key = (name, rpc_request.SerializeToString(deterministic=True))
+    response = view_cache.get(email, key)
+    if response is None:
+        generation = view_cache.generation(email)
+        response = getattr(stub, name)(rpc_request)
+        if getattr(response, "success", True):
+            view_cache.set(email, key, response, generation)
+    return response
+
+def watch_changes():
+    """Follow AuthService.WatchChanges, invalidating cached views; reconnects forever."""
+    metadata = (("x-watch-token", os.environ.get("WATCH_TOKEN", "")),)
+    while True:
+        try:
+            for event in stub.WatchChanges(auth_pb2.WatchRequest(), metadata=metadata):
+                if event.email:
+                    view_cache.invalidate(event.email)
+                else:
+                    view_cache.clear()
+        except grpc.RpcError as e:
+            app.logger.warning("WatchChanges disconnected: %s", e.code())
+        # Changes may be missed while disconnected
+        view_cache.clear()
+        time.sleep(5)
+
+if os.environ.get("VIEW_CACHE_WATCH") == "1":
+    threading.Thread(target=watch_changes, name="view-cache-watch", daemon=True).start()
+
+# Files shown per dashboard page, and the ?sort= values the dashboard accepts
+DASHBOARD_PAGE_SIZE = 60
+FILE_SORTS = {
+    "name": auth_pb2.SORT_NAME,
+    "size": auth_pb2.SORT_SIZE,
+    "created": auth_pb2.SORT_CREATED_AT,
+}
+
 # ---------- Utility guards ----------
 def require_auth():
     email = flask_session.get("email")
@@ -52,6 +102,21 @@ def require_auth():
 def safe_redirect_to_dashboard():
     return redirect(url_for("dashboard", email=flask_session.get("email")))
 
+def require_auth_json():
+    if not flask_session.get("email"):
+        return jsonify(success=False, message="Please log in first."), 401
+    return None
+
+def session_json(response):
+    return jsonify(
+        success=response.success,
+        message=response.message,
+        session_id=response.session_id,
+        chunk_size=response.chunk_size,
+        total_chunks=response.total_chunks,
+        missing_chunks=list(response.missing_chunks)
+    )
+
 # ---------- Routes ----------
 @app.route("/")
 def home():
@@ -121,22 +186,37 @@ def dashboard():
 
     email = flask_session.get("email")
 
-    # Fetch file list
+    sort = request.args.get("sort", "name")
+    if sort not in FILE_SORTS:
+        sort = "name"
+    order = "desc" if request.args.get("order") == "desc" else "asc"
+    prefix = request.args.get("q", "")
+    cursor = request.args.get("cursor", "")
+
+    # Quota, totals and one page of files in a single round trip
     try:
-        response = stub.ListFiles(auth_pb2.ListFilesRequest(email=email))
+        response = cached_rpc(email, "GetDashboard", auth_pb2.DashboardRequest(
+            email=email,
+            page=auth_pb2.ListFilesRequest(
+                email=email,
+                page_size=DASHBOARD_PAGE_SIZE,
+                cursor=cursor,
+                sort_by=FILE_SORTS[sort],
+                descending=order == "desc",
+                name_prefix=prefix
+            )
+        ))
     except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return redirect(url_for("dashboard", sort=sort, order=order, q=prefix or None))
         return f"Failed to list files: {e.details()}", 502
 
-    file_list = list(response.files) if response and response.files else []
+    if not response.success:
+        return f"Failed to list files: {response.message}", 502
 
-    # Fetch quota
-    try:
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
-        used_bytes = quota.used_bytes
-        total_bytes = quota.total_bytes
-    except grpc.RpcError:
-        used_bytes = 0
-        total_bytes = 5 * 1024 * 1024 * 1024
+    file_list = list(response.page.files)
+    used_bytes = response.used_bytes
+    total_bytes = response.quota_bytes
 
     percent_used = int((used_bytes / total_bytes) * 100) if total_bytes else 0
 
@@ -144,6 +224,12 @@ def dashboard():
         "dashboard.html",
         email=email,
         files=file_list,
+        total_files=response.total_files,
+        next_cursor=response.page.next_cursor,
+        first_page=not cursor,
+        sort=sort,
+        order=order,
+        q=prefix,
         used=used_bytes,
         total=total_bytes,
         percent=percent_used
@@ -161,20 +247,35 @@ def upload():
         return safe_redirect_to_dashboard()
 
     filename = file.filename
-    content = file.read()
-    if len(content) == 0:
+    digest, size = hashlib.sha256(), 0
+    for piece in iter(lambda: file.stream.read(RELAY_PIECE_SIZE), b""):
+        digest.update(piece)
+        size += len(piece)
+    if size == 0:
         flash("The selected file is empty.", "warning")
         return safe_redirect_to_dashboard()
+    file.stream.seek(0)
+
+    def relay(stream):
+        yield auth_pb2.FileChunkRequest(email=email, filename=filename, total_size=size)
+        for piece in iter(lambda: stream.read(RELAY_PIECE_SIZE), b""):
+            yield auth_pb2.FileChunkRequest(data=piece)
 
     try:
-        response = stub.UploadFile(auth_pb2.FileUploadRequest(
-            email=email,
-            filename=filename,
-            content=content
-        ))
+        try:
+            # Content the server already stores is not sent again
+            response = stub.UploadByHash(auth_pb2.HashUploadRequest(
+                email=email, filename=filename, sha256=digest.hexdigest(), size=size
+            ))
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                raise
+            response = stub.UploadFileStream(relay(file.stream))
     except grpc.RpcError as e:
         flash(f"Upload failed: {e.details()}", "danger")
         return safe_redirect_to_dashboard()
+    finally:
+        view_cache.invalidate(email)
 
     if getattr(response, "success", False):
         flash(f"Uploaded {filename}", "success")
@@ -183,6 +284,101 @@ def upload():
 
     return safe_redirect_to_dashboard()
 
+# ---------- Chunked uploads (driven by the dashboard JS) ----------
+@app.route("/upload/session", methods=["POST"])
+def create_upload_session():
+    if require_auth_json():
+        return require_auth_json()
+    email = flask_session.get("email")
+
+    body = request.get_json(silent=True) or {}
+    filename = os.path.basename(str(body.get("filename", "")))
+    size = body.get("size")
+    if not filename or not isinstance(size, int):
+        return jsonify(success=False, message="Missing filename or size"), 400
+
+    try:
+        response = stub.CreateUploadSession(auth_pb2.CreateUploadSessionRequest(
+            email=email,
+            filename=filename,
+            total_size=size,
+            chunk_size=int(body.get("chunk_size") or 0)
+        ))
+    except grpc.RpcError as e:
+        return jsonify(success=False, message=e.details()), 502
+
+    if response.success:
+        # The session's reservation counts against the quota the dashboard shows
+        view_cache.invalidate(email)
+    return session_json(response), (200 if response.success else 400)
+
+@app.route("/upload/session/<int:session_id>", methods=["GET"])
+def upload_session_status(session_id):
+    if require_auth_json():
+        return require_auth_json()
+    email = flask_session.get("email")
+
+    try:
+        response = stub.GetUploadStatus(auth_pb2.UploadSessionRequest(
+            email=email, session_id=session_id
+        ))
+    except grpc.RpcError as e:
+        return jsonify(success=False, message=e.details()), 502
+
+    return session_json(response), (200 if response.success else 404)
+
+@app.route("/upload/session/<int:session_id>/chunk/<int:index>", methods=["PUT"])
+def upload_chunk(session_id, index):
+    if require_auth_json():
+        return require_auth_json()
+    email = flask_session.get("email")
+    # gRPC drains the iterator on its own thread, outside the request context.
+    body = request.stream
+
+    def relay():
+        # First message carries the addressing; the body follows piece by piece.
+        yield auth_pb2.ChunkDataRequest(email=email, session_id=session_id, chunk_index=index)
+        while True:
+            piece = body.read(RELAY_PIECE_SIZE)
+            if not piece:
+                break
+            yield auth_pb2.ChunkDataRequest(data=piece)
+
+    try:
+        response = stub.PutChunk(relay())
+    except grpc.RpcError as e:
+        return jsonify(success=False, message=e.details()), 502
+
+    return (jsonify(success=response.success, message=response.message, checksum=response.checksum),
+            200 if response.success else 400)
+
+@app.route("/upload/session/<int:session_id>/commit", methods=["POST"])
+def commit_upload(session_id):
+    if require_auth_json():
+        return require_auth_json()
+    email = flask_session.get("email")
+
+    try:
+        response = stub.CommitUpload(auth_pb2.UploadSessionRequest(
+            email=email, session_id=session_id
+        ))
+    except grpc.RpcError as e:
+        return jsonify(success=False, message=e.details()), 502
+    finally:
+        view_cache.invalidate(email)
+
+    if response.success:
+        flash("Upload complete", "success")
+    return (jsonify(success=response.success, message=response.message, checksum=response.checksum),
+            200 if response.success else 400)
+
+def open_download(email, filename, offset=0, length=0):
+    """Start a DownloadFileStream call; returns (first chunk, call)."""
+    call = stub.DownloadFileStream(auth_pb2.FileRangeRequest(
+        email=email, filename=filename, offset=offset, length=length
+    ))
+    return next(call), call
+
 @app.route("/download/<path:filename>", methods=["GET"])
 def download(filename):
     if require_auth():
@@ -193,24 +389,65 @@ def download(filename):
     # 🔧 Normalize filename
     filename = os.path.basename(filename)
 
+    # Only single ranges are served partially; anything else gets the whole file.
+    byte_range = request.range
+    if byte_range and (byte_range.units != "bytes" or len(byte_range.ranges) != 1):
+        byte_range = None
+    start, stop = byte_range.ranges[0] if byte_range else (0, None)
+
     try:
-        response = stub.DownloadFile(
-            auth_pb2.FileDownloadRequest(
-                email=email,
-                filename=filename
-            )
-        )
+        # A suffix range (bytes=-N) needs the file size first, so start from 0.
+        opened = (max(start, 0), (stop - start) if stop is not None else 0)
+        first, call = open_download(email, filename, *opened)
+        total, etag = first.total_size, first.etag
+
+        if request.if_none_match.contains(etag):
+            call.cancel()
+            resp = make_response("", 304)
+            resp.set_etag(etag)
+            return resp
+
+        if byte_range and request.if_range.etag and request.if_range.etag != etag:
+            byte_range, start, stop = None, 0, None
+        elif byte_range:
+            if start < 0:
+                start = max(total + start, 0)
+            stop = min(stop, total) if stop is not None else total
+            if start >= total:
+                call.cancel()
+                resp = make_response("Requested range not satisfiable", 416)
+                resp.headers["Content-Range"] = f"bytes */{total}"
+                return resp
+
+        wanted = (start, (stop - start) if byte_range else 0)
+        if wanted != opened:
+            call.cancel()
+            first, call = open_download(email, filename, *wanted)
     except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return "File not found", 404
+        if e.code() == grpc.StatusCode.OUT_OF_RANGE:
+            return "Requested range not satisfiable", 416
         return f"Download failed: {e.details()}", 502
 
-    if not response or not response.content:
-        return "File not found", 404
-
-    return send_file(
-        io.BytesIO(response.content),
-        as_attachment=True,
-        download_name=filename
-    )
+    def generate():
+        try:
+            yield first.data
+            for chunk in call:
+                yield chunk.data
+        finally:
+            # Client went away (or we finished): stop the server-side stream.
+            call.cancel()
+
+    resp = Response(generate(), status=206 if byte_range else 200,
+                    mimetype="application/octet-stream", direct_passthrough=True)
+    resp.headers["Content-Length"] = str((stop - start) if byte_range else total)
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.headers.set("Content-Disposition", "attachment", filename=filename)
+    if byte_range:
+        resp.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{total}"
+    resp.set_etag(etag)
+    return resp
 
 @app.route("/delete/<path:filename>", methods=["POST"])
 def delete(filename):
@@ -232,6 +469,8 @@ def delete(filename):
     except grpc.RpcError as e:
         flash(f"Delete failed: {e.details()}", "danger")
         return safe_redirect_to_dashboard()
+    finally:
+        view_cache.invalidate(email)
 
     if response.success:
         flash(f"Deleted {filename}", "success")
@@ -252,7 +491,7 @@ def shared():
     shared_files = []
     
     try:
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
+        quota = cached_rpc(email, "GetQuota", auth_pb2.QuotaRequest(email=email))
         used_bytes = quota.used_bytes
         total_bytes = quota.total_bytes
     except grpc.RpcError:
@@ -279,17 +518,20 @@ def recent():
     email = flask_session.get("email")
     
     try:
-        response = stub.ListFiles(auth_pb2.ListFilesRequest(email=email))
-        all_files = list(response.files) if response and response.files else []
-        
-        # Sort by most recent (in real app, you'd track access time in DB)
-        # For now, just show all files
-        recent_files = all_files[:10]  # Show last 10
-        
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
-        used_bytes = quota.used_bytes
-        total_bytes = quota.total_bytes
-    except grpc.RpcError:
+        # Ten newest uploads and the quota in one call
+        response = cached_rpc(email, "GetDashboard", auth_pb2.DashboardRequest(
+            email=email,
+            page=auth_pb2.ListFilesRequest(
+                email=email, page_size=10, sort_by=auth_pb2.SORT_CREATED_AT, descending=True
+            )
+        ))
+        if not response.success:
+            raise ValueError(response.message)
+
+        recent_files = list(response.page.files)
+        used_bytes = response.used_bytes
+        total_bytes = response.quota_bytes
+    except (grpc.RpcError, ValueError):
         recent_files = []
         used_bytes = 0
         total_bytes = 5 * 1024 * 1024 * 1024
@@ -318,7 +560,7 @@ def starred():
     starred_files = []
     
     try:
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
+        quota = cached_rpc(email, "GetQuota", auth_pb2.QuotaRequest(email=email))
         used_bytes = quota.used_bytes
         total_bytes = quota.total_bytes
     except grpc.RpcError:
@@ -345,30 +587,24 @@ def analytics():
     email = flask_session.get("email")
     
     try:
-        response = stub.ListFiles(auth_pb2.ListFilesRequest(email=email))
-        files = list(response.files) if response and response.files else []
-        
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
-        used_bytes = quota.used_bytes
-        total_bytes = quota.total_bytes
-        
-        # Calculate analytics
-        total_files = len(files)
-        total_size = sum(f.size for f in files)
-        
-        # File type breakdown
-        file_types = {}
-        for f in files:
-            ext = f.filename.split('.')[-1].lower() if '.' in f.filename else 'other'
-            file_types[ext] = file_types.get(ext, 0) + 1
-        
-        # Average file size
-        avg_size = total_size / total_files if total_files > 0 else 0
-        
-    except grpc.RpcError:
+        # Totals and per-type counts are aggregated by the server; quota rides along
+        stats = cached_rpc(email, "GetStorageAnalytics", auth_pb2.AnalyticsRequest(email=email))
+        if not stats.success:
+            raise ValueError(stats.message)
+
+        total_files = stats.total_files
+        total_size = stats.total_bytes
+        avg_size = stats.avg_size
+        type_count = stats.type_count
+        file_types = {t.extension: t.count for t in stats.file_types}
+        used_bytes = stats.used_bytes
+        total_bytes = stats.quota_bytes
+
+    except (grpc.RpcError, ValueError):
         total_files = 0
         total_size = 0
         file_types = {}
+        type_count = 0
         avg_size = 0
         used_bytes = 0
         total_bytes = 5 * 1024 * 1024 * 1024
@@ -381,6 +617,7 @@ def analytics():
         total_files=total_files,
         total_size=total_size,
         file_types=file_types,
+        type_count=type_count,
         avg_size=avg_size,
         used=used_bytes,
         total=total_bytes,
@@ -396,7 +633,7 @@ def settings():
     email = flask_session.get("email")
     
     try:
-        quota = stub.GetQuota(auth_pb2.QuotaRequest(email=email))
+        quota = cached_rpc(email, "GetQuota", auth_pb2.QuotaRequest(email=email))
         used_bytes = quota.used_bytes
         total_bytes = quota.total_bytes
     except grpc.RpcError:
@@ -24,13 +24,15 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nauth.proto\x12\x05\x63loud\"D\n\x0fRegisterRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"I\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x13\n\x0bquota_bytes\x18\x03 \x01(\x03\"/\n\x0cLoginRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"1\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"-\n\nOTPRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08otp_code\x18\x02 \x01(\t\"/\n\x0bOTPResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"E\n\x11\x46ileUploadRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\x0c\"6\n\x12\x46ileUploadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"6\n\x13\x46ileDownloadRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\"8\n\x14\x46ileDownloadResponse\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\x12\x0f\n\x07message\x18\x02 \x01(\t\"4\n\x11\x46ileDeleteRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\"6\n\x12\x46ileDeleteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"!\n\x10ListFilesRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"*\n\x08\x46ileInfo\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\"3\n\x11ListFilesResponse\x12\x1e\n\x05\x66iles\x18\x01 \x03(\x0b\x32\x0f.cloud.FileInfo\"\x1d\n\x0cQuotaRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"8\n\rQuotaResponse\x12\x12\n\nused_bytes\x18\x01 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x02 \x01(\x03\x32\xf8\x03\n\x0b\x41uthService\x12;\n\x08Register\x12\x16.cloud.RegisterRequest\x1a\x17.cloud.RegisterResponse\x12\x32\n\x05Login\x12\x13.cloud.LoginRequest\x1a\x14.cloud.LoginResponse\x12\x32\n\tVerifyOTP\x12\x11.cloud.OTPRequest\x1a\x12.cloud.OTPResponse\x12\x41\n\nUploadFile\x12\x18.cloud.FileUploadRequest\x1a\x19.cloud.FileUploadResponse\x12G\n\x0c\x44ownloadFile\x12\x1a.cloud.FileDownloadRequest\x1a\x1b.cloud.FileDownloadResponse\x12\x41\n\nDeleteFile\x12\x18.cloud.FileDeleteRequest\x1a\x19.cloud.FileDeleteResponse\x12>\n\tListFiles\x12\x17.cloud.ListFilesRequest\x1a\x18.cloud.ListFilesResponse\x12\x35\n\x08GetQuota\x12\x13.cloud.QuotaRequest\x1a\x14.cloud.QuotaResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nauth.proto\x12\x05\x63loud\"D\n\x0fRegisterRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"I\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x13\n\x0bquota_bytes\x18\x03 \x01(\x03\"/\n\x0cLoginRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"1\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"-\n\nOTPRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08otp_code\x18\x02 \x01(\t\"/\n\x0bOTPResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"E\n\x11\x46ileUploadRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\x0c\"H\n\x12\x46ileUploadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x10\n\x08\x63hecksum\x18\x03 \x01(\t\"U\n\x10\x46ileChunkRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\x12\n\ntotal_size\x18\x04 \x01(\x03\"R\n\x11HashUploadRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0e\n\x06sha256\x18\x03 \x01(\t\x12\x0c\n\x04size\x18\x04 \x01(\x03\"6\n\x13\x46ileDownloadRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\"8\n\x14\x46ileDownloadResponse\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\x12\x0f\n\x07message\x18\x02 \x01(\t\"S\n\x10\x46ileRangeRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x0e\n\x06offset\x18\x03 \x01(\x03\x12\x0e\n\x06length\x18\x04 \x01(\x03\"O\n\rFileDataChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x0e\n\x06offset\x18\x02 \x01(\x03\x12\x12\n\ntotal_size\x18\x03 \x01(\x03\x12\x0c\n\x04\x65tag\x18\x04 \x01(\t\"e\n\x1a\x43reateUploadSessionRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12\x12\n\ntotal_size\x18\x03 \x01(\x03\x12\x12\n\nchunk_size\x18\x04 \x01(\x05\"9\n\x14UploadSessionRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\x03\"\x8f\x01\n\x15UploadSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x12\n\nsession_id\x18\x03 \x01(\x03\x12\x12\n\nchunk_size\x18\x04 \x01(\x05\x12\x14\n\x0ctotal_chunks\x18\x05 \x01(\x05\x12\x16\n\x0emissing_chunks\x18\x06 \x03(\x05\"X\n\x10\x43hunkDataRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\x03\x12\x13\n\x0b\x63hunk_index\x18\x03 \x01(\x05\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\"F\n\x10PutChunkResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x10\n\x08\x63hecksum\x18\x03 \x01(\t\"4\n\x11\x46ileDeleteRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\"6\n\x12\x46ileDeleteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x8f\x01\n\x10ListFilesRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x11\n\tpage_size\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\x12 \n\x07sort_by\x18\x04 \x01(\x0e\x32\x0f.cloud.FileSort\x12\x12\n\ndescending\x18\x05 \x01(\x08\x12\x13\n\x0bname_prefix\x18\x06 \x01(\t\">\n\x08\x46ileInfo\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x12\n\ncreated_at\x18\x03 \x01(\x03\"H\n\x11ListFilesResponse\x12\x1e\n\x05\x66iles\x18\x01 \x03(\x0b\x32\x0f.cloud.FileInfo\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\t\"\x1d\n\x0cQuotaRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"8\n\rQuotaResponse\x12\x12\n\nused_bytes\x18\x01 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x02 \x01(\x03\"4\n\x10\x41nalyticsRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x11\n\tmax_types\x18\x02 \x01(\x05\"F\n\rFileTypeStats\x12\x11\n\textension\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x03 \x01(\x03\"\xd8\x01\n\x11\x41nalyticsResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x13\n\x0btotal_files\x18\x03 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x04 \x01(\x03\x12\x10\n\x08\x61vg_size\x18\x05 \x01(\x03\x12\x12\n\nused_bytes\x18\x06 \x01(\x03\x12\x13\n\x0bquota_bytes\x18\x07 \x01(\x03\x12\x12\n\ntype_count\x18\x08 \x01(\x05\x12(\n\nfile_types\x18\t \x03(\x0b\x32\x14.cloud.FileTypeStats\"H\n\x10\x44\x61shboardRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12%\n\x04page\x18\x02 \x01(\x0b\x32\x17.cloud.ListFilesRequest\"\xb0\x01\n\x11\x44\x61shboardResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x12\n\nused_bytes\x18\x03 \x01(\x03\x12\x13\n\x0bquota_bytes\x18\x04 \x01(\x03\x12\x13\n\x0btotal_files\x18\x05 \x01(\x03\x12\x13\n\x0btotal_bytes\x18\x06 \x01(\x03\x12&\n\x04page\x18\x07 \x01(\x0b\x32\x18.cloud.ListFilesResponse\"\x0e\n\x0cWatchRequest\",\n\x0b\x43hangeEvent\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x0e\n\x06reason\x18\x02 \x01(\t*=\n\x08\x46ileSort\x12\r\n\tSORT_NAME\x10\x00\x12\r\n\tSORT_SIZE\x10\x01\x12\x13\n\x0fSORT_CREATED_AT\x10\x02\x32\xc4\t\n\x0b\x41uthService\x12;\n\x08Register\x12\x16.cloud.RegisterRequest\x1a\x17.cloud.RegisterResponse\x12\x32\n\x05Login\x12\x13.cloud.LoginRequest\x1a\x14.cloud.LoginResponse\x12\x32\n\tVerifyOTP\x12\x11.cloud.OTPRequest\x1a\x12.cloud.OTPResponse\x12\x41\n\nUploadFile\x12\x18.cloud.FileUploadRequest\x1a\x19.cloud.FileUploadResponse\x12H\n\x10UploadFileStream\x12\x17.cloud.FileChunkRequest\x1a\x19.cloud.FileUploadResponse(\x01\x12G\n\x0c\x44ownloadFile\x12\x1a.cloud.FileDownloadRequest\x1a\x1b.cloud.FileDownloadResponse\x12\x45\n\x12\x44ownloadFileStream\x12\x17.cloud.FileRangeRequest\x1a\x14.cloud.FileDataChunk0\x01\x12\x43\n\x0cUploadByHash\x12\x18.cloud.HashUploadRequest\x1a\x19.cloud.FileUploadResponse\x12V\n\x13\x43reateUploadSession\x12!.cloud.CreateUploadSessionRequest\x1a\x1c.cloud.UploadSessionResponse\x12>\n\x08PutChunk\x12\x17.cloud.ChunkDataRequest\x1a\x17.cloud.PutChunkResponse(\x01\x12L\n\x0fGetUploadStatus\x12\x1b.cloud.UploadSessionRequest\x1a\x1c.cloud.UploadSessionResponse\x12\x46\n\x0c\x43ommitUpload\x12\x1b.cloud.UploadSessionRequest\x1a\x19.cloud.FileUploadResponse\x12\x41\n\nDeleteFile\x12\x18.cloud.FileDeleteRequest\x1a\x19.cloud.FileDeleteResponse\x12>\n\tListFiles\x12\x17.cloud.ListFilesRequest\x1a\x18.cloud.ListFilesResponse\x12\x35\n\x08GetQuota\x12\x13.cloud.QuotaRequest\x1a\x14.cloud.QuotaResponse\x12H\n\x13GetStorageAnalytics\x12\x17.cloud.AnalyticsRequest\x1a\x18.cloud.AnalyticsResponse\x12\x41\n\x0cGetDashboard\x12\x17.cloud.DashboardRequest\x1a\x18.cloud.DashboardResponse\x12\x39\n\x0cWatchChanges\x12\x13.cloud.WatchRequest\x1a\x12.cloud.ChangeEvent0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'auth_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_FILESORT']._serialized_start=2571
+  _globals['_FILESORT']._serialized_end=2632
   _globals['_REGISTERREQUEST']._serialized_start=21
   _globals['_REGISTERREQUEST']._serialized_end=89
   _globals['_REGISTERRESPONSE']._serialized_start=91
@@ -46,25 +48,57 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_FILEUPLOADREQUEST']._serialized_start=362
   _globals['_FILEUPLOADREQUEST']._serialized_end=431
   _globals['_FILEUPLOADRESPONSE']._serialized_start=433
-  _globals['_FILEUPLOADRESPONSE']._serialized_end=487
-  _globals['_FILEDOWNLOADREQUEST']._serialized_start=489
-  _globals['_FILEDOWNLOADREQUEST']._serialized_end=543
-  _globals['_FILEDOWNLOADRESPONSE']._serialized_start=545
-  _globals['_FILEDOWNLOADRESPONSE']._serialized_end=601
-  _globals['_FILEDELETEREQUEST']._serialized_start=603
-  _globals['_FILEDELETEREQUEST']._serialized_end=655
-  _globals['_FILEDELETERESPONSE']._serialized_start=657
-  _globals['_FILEDELETERESPONSE']._serialized_end=711
-  _globals['_LISTFILESREQUEST']._serialized_start=713
-  _globals['_LISTFILESREQUEST']._serialized_end=746
-  _globals['_FILEINFO']._serialized_start=748
-  _globals['_FILEINFO']._serialized_end=790
-  _globals['_LISTFILESRESPONSE']._serialized_start=792
-  _globals['_LISTFILESRESPONSE']._serialized_end=843
-  _globals['_QUOTAREQUEST']._serialized_start=845
-  _globals['_QUOTAREQUEST']._serialized_end=874
-  _globals['_QUOTARESPONSE']._serialized_start=876
-  _globals['_QUOTARESPONSE']._serialized_end=932
-  _globals['_AUTHSERVICE']._serialized_start=935
-  _globals['_AUTHSERVICE']._serialized_end=1439
+  _globals['_FILEUPLOADRESPONSE']._serialized_end=505
+  _globals['_FILECHUNKREQUEST']._serialized_start=507
+  _globals['_FILECHUNKREQUEST']._serialized_end=592
+  _globals['_HASHUPLOADREQUEST']._serialized_start=594
+  _globals['_HASHUPLOADREQUEST']._serialized_end=676
+  _globals['_FILEDOWNLOADREQUEST']._serialized_start=678
+  _globals['_FILEDOWNLOADREQUEST']._serialized_end=732
+  _globals['_FILEDOWNLOADRESPONSE']._serialized_start=734
+  _globals['_FILEDOWNLOADRESPONSE']._serialized_end=790
+  _globals['_FILERANGEREQUEST']._serialized_start=792
+  _globals['_FILERANGEREQUEST']._serialized_end=875
+  _globals['_FILEDATACHUNK']._serialized_start=877
+  _globals['_FILEDATACHUNK']._serialized_end=956
+  _globals['_CREATEUPLOADSESSIONREQUEST']._serialized_start=958
+  _globals['_CREATEUPLOADSESSIONREQUEST']._serialized_end=1059
+  _globals['_UPLOADSESSIONREQUEST']._serialized_start=1061
+  _globals['_UPLOADSESSIONREQUEST']._serialized_end=1118
+  _globals['_UPLOADSESSIONRESPONSE']._serialized_start=1121
+  _globals['_UPLOADSESSIONRESPONSE']._serialized_end=1264
+  _globals['_CHUNKDATAREQUEST']._serialized_start=1266
+  _globals['_CHUNKDATAREQUEST']._serialized_end=1354
+  _globals['_PUTCHUNKRESPONSE']._serialized_start=1356
+  _globals['_PUTCHUNKRESPONSE']._serialized_end=1426
+  _globals['_FILEDELETEREQUEST']._serialized_start=1428
+  _globals['_FILEDELETEREQUEST']._serialized_end=1480
+  _globals['_FILEDELETERESPONSE']._serialized_start=1482
+  _globals['_FILEDELETERESPONSE']._serialized_end=1536
+  _globals['_LISTFILESREQUEST']._serialized_start=1539
+  _globals['_LISTFILESREQUEST']._serialized_end=1682
+  _globals['_FILEINFO']._serialized_start=1684
+  _globals['_FILEINFO']._serialized_end=1746
+  _globals['_LISTFILESRESPONSE']._serialized_start=1748
+  _globals['_LISTFILESRESPONSE']._serialized_end=1820
+  _globals['_QUOTAREQUEST']._serialized_start=1822
+  _globals['_QUOTAREQUEST']._serialized_end=1851
+  _globals['_QUOTARESPONSE']._serialized_start=1853
+  _globals['_QUOTARESPONSE']._serialized_end=1909
+  _globals['_ANALYTICSREQUEST']._serialized_start=1911
+  _globals['_ANALYTICSREQUEST']._serialized_end=1963
+  _globals['_FILETYPESTATS']._serialized_start=1965
+  _globals['_FILETYPESTATS']._serialized_end=2035
+  _globals['_ANALYTICSRESPONSE']._serialized_start=2038
+  _globals['_ANALYTICSRESPONSE']._serialized_end=2254
+  _globals['_DASHBOARDREQUEST']._serialized_start=2256
+  _globals['_DASHBOARDREQUEST']._serialized_end=2328
+  _globals['_DASHBOARDRESPONSE']._serialized_start=2331
+  _globals['_DASHBOARDRESPONSE']._serialized_end=2507
+  _globals['_WATCHREQUEST']._serialized_start=2509
+  _globals['_WATCHREQUEST']._serialized_end=2523
+  _globals['_CHANGEEVENT']._serialized_start=2525
+  _globals['_CHANGEEVENT']._serialized_end=2569
+  _globals['_AUTHSERVICE']._serialized_start=2635
+  _globals['_AUTHSERVICE']._serialized_end=3855
 # @@protoc_insertion_point(module_scope)
@@ -1,9 +1,30 @@
 # auth_client.py
 import os
+import hashlib
 import grpc
 import auth_pb2
 import auth_pb2_grpc
 
+CHUNK_SIZE = 1024 * 1024  # keep each message well under gRPC's 4 MB limit
+
+def iter_file_chunks(email, path):
+    """Yield FileChunkRequest messages for UploadFileStream, reading the file lazily."""
+    yield auth_pb2.FileChunkRequest(
+        email=email,
+        filename=os.path.basename(path),
+        total_size=os.path.getsize(path)
+    )
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b""):
+            yield auth_pb2.FileChunkRequest(data=data)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
 def run():
     channel = grpc.insecure_channel('localhost:50051')
     stub = auth_pb2_grpc.AuthServiceStub(channel)
@@ -28,20 +49,25 @@ def run():
     resp = stub.VerifyOTP(auth_pb2.OTPRequest(email=email, otp_code=otp_code))
     print("VerifyOTP:", resp.success, resp.message)
 
-    # Upload a file (read bytes)
+    # Upload a file (streamed in chunks)
     filename = input("Path to file to upload (leave empty to skip): ").strip()
     if filename:
         if not os.path.exists(filename):
             print("File not found:", filename)
         else:
-            with open(filename, "rb") as f:
-                content = f.read()
-            resp = stub.UploadFile(auth_pb2.FileUploadRequest(
-                email=email,
-                filename=os.path.basename(filename),
-                content=content
-            ))
-            print("UploadFile:", resp.success, resp.message)
+            # Offer the hash first; only send the bytes if the server lacks them
+            try:
+                resp = stub.UploadByHash(auth_pb2.HashUploadRequest(
+                    email=email,
+                    filename=os.path.basename(filename),
+                    sha256=file_sha256(filename),
+                    size=os.path.getsize(filename)
+                ))
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.NOT_FOUND:
+                    raise
+                resp = stub.UploadFileStream(iter_file_chunks(email, filename))
+            print("UploadFile:", resp.success, resp.message, resp.checksum)
 
     # List files
     resp = stub.ListFiles(auth_pb2.ListFilesRequest(email=email))
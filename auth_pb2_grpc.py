@@ -55,11 +55,46 @@ class AuthServiceStub(object):
                 request_serializer=auth__pb2.FileUploadRequest.SerializeToString,
                 response_deserializer=auth__pb2.FileUploadResponse.FromString,
                 _registered_method=True)
+        self.UploadFileStream = channel.stream_unary(
+                '/cloud.AuthService/UploadFileStream',
+                request_serializer=auth__pb2.FileChunkRequest.SerializeToString,
+                response_deserializer=auth__pb2.FileUploadResponse.FromString,
+                _registered_method=True)
         self.DownloadFile = channel.unary_unary(
                 '/cloud.AuthService/DownloadFile',
                 request_serializer=auth__pb2.FileDownloadRequest.SerializeToString,
                 response_deserializer=auth__pb2.FileDownloadResponse.FromString,
                 _registered_method=True)
+        self.DownloadFileStream = channel.unary_stream(
+                '/cloud.AuthService/DownloadFileStream',
+                request_serializer=auth__pb2.FileRangeRequest.SerializeToString,
+                response_deserializer=auth__pb2.FileDataChunk.FromString,
+                _registered_method=True)
+        self.UploadByHash = channel.unary_unary(
+                '/cloud.AuthService/UploadByHash',
+                request_serializer=auth__pb2.HashUploadRequest.SerializeToString,
+                response_deserializer=auth__pb2.FileUploadResponse.FromString,
+                _registered_method=True)
+        self.CreateUploadSession = channel.unary_unary(
+                '/cloud.AuthService/CreateUploadSession',
+                request_serializer=auth__pb2.CreateUploadSessionRequest.SerializeToString,
+                response_deserializer=auth__pb2.UploadSessionResponse.FromString,
+                _registered_method=True)
+        self.PutChunk = channel.stream_unary(
+                '/cloud.AuthService/PutChunk',
+                request_serializer=auth__pb2.ChunkDataRequest.SerializeToString,
+                response_deserializer=auth__pb2.PutChunkResponse.FromString,
+                _registered_method=True)
+        self.GetUploadStatus = channel.unary_unary(
+                '/cloud.AuthService/GetUploadStatus',
+                request_serializer=auth__pb2.UploadSessionRequest.SerializeToString,
+                response_deserializer=auth__pb2.UploadSessionResponse.FromString,
+                _registered_method=True)
+        self.CommitUpload = channel.unary_unary(
+                '/cloud.AuthService/CommitUpload',
+                request_serializer=auth__pb2.UploadSessionRequest.SerializeToString,
+                response_deserializer=auth__pb2.FileUploadResponse.FromString,
+                _registered_method=True)
         self.DeleteFile = channel.unary_unary(
                 '/cloud.AuthService/DeleteFile',
                 request_serializer=auth__pb2.FileDeleteRequest.SerializeToString,
@@ -75,6 +110,21 @@ class AuthServiceStub(object):
                 request_serializer=auth__pb2.QuotaRequest.SerializeToString,
                 response_deserializer=auth__pb2.QuotaResponse.FromString,
                 _registered_method=True)
+        self.GetStorageAnalytics = channel.unary_unary(
+                '/cloud.AuthService/GetStorageAnalytics',
+                request_serializer=auth__pb2.AnalyticsRequest.SerializeToString,
+                response_deserializer=auth__pb2.AnalyticsResponse.FromString,
+                _registered_method=True)
+        self.GetDashboard = channel.unary_unary(
+                '/cloud.AuthService/GetDashboard',
+                request_serializer=auth__pb2.DashboardRequest.SerializeToString,
+                response_deserializer=auth__pb2.DashboardResponse.FromString,
+                _registered_method=True)
+        self.WatchChanges = channel.unary_stream(
+                '/cloud.AuthService/WatchChanges',
+                request_serializer=auth__pb2.WatchRequest.SerializeToString,
+                response_deserializer=auth__pb2.ChangeEvent.FromString,
+                _registered_method=True)
 
 
 class AuthServiceServicer(object):
@@ -109,6 +159,13 @@ class AuthServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def UploadFileStream(self, request_iterator, context):
+        """Upload a file as a stream of chunks (no message size limit on the file)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def DownloadFile(self, request, context):
         """Download a file
         """
@@ -116,6 +173,47 @@ class AuthServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def DownloadFileStream(self, request, context):
+        """Download a file (or a byte range of it) as a stream of chunks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UploadByHash(self, request, context):
+        """Store a file by content hash alone, if the server already holds that
+        content; on failure the client uploads it normally
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CreateUploadSession(self, request, context):
+        """Resumable uploads: open a session, put chunks by index (any order, in
+        parallel), ask which chunks are still missing, then commit
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PutChunk(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetUploadStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CommitUpload(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def DeleteFile(self, request, context):
         """Delete a file
         """
@@ -124,7 +222,7 @@ class AuthServiceServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def ListFiles(self, request, context):
-        """List all files stored by a user
+        """List a user's files one page at a time (keyset-paginated, sortable, prefix-filtered)
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -137,6 +235,27 @@ class AuthServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetStorageAnalytics(self, request, context):
+        """Per-user storage totals and file-type breakdown, aggregated in the database
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetDashboard(self, request, context):
+        """Quota, file totals and optionally one ListFiles page, in a single round trip
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchChanges(self, request, context):
+        """Stream of "this user's files changed" events, for front-ends that cache views
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_AuthServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -160,11 +279,46 @@ def add_AuthServiceServicer_to_server(servicer, server):
                     request_deserializer=auth__pb2.FileUploadRequest.FromString,
                     response_serializer=auth__pb2.FileUploadResponse.SerializeToString,
             ),
+            'UploadFileStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadFileStream,
+                    request_deserializer=auth__pb2.FileChunkRequest.FromString,
+                    response_serializer=auth__pb2.FileUploadResponse.SerializeToString,
+            ),
             'DownloadFile': grpc.unary_unary_rpc_method_handler(
                     servicer.DownloadFile,
                     request_deserializer=auth__pb2.FileDownloadRequest.FromString,
                     response_serializer=auth__pb2.FileDownloadResponse.SerializeToString,
             ),
+            'DownloadFileStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.DownloadFileStream,
+                    request_deserializer=auth__pb2.FileRangeRequest.FromString,
+                    response_serializer=auth__pb2.FileDataChunk.SerializeToString,
+            ),
+            'UploadByHash': grpc.unary_unary_rpc_method_handler(
+                    servicer.UploadByHash,
+                    request_deserializer=auth__pb2.HashUploadRequest.FromString,
+                    response_serializer=auth__pb2.FileUploadResponse.SerializeToString,
+            ),
+            'CreateUploadSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.CreateUploadSession,
+                    request_deserializer=auth__pb2.CreateUploadSessionRequest.FromString,
+                    response_serializer=auth__pb2.UploadSessionResponse.SerializeToString,
+            ),
+            'PutChunk': grpc.stream_unary_rpc_method_handler(
+                    servicer.PutChunk,
+                    request_deserializer=auth__pb2.ChunkDataRequest.FromString,
+                    response_serializer=auth__pb2.PutChunkResponse.SerializeToString,
+            ),
+            'GetUploadStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetUploadStatus,
+                    request_deserializer=auth__pb2.UploadSessionRequest.FromString,
+                    response_serializer=auth__pb2.UploadSessionResponse.SerializeToString,
+            ),
+            'CommitUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.CommitUpload,
+                    request_deserializer=auth__pb2.UploadSessionRequest.FromString,
+                    response_serializer=auth__pb2.FileUploadResponse.SerializeToString,
+            ),
             'DeleteFile': grpc.unary_unary_rpc_method_handler(
                     servicer.DeleteFile,
                     request_deserializer=auth__pb2.FileDeleteRequest.FromString,
@@ -180,6 +334,21 @@ def add_AuthServiceServicer_to_server(servicer, server):
                     request_deserializer=auth__pb2.QuotaRequest.FromString,
                     response_serializer=auth__pb2.QuotaResponse.SerializeToString,
             ),
+            'GetStorageAnalytics': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStorageAnalytics,
+                    request_deserializer=auth__pb2.AnalyticsRequest.FromString,
+                    response_serializer=auth__pb2.AnalyticsResponse.SerializeToString,
+            ),
+            'GetDashboard': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetDashboard,
+                    request_deserializer=auth__pb2.DashboardRequest.FromString,
+                    response_serializer=auth__pb2.DashboardResponse.SerializeToString,
+            ),
+            'WatchChanges': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchChanges,
+                    request_deserializer=auth__pb2.WatchRequest.FromString,
+                    response_serializer=auth__pb2.ChangeEvent.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'cloud.AuthService', rpc_method_handlers)
@@ -300,6 +469,33 @@ class AuthService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def UploadFileStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/cloud.AuthService/UploadFileStream',
+            auth__pb2.FileChunkRequest.SerializeToString,
+            auth__pb2.FileUploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def DownloadFile(request,
             target,
@@ -327,6 +523,168 @@ class AuthService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def DownloadFileStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/cloud.AuthService/DownloadFileStream',
+            auth__pb2.FileRangeRequest.SerializeToString,
+            auth__pb2.FileDataChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UploadByHash(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/UploadByHash',
+            auth__pb2.HashUploadRequest.SerializeToString,
+            auth__pb2.FileUploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CreateUploadSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/CreateUploadSession',
+            auth__pb2.CreateUploadSessionRequest.SerializeToString,
+            auth__pb2.UploadSessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PutChunk(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/cloud.AuthService/PutChunk',
+            auth__pb2.ChunkDataRequest.SerializeToString,
+            auth__pb2.PutChunkResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetUploadStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/GetUploadStatus',
+            auth__pb2.UploadSessionRequest.SerializeToString,
+            auth__pb2.UploadSessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CommitUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/CommitUpload',
+            auth__pb2.UploadSessionRequest.SerializeToString,
+            auth__pb2.FileUploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def DeleteFile(request,
             target,
@@ -407,3 +765,84 @@ class AuthService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetStorageAnalytics(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/GetStorageAnalytics',
+            auth__pb2.AnalyticsRequest.SerializeToString,
+            auth__pb2.AnalyticsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetDashboard(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/cloud.AuthService/GetDashboard',
+            auth__pb2.DashboardRequest.SerializeToString,
+            auth__pb2.DashboardResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchChanges(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/cloud.AuthService/WatchChanges',
+            auth__pb2.WatchRequest.SerializeToString,
+            auth__pb2.ChangeEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,15 +1,36 @@
 import os
 import grpc
+import json
+import base64
 import logging
 import hashlib
+import hmac
+import math
+import tempfile
 from concurrent import futures
+from contextlib import closing
 from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from werkzeug.utils import secure_filename
 
 import auth_pb2, auth_pb2_grpc
-from models import SessionLocal, User, File, Chunk
-from utils import hash_password, check_password, generate_otp, send_otp
+from models import session_scope, User, File, Chunk, Transfer, Blob
+from utils import generate_otp
+from mail_queue import MailQueue
+from change_feed import ChangeFeed
+from durable_io import Durability
+from blob_store import BlobStore
+from compression import CompressionPolicy, open_stored
+from placement import ChunkPlacement
+from rebalancer import Rebalancer
+from scrubber import Scrubber
+from upload_sessions import SessionReaper
+from password_pool import PasswordPool, PasswordPoolBusy
+import quota
+import upload_sessions
 from dotenv import load_dotenv
 
 # Load .env from current directory
@@ -20,28 +41,452 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 STORAGE_DIR = "storage"
-os.makedirs(STORAGE_DIR, exist_ok=True)
 
+# Chunks received by open upload sessions, one file each (see upload_sessions.py)
+UPLOAD_SESSION_DIR = os.path.join(STORAGE_DIR, ".uploads")
+
+# Chunk size bounds for upload sessions; PutChunk streams, so chunks may exceed
+# the gRPC message limit.
+MIN_SESSION_CHUNK_SIZE = 64 * 1024
+MAX_SESSION_CHUNK_SIZE = 64 * 1024 * 1024
+DEFAULT_SESSION_CHUNK_SIZE = 8 * 1024 * 1024
 
-class AuthService(auth_pb2_grpc.AuthServiceServicer):
-
-    def Register(self, request, context):
-        db: Session = SessionLocal()
-        try:
-            existing = db.query(User).filter(User.email == request.email).first()
-            if existing:
-                return auth_pb2.RegisterResponse(
-                    success=False, message="User already exists", quota_bytes=0
-                )
-
-            hashed_pw = hash_password(request.password)
-            quota = 5 * 1024 * 1024 * 1024  # 5GB
+# WatchChanges streams every user's email, so only callers sending this shared
+# secret as x-watch-token metadata may subscribe; unset, WatchChanges is off.
+WATCH_TOKEN = os.getenv("WATCH_TOKEN", "")
+# Streams open at once; on this server each holds a worker thread of its own
+WATCH_MAX_SUBSCRIBERS = int(os.getenv("WATCH_MAX_SUBSCRIBERS", "4"))
+
+# Worker threads for the other RPCs, which watchers never take
+RPC_THREADS = 10
+
+# Who UploadByHash may copy content from: "own" (the caller's own files) or
+# "any" (every user's). A hash alone does not prove the caller has the bytes,
+# so "any" lets whoever learns a file's sha256 read it.
+HASH_UPLOAD_SCOPE = os.getenv("HASH_UPLOAD_SCOPE", "own").lower()
+
+# ---------- Server state ----------
+# Built by init(), not at import: password_pool's workers are spawned
+# processes that re-import the script which started the server, and must
+# not build a second copy of any of this.
+
+# OTP emails are queued and sent by a background thread over a reused SMTP connection
+mail_queue: Optional[MailQueue] = None
+
+# bcrypt runs here, off the gRPC worker threads (see password_pool.py)
+password_pool: Optional[PasswordPool] = None
+
+# Upload/delete notifications for WatchChanges subscribers (the webapp's view cache)
+change_feed: Optional[ChangeFeed] = None
+
+# File contents, stored once per distinct sha256 (see blob_store.py),
+# compressed when STORAGE_COMPRESSION is set (see compression.py) and
+# striped across the storage nodes when STORAGE_NODES is (see placement.py)
+blob_store: Optional[BlobStore] = None
+
+# Periodically resets used_bytes to stored files + live reservations (see quota.py)
+quota_reconciler: Optional[quota.QuotaReconciler] = None
+
+# Expires upload sessions nobody commits, freeing their chunks and quota (see upload_sessions.py)
+session_reaper: Optional[SessionReaper] = None
+
+# Moves chunks off storage nodes that fill faster than the rest (see rebalancer.py)
+rebalancer: Optional[Rebalancer] = None
+
+# Re-hashes the nodes' files and repairs corrupt chunks from their other copies (see scrubber.py)
+scrubber: Optional[Scrubber] = None
+
+
+def init():
+    """Build the server state above; serve() calls it, and later calls do nothing."""
+    global mail_queue, password_pool, change_feed, blob_store, quota_reconciler, session_reaper, rebalancer, scrubber
+    if blob_store is not None:
+        return
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+
+    mail_queue = MailQueue.from_env()
+    password_pool = PasswordPool()
+    change_feed = ChangeFeed(max_subscribers=WATCH_MAX_SUBSCRIBERS)
+
+    # fsync policy for stored files (STORAGE_DURABILITY, see durable_io.py)
+    durability = Durability.from_env()
+    blob_store = BlobStore(
+        os.path.join(STORAGE_DIR, "blobs"), durability, CompressionPolicy.from_env(),
+        ChunkPlacement.from_env(STORAGE_DIR, durability)
+    )
+
+    quota_reconciler = quota.QuotaReconciler()
+    session_reaper = SessionReaper.from_env(UPLOAD_SESSION_DIR)
+    if blob_store.placement:
+        rebalancer = Rebalancer.from_env(blob_store.placement)
+        scrubber = Scrubber.from_env(blob_store.placement)
+
+
+def start_workers():
+    """Start the background threads of init()'s state."""
+    mail_queue.start()
+    quota_reconciler.start()
+    session_reaper.start()
+    if rebalancer:
+        rebalancer.start()
+    if scrubber:
+        scrubber.start()
+
+# Size of each streamed file slice (both directions); well under gRPC's 4 MB message limit.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# ListFiles page size when the client sends none, and the most it may ask for
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# File types GetStorageAnalytics returns when the client sends no limit, and the most it may ask for
+DEFAULT_ANALYTICS_TYPES = 20
+MAX_ANALYTICS_TYPES = 200
+
+# Each sort order is served by one of the composite (owner_id, <column>, id) indexes on files
+_SORT_COLUMNS = {
+    auth_pb2.SORT_NAME: File.filename,
+    auth_pb2.SORT_SIZE: File.size_bytes,
+    auth_pb2.SORT_CREATED_AT: File.created_at,
+}
+
+
+def _iter_upload_chunks(request):
+    """Split a unary FileUploadRequest into FileChunkRequest messages."""
+    content = memoryview(request.content)
+    yield auth_pb2.FileChunkRequest(
+        email=request.email,
+        filename=request.filename,
+        data=bytes(content[:STREAM_CHUNK_SIZE]),
+        total_size=len(content)
+    )
+    for offset in range(STREAM_CHUNK_SIZE, len(content), STREAM_CHUNK_SIZE):
+        yield auth_pb2.FileChunkRequest(data=bytes(content[offset:offset + STREAM_CHUNK_SIZE]))
+
+
+def _replace_file_row(db: Session, owner_id: int, existing_file, safe_name: str, size: int, blob_hash: str) -> File:
+    """
+    Point the user's File row at an (already acquired) blob, dropping its
+    old chunks and its reference to the content it had before.
+    """
+    if existing_file:
+        if existing_file.blob_hash:
+            blob_store.release(db, existing_file.blob_hash)
+        existing_file.size_bytes = size
+        existing_file.blob_hash = blob_hash
+        db.query(Chunk).filter(Chunk.file_id == existing_file.id).delete()
+        return existing_file
+
+    file_row = File(owner_id=owner_id, filename=safe_name, size_bytes=size, blob_hash=blob_hash)
+    db.add(file_row)
+    db.flush()
+    return file_row
+
+
+def _open_content(email: str, filename: str, blob_hash, codec, chunks):
+    """
+    Open a file's bytes: its blob (chunks from blob_store.locate() if it is
+    on the nodes), or the per-user path files had before the blob store.
+    Returns (file object, size, etag).
+    """
+    if blob_hash:
+        f, size = blob_store.open(blob_hash, codec is not None, chunks)
+        # Content-addressed: the hash already names this version
+        return f, size, f"{size:x}-{blob_hash[:16]}"
+    f, size = open_stored(os.path.join(STORAGE_DIR, email, filename), False)
+    return f, size, f"{size:x}-{os.fstat(f.fileno()).st_mtime_ns:x}"
+
+
+def _stored_file_query(email: str, safe_name: str):
+    return (
+        select(File.blob_hash, Blob.codec)
+        .join(User, File.owner_id == User.id)
+        .outerjoin(Blob, Blob.hash == File.blob_hash)
+        .where(User.email == email, File.filename == safe_name)
+    )
+
+
+def _hash_source_query(owner_id: int, digest: str, size: int):
+    """A file whose content UploadByHash may reuse, within HASH_UPLOAD_SCOPE."""
+    query = select(File.id).where(File.blob_hash == digest, File.size_bytes == size)
+    if HASH_UPLOAD_SCOPE != "any":
+        query = query.where(File.owner_id == owner_id)
+    return query.limit(1)
+
+
+def _old_content(email: str, existing_file):
+    """(blob hash, legacy path) a File row is about to stop using, for _discard_content() after commit."""
+    if not existing_file:
+        return None
+    if existing_file.blob_hash:
+        return existing_file.blob_hash, None
+    return None, os.path.join(STORAGE_DIR, email, existing_file.filename)
+
+
+def _discard_content(old_content):
+    if not old_content:
+        return
+    blob_hash, legacy_path = old_content
+    try:
+        if legacy_path and os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        if blob_hash:
+            _run_tx(blob_store.collect, blob_hash)
+    except Exception:
+        # blob_store.py's sweep removes it later
+        logging.exception("Failed to discard old file content")
+
+
+def _unref_blob(digest: str):
+    """Undo blob_store.store() for an upload that failed before its File row pointed at the blob."""
+    try:
+        blob_store.unref(digest)
+    except Exception:
+        # blob_store.py's recount and sweep fix it later
+        logging.exception("Failed to drop blob reference %s", digest)
+
+
+def _run_tx(fn, *args, **kwargs):
+    """Run fn(db, ...) in its own short, committed transaction."""
+    with session_scope() as db:
+        result = fn(db, *args, **kwargs)
+        db.commit()
+        return result
+
+
+def _grow_reservation(reservation_id: int, needed: int) -> int:
+    """Extend a streaming upload's reservation by at least needed bytes; returns the bytes added, 0 if over quota."""
+    for step in sorted({max(needed, quota.RESERVE_STEP), needed}, reverse=True):
+        if _run_tx(quota.grow, reservation_id, step):
+            return step
+    return 0
+
+
+def _release_reservation(reservation_id: int):
+    try:
+        _run_tx(quota.release, reservation_id)
+    except Exception:
+        # reconcile() reclaims it once it expires
+        logging.exception("Failed to release quota reservation %s", reservation_id)
+
+
+def _get_open_session(db: Session, email: str, session_id: int, lock: bool = False):
+    """Return the caller's in-progress upload session, or None; lock takes its row FOR UPDATE."""
+    query = db.query(Transfer).join(User, Transfer.user_id == User.id).filter(
+        Transfer.id == session_id,
+        User.email == email,
+        Transfer.status == "in_progress"
+    )
+    return (query.with_for_update() if lock else query).first()
+
+
+def _missing_chunks(db: Session, transfer: Transfer) -> list:
+    received = {
+        index for (index,) in db.query(Chunk.chunk_index).filter(Chunk.transfer_id == transfer.id)
+    }
+    return [i for i in range(transfer.total_chunks) if i not in received]
+
+
+def _encode_cursor(sort_by: int, descending: bool, value, file_id: int) -> str:
+    """Opaque keyset cursor: the sort key and id of the last row on the page."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, descending, value, file_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_by: int, descending: bool):
+    """Return (sort value, file id) from a cursor; ValueError if it is malformed or for another order."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort, c_desc, value, file_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if c_sort != sort_by or c_desc != descending:
+        raise ValueError("Cursor does not match the requested sort order")
+    if sort_by == auth_pb2.SORT_CREATED_AT:
+        value = datetime.fromisoformat(value)
+    return value, int(file_id)
+
+
+def _list_files_query(request, owner_id: int = None):
+    """
+    Build the SELECT for one ListFiles page and return it with the page size.
+    Rows after the cursor are found with a keyset predicate, never OFFSET, so
+    deep pages cost the same as the first. One extra row is fetched to tell
+    whether another page follows. Pass owner_id when the user row is already
+    loaded to skip the join on users. Raises ValueError for a bad cursor.
+    """
+    sort_col = _SORT_COLUMNS.get(request.sort_by, File.filename)
+    # Clamped both ways: a negative page size would slice rows[:-n] and skip results
+    page_size = max(1, min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+    query = select(File.id, File.filename, File.size_bytes, File.created_at)
+    if owner_id is not None:
+        query = query.where(File.owner_id == owner_id)
+    else:
+        query = query.join(User, File.owner_id == User.id).where(User.email == request.email)
+
+    if request.name_prefix:
+        escaped = request.name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(File.filename.like(escaped + "%", escape="\\"))
+
+    if request.cursor:
+        value, last_id = _decode_cursor(request.cursor, request.sort_by, request.descending)
+        if request.descending:
+            query = query.where(or_(sort_col < value, and_(sort_col == value, File.id < last_id)))
+        else:
+            query = query.where(or_(sort_col > value, and_(sort_col == value, File.id > last_id)))
+
+    if request.descending:
+        query = query.order_by(sort_col.desc(), File.id.desc())
+    else:
+        query = query.order_by(sort_col, File.id)
+
+    return query.limit(page_size + 1), page_size
+
+
+def _list_files_response(request, rows, page_size: int):
+    next_cursor = ""
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        value = {
+            auth_pb2.SORT_SIZE: last.size_bytes,
+            auth_pb2.SORT_CREATED_AT: last.created_at,
+        }.get(request.sort_by, last.filename)
+        next_cursor = _encode_cursor(request.sort_by, request.descending, value, last.id)
+
+    return auth_pb2.ListFilesResponse(
+        files=[
+            auth_pb2.FileInfo(
+                filename=row.filename,
+                size=row.size_bytes,
+                created_at=int(row.created_at.replace(tzinfo=timezone.utc).timestamp()) if row.created_at else 0
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
+
+
+def _file_totals_query(user_id: int):
+    return select(func.count(), func.coalesce(func.sum(File.size_bytes), 0)).where(File.owner_id == user_id)
+
+
+def _analytics_query(user_id: int):
+    """Per-extension file count and bytes, answered from ix_files_owner_extension alone."""
+    return select(
+        File.extension, func.count(), func.coalesce(func.sum(File.size_bytes), 0)
+    ).where(File.owner_id == user_id).group_by(File.extension)
+
+
+def _analytics_response(request, used_bytes: int, quota_bytes: int, groups):
+    groups = sorted(((ext, count, int(size)) for ext, count, size in groups), key=lambda g: (-g[1], g[0]))
+    total_files = sum(count for _, count, _ in groups)
+    total_bytes = sum(size for _, _, size in groups)
+    # A negative max_types would slice from the end and drop the most common types
+    max_types = max(1, min(request.max_types or DEFAULT_ANALYTICS_TYPES, MAX_ANALYTICS_TYPES))
+
+    return auth_pb2.AnalyticsResponse(
+        success=True,
+        message="OK",
+        total_files=total_files,
+        total_bytes=total_bytes,
+        avg_size=total_bytes // total_files if total_files else 0,
+        used_bytes=used_bytes,
+        quota_bytes=quota_bytes,
+        type_count=len(groups),
+        file_types=[
+            auth_pb2.FileTypeStats(extension=ext, count=count, total_bytes=size)
+            for ext, count, size in groups[:max_types]
+        ]
+    )
+
+
+# ---------- RPC logic ----------
+# One implementation of every RPC, shared by AuthService below and
+# auth_server_aio.AsyncAuthService (which runs these on worker threads).
+# A helper that needs the call aborted with a status raises RpcAbort.
+# Helpers that receive a request stream are generators fed one message at
+# a time (msg = yield, None once the stream ends) and return the response:
+# _receive() drives them from a blocking iterator, and the aio server
+# awaits each message on its loop, so no thread waits on a slow client.
+
+class RpcAbort(Exception):
+    """Abort the current call with a gRPC status code and message."""
+
+    def __init__(self, code: grpc.StatusCode, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _call(context, fn, *args):
+    """fn(*args), turning an RpcAbort into context.abort()."""
+    try:
+        return fn(*args)
+    except RpcAbort as e:
+        context.abort(e.code, e.message)
+
+
+def _feed(steps, msg=None):
+    """Send a receiving helper its next message; (True, its response) once it returns."""
+    try:
+        steps.send(msg)
+    except StopIteration as done:
+        return True, done.value
+    return False, None
+
+
+def _receive(steps, messages):
+    """Run a receiving helper over a blocking iterator of request messages."""
+    with closing(steps):
+        done, response = _feed(steps)
+        while not done:
+            done, response = _feed(steps, next(messages, None))
+        return response
+
+
+def _watch_subscribe(metadata, on_change=None):
+    """A change_feed subscription for a WatchChanges caller whose metadata carries WATCH_TOKEN."""
+    if not WATCH_TOKEN:
+        raise RpcAbort(grpc.StatusCode.PERMISSION_DENIED, "WatchChanges is disabled")
+    token = dict(metadata or ()).get("x-watch-token", "")
+    if not hmac.compare_digest(token.encode(), WATCH_TOKEN.encode()):
+        raise RpcAbort(grpc.StatusCode.UNAUTHENTICATED, "Invalid watch token")
+    sub = change_feed.subscribe(on_change=on_change)
+    if sub is None:
+        raise RpcAbort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many WatchChanges subscribers")
+    return sub
+
+
+def _register(request):
+    try:
+        with session_scope() as db:
+            existing = db.query(User.id).filter(User.email == request.email).first()
+        if existing:
+            return auth_pb2.RegisterResponse(success=False, message="User already exists", quota_bytes=0)
+
+        # Hashed outside any session, so a slow bcrypt round never holds a DB connection
+        hashed_pw = password_pool.hash_password(request.password)
+        quota_bytes = 5 * 1024 * 1024 * 1024  # 5GB
+
+        # Generate OTP
+        otp = generate_otp()
+
+        with session_scope() as db:
+            if db.query(User.id).filter(User.email == request.email).first():
+                return auth_pb2.RegisterResponse(success=False, message="User already exists", quota_bytes=0)
 
             user = User(
                 email=request.email,
                 password_hash=hashed_pw,
-                quota_bytes=quota,
-                used_bytes=0
+                quota_bytes=quota_bytes,
+                used_bytes=0,
+                otp=otp,
+                otp_expiry=datetime.now(timezone.utc) + timedelta(minutes=5)
             )
 
             # Handle username if your DB has it
@@ -51,184 +496,592 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
             db.add(user)
             db.commit()
 
-            # Generate OTP
-            otp = generate_otp()
-            user.otp = otp
-            user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-            db.commit()
-
-            send_otp(user.email, otp)
+            if not mail_queue.send_otp(user.email, otp):
+                # Drop the account the client could never verify, so registering again works
+                logging.warning("Register rejected: mail queue full")
+                db.delete(user)
+                db.commit()
+                return auth_pb2.RegisterResponse(success=False, message="Server busy, please retry", quota_bytes=0)
 
             return auth_pb2.RegisterResponse(
                 success=True,
                 message="User registered. OTP sent to email.",
-                quota_bytes=quota
+                quota_bytes=quota_bytes
             )
 
-        except Exception:
-            logging.exception("Register failed")
-            db.rollback()
-            return auth_pb2.RegisterResponse(success=False, message="Internal server error", quota_bytes=0)
-        finally:
-            db.close()
+    except PasswordPoolBusy:
+        logging.warning("Register rejected: password pool saturated")
+        return auth_pb2.RegisterResponse(success=False, message="Server busy, please retry", quota_bytes=0)
+    except Exception:
+        logging.exception("Register failed")
+        return auth_pb2.RegisterResponse(success=False, message="Internal server error", quota_bytes=0)
+
+
+def _login(request):
+    try:
+        with session_scope() as db:
+            row = db.query(User.id, User.password_hash).filter(User.email == request.email).first()
+        if not row:
+            return auth_pb2.LoginResponse(success=False, message="User not found")
+        user_id, password_hash = row
+
+        # bcrypt runs between two short sessions, never holding a DB connection
+        if not password_pool.check_password(request.password, password_hash):
+            return auth_pb2.LoginResponse(success=False, message="Invalid credentials")
+
+        # Upgrade hashes made at a lower cost now that we know the password
+        rehashed = None
+        if password_pool.needs_rehash(password_hash):
+            rehashed = password_pool.hash_password(request.password)
+
+        otp = generate_otp()
+        with session_scope() as db:
+            user = db.query(User).filter(User.id == user_id).first()
+            if user is None:
+                return auth_pb2.LoginResponse(success=False, message="User not found")
+            # Unless the password changed while it was being checked
+            if rehashed is not None and user.password_hash == password_hash:
+                user.password_hash = rehashed
+            user.otp = otp
+            user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
+            email = user.email
+            db.commit()
 
+        if not mail_queue.send_otp(email, otp):
+            logging.warning("Login rejected: mail queue full")
+            return auth_pb2.LoginResponse(success=False, message="Server busy, please retry")
 
-    def Login(self, request, context):
-        db: Session = SessionLocal()
-        try:
+        return auth_pb2.LoginResponse(success=True, message="OTP sent to email")
+
+    except PasswordPoolBusy:
+        logging.warning("Login rejected: password pool saturated")
+        return auth_pb2.LoginResponse(success=False, message="Server busy, please retry")
+    except Exception:
+        logging.exception("Login failed")
+        return auth_pb2.LoginResponse(success=False, message="Internal server error")
+
+
+def _verify_otp(request):
+    try:
+        with session_scope() as db:
             user = db.query(User).filter(User.email == request.email).first()
             if not user:
-                return auth_pb2.LoginResponse(success=False, message="User not found")
+                # FIX: Use OTPResponse (not VerifyOTPResponse)
+                return auth_pb2.OTPResponse(success=False, message="User not found")
 
-            if not check_password(request.password, user.password_hash):
-                return auth_pb2.LoginResponse(success=False, message="Invalid credentials")
+            # Normalize timezone
+            expiry = user.otp_expiry
+            if expiry and expiry.tzinfo is None:
+                expiry = expiry.replace(tzinfo=timezone.utc)
 
-            otp = generate_otp()
-            user.otp = otp
-            user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-            db.commit()
+            if not expiry or expiry < datetime.now(timezone.utc):
+                return auth_pb2.OTPResponse(success=False, message="OTP expired")
 
-            send_otp(user.email, otp)
+            # FIX: Use request.otp_code (not request.otp)
+            if request.otp_code != user.otp:
+                return auth_pb2.OTPResponse(success=False, message="Invalid OTP")
 
-            return auth_pb2.LoginResponse(success=True, message="OTP sent to email")
+            # Clear OTP on success
+            user.otp = None
+            user.otp_expiry = None
+            db.commit()
 
-        except Exception:
-            logging.exception("Login failed")
-            db.rollback()
-            return auth_pb2.LoginResponse(success=False, message="Internal server error")
-        finally:
-            db.close()
+            return auth_pb2.OTPResponse(success=True, message="OTP verified")
+    except Exception as e:
+        logging.error("VerifyOTP failed", exc_info=e)
+        return auth_pb2.OTPResponse(success=False, message="Server error")
 
 
-    def VerifyOTP(self, request, context):
-        try:
-            with SessionLocal() as db:
-                user = db.query(User).filter(User.email == request.email).first()
-                if not user:
-                    # FIX: Use OTPResponse (not VerifyOTPResponse)
-                    return auth_pb2.OTPResponse(success=False, message="User not found")
-
-                # Normalize timezone
-                expiry = user.otp_expiry
-                if expiry and expiry.tzinfo is None:
-                    expiry = expiry.replace(tzinfo=timezone.utc)
-
-                if not expiry or expiry < datetime.now(timezone.utc):
-                    return auth_pb2.OTPResponse(success=False, message="OTP expired")
-
-                # FIX: Use request.otp_code (not request.otp)
-                if request.otp_code != user.otp:
-                    return auth_pb2.OTPResponse(success=False, message="Invalid OTP")
-
-                # Clear OTP on success
-                user.otp = None
-                user.otp_expiry = None
-                db.commit()
+def _upload_stream(messages):
+    return _receive(_upload_steps(), messages)
 
-                return auth_pb2.OTPResponse(success=True, message="OTP verified")
-        except Exception as e:
-            logging.error("VerifyOTP failed", exc_info=e)
-            return auth_pb2.OTPResponse(success=False, message="Server error")
 
+def _upload_steps():
+    tmp_path = None
+    reservation = None
+    unreferenced = None
+    try:
+        first = yield
+        if first is None:
+            return auth_pb2.FileUploadResponse(success=False, message="Empty upload")
 
-    def UploadFile(self, request, context):
-        db: Session = SessionLocal()
-        try:
-            user = db.query(User).filter(User.email == request.email).first()
+        if first.total_size < 0:
+            # Reserved as is, a negative size would hand the user quota
+            raise RpcAbort(grpc.StatusCode.INVALID_ARGUMENT, "Invalid file size")
+
+        # Reserve quota in its own short transaction, committed before streaming starts
+        with session_scope() as db:
+            user = db.query(User.id).filter(User.email == first.email).first()
             if not user:
                 return auth_pb2.FileUploadResponse(success=False, message="User not found")
 
-            safe_name = secure_filename(request.filename)
+            safe_name = secure_filename(first.filename)
             if not safe_name:
                 return auth_pb2.FileUploadResponse(success=False, message="Invalid filename")
 
-            user_dir = os.path.join(STORAGE_DIR, request.email)
-            os.makedirs(user_dir, exist_ok=True)
-            filepath = os.path.join(user_dir, safe_name)
+            old_size = db.query(File.size_bytes).filter(
+                File.owner_id == user.id,
+                File.filename == safe_name
+            ).scalar() or 0
 
-            content_size = len(request.content)
+            reservation = quota.reserve(db, user.id, first.total_size, credit=old_size)
+            if reservation is None:
+                return auth_pb2.FileUploadResponse(success=False, message="Quota exceeded")
+            db.commit()
 
+        reserved = first.total_size
+
+        # Stage into a private temp file so a failed or over-quota stream
+        # never clobbers the previous version.
+        fd, tmp_path = tempfile.mkstemp(dir=blob_store.incoming_dir, suffix=".part")
+        file_hash = hashlib.sha256()
+        content_size = 0
+
+        with os.fdopen(fd, "wb") as f:
+            msg = first
+            while msg is not None:
+                if msg.data:
+                    content_size += len(msg.data)
+                    if content_size > reserved:
+                        added = _grow_reservation(reservation, content_size - reserved)
+                        if not added:
+                            return auth_pb2.FileUploadResponse(success=False, message="Quota exceeded")
+                        reserved += added
+                    f.write(msg.data)
+                    file_hash.update(msg.data)
+                msg = yield
+        if content_size < first.total_size:
+            # Cut short: a cancelled grpc.aio client half-closes first, so its stream just ends
+            return auth_pb2.FileUploadResponse(success=False, message="Incomplete upload")
+        digest = file_hash.hexdigest()
+
+        # Stored before any row is locked; identical content already in the
+        # store is not written again (the blob's chunks rows say which nodes hold it)
+        blob_store.store(tmp_path, digest, content_size, safe_name)
+        tmp_path = None
+        unreferenced = digest
+
+        with session_scope() as db:
+            # Locking read: a concurrent replacement of this file must settle against its result
             existing_file = db.query(File).filter(
                 File.owner_id == user.id,
                 File.filename == safe_name
-            ).first()
+            ).with_for_update().first()
+            old_size = existing_file.size_bytes if existing_file else 0
+
+            if not quota.settle(db, user.id, reservation, content_size - old_size):
+                return auth_pb2.FileUploadResponse(success=False, message="Quota exceeded")
+
+            old_content = _old_content(first.email, existing_file)
+            _replace_file_row(db, user.id, existing_file, safe_name, content_size, digest)
+            db.commit()
+            reservation = None
+            unreferenced = None
+
+        _discard_content(old_content)
+        change_feed.publish(first.email, "upload")
+        return auth_pb2.FileUploadResponse(success=True, message="File uploaded", checksum=digest)
+
+    except RpcAbort:
+        raise
+    except IntegrityError:
+        # Another upload of the same file or chunk committed first (unique index)
+        logging.warning("UploadFileStream conflicted with a concurrent upload")
+        return auth_pb2.FileUploadResponse(success=False, message="Concurrent upload conflict, please retry")
+    except Exception:
+        logging.exception("UploadFileStream failed")
+        return auth_pb2.FileUploadResponse(success=False, message="Internal server error")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if reservation is not None:
+            _release_reservation(reservation)
+        if unreferenced:
+            _unref_blob(unreferenced)
+
+
+def _upload_by_hash(request):
+    try:
+        with session_scope() as db:
+            user = db.query(User.id).filter(User.email == request.email).first()
+            if not user:
+                return auth_pb2.FileUploadResponse(success=False, message="User not found")
 
+            safe_name = secure_filename(request.filename)
+            if not safe_name:
+                return auth_pb2.FileUploadResponse(success=False, message="Invalid filename")
+
+            digest = request.sha256.lower()
+            source_id = db.execute(_hash_source_query(user.id, digest, request.size)).scalar()
+            if source_id is None:
+                # A status, not a message, so clients can tell it from every other failure
+                raise RpcAbort(grpc.StatusCode.NOT_FOUND, "Content not found")
+
+            existing_file = db.query(File).filter(
+                File.owner_id == user.id,
+                File.filename == safe_name
+            ).with_for_update().first()
             old_size = existing_file.size_bytes if existing_file else 0
-            delta = content_size - old_size
 
-            if user.used_bytes + delta > user.quota_bytes:
+            if not quota.settle(db, user.id, None, request.size - old_size):
                 return auth_pb2.FileUploadResponse(success=False, message="Quota exceeded")
 
-            with open(filepath, "wb") as f:
-                f.write(request.content)
+            # Holding the blob's row lock, so it cannot be collected under us
+            blob_store.acquire(db, digest, request.size)
+            if not blob_store.is_stored(db, digest):
+                db.rollback()
+                raise RpcAbort(grpc.StatusCode.NOT_FOUND, "Content not found")
 
-            if existing_file:
-                existing_file.size_bytes = content_size
-                file_row = existing_file
-            else:
-                file_row = File(
-                    owner_id=user.id,
-                    filename=safe_name,
-                    size_bytes=content_size
-                )
-                db.add(file_row)
+            old_content = _old_content(request.email, existing_file)
+            _replace_file_row(db, user.id, existing_file, safe_name, request.size, digest)
+            db.commit()
+            _discard_content(old_content)
+            change_feed.publish(request.email, "upload")
+            return auth_pb2.FileUploadResponse(success=True, message="File uploaded", checksum=digest)
+
+    except RpcAbort:
+        raise
+    except IntegrityError:
+        logging.warning("UploadByHash conflicted with a concurrent upload")
+        return auth_pb2.FileUploadResponse(success=False, message="Concurrent upload conflict, please retry")
+    except Exception:
+        logging.exception("UploadByHash failed")
+        return auth_pb2.FileUploadResponse(success=False, message="Internal server error")
+
+
+def _create_upload_session(request):
+    try:
+        with session_scope() as db:
+            user = db.query(User).filter(User.email == request.email).first()
+            if not user:
+                return auth_pb2.UploadSessionResponse(success=False, message="User not found")
+
+            safe_name = secure_filename(request.filename)
+            if not safe_name:
+                return auth_pb2.UploadSessionResponse(success=False, message="Invalid filename")
+
+            chunk_size = request.chunk_size or DEFAULT_SESSION_CHUNK_SIZE
+            if not MIN_SESSION_CHUNK_SIZE <= chunk_size <= MAX_SESSION_CHUNK_SIZE:
+                return auth_pb2.UploadSessionResponse(success=False, message="Invalid chunk size")
 
-            user.used_bytes += delta
+            if request.total_size < 0:
+                return auth_pb2.UploadSessionResponse(success=False, message="Invalid file size")
+
+            old_size = db.query(File.size_bytes).filter(
+                File.owner_id == user.id,
+                File.filename == safe_name
+            ).scalar() or 0
+
+            transfer = Transfer(
+                user_id=user.id,
+                filename=safe_name,
+                chunk_size=chunk_size,
+                total_chunks=math.ceil(request.total_size / chunk_size),
+                total_bytes=request.total_size,
+                status="in_progress"
+            )
+            db.add(transfer)
+            db.flush()
+
+            # The session holds its quota until CommitUpload (or until the reservation expires)
+            if quota.reserve(db, user.id, request.total_size, credit=old_size,
+                             transfer_id=transfer.id, ttl=quota.SESSION_RESERVATION_TTL) is None:
+                db.rollback()
+                return auth_pb2.UploadSessionResponse(success=False, message="Quota exceeded")
+
+            db.commit()
+            return auth_pb2.UploadSessionResponse(
+                success=True,
+                message="Upload session created",
+                session_id=transfer.id,
+                chunk_size=chunk_size,
+                total_chunks=transfer.total_chunks,
+                missing_chunks=range(transfer.total_chunks)
+            )
+
+    except Exception:
+        logging.exception("CreateUploadSession failed")
+        return auth_pb2.UploadSessionResponse(success=False, message="Internal server error")
+
+
+def _put_chunk(messages):
+    return _receive(_put_chunk_steps(), messages)
+
+
+def _put_chunk_steps():
+    tmp_path = None
+    try:
+        first = yield
+        if first is None:
+            return auth_pb2.PutChunkResponse(success=False, message="Empty chunk")
+
+        with session_scope() as db:
+            transfer = _get_open_session(db, first.email, first.session_id)
+            if not transfer:
+                return auth_pb2.PutChunkResponse(success=False, message="Upload session not found")
+
+            index = first.chunk_index
+            if not 0 <= index < transfer.total_chunks:
+                return auth_pb2.PutChunkResponse(success=False, message="Invalid chunk index")
+
+            session_id = transfer.id
+            expected = min(transfer.chunk_size, transfer.total_bytes - index * transfer.chunk_size)
+
+        # Received into a private file, so a failed or retried PutChunk never
+        # touches the copy of this chunk that may already be recorded
+        fd, tmp_path = upload_sessions.stage_chunk(UPLOAD_SESSION_DIR, session_id, index)
+        chunk_hash = hashlib.sha256()
+        received = 0
+
+        with os.fdopen(fd, "wb") as f:
+            msg = first
+            while msg is not None:
+                if msg.data:
+                    received += len(msg.data)
+                    if received > expected:
+                        return auth_pb2.PutChunkResponse(success=False, message="Chunk too large")
+                    f.write(msg.data)
+                    chunk_hash.update(msg.data)
+                msg = yield
+
+        if received != expected:
+            return auth_pb2.PutChunkResponse(success=False, message="Incomplete chunk")
+
+        checksum = chunk_hash.hexdigest()
+        with session_scope() as db:
+            # The session's row lock keeps the chunk file and its row in step
+            # with concurrent PutChunks, CommitUpload and expiry
+            transfer = _get_open_session(db, first.email, session_id, lock=True)
+            if not transfer:
+                return auth_pb2.PutChunkResponse(success=False, message="Upload session not found")
+
+            os.replace(tmp_path, upload_sessions.chunk_path(UPLOAD_SESSION_DIR, session_id, index))
+            tmp_path = None
 
-            checksum = hashlib.sha256(request.content).hexdigest()
             chunk = db.query(Chunk).filter(
-                Chunk.file_id == file_row.id,
-                Chunk.chunk_index == 0
+                Chunk.transfer_id == session_id,
+                Chunk.chunk_index == index
             ).first()
 
             if chunk:
-                chunk.size_bytes = content_size
+                chunk.size_bytes = received
                 chunk.checksum = checksum
             else:
+                # Staged in the session's directory here; CommitUpload places the whole blob
                 db.add(Chunk(
-                    file_id=file_row.id,
-                    chunk_index=0,
-                    size_bytes=content_size,
-                    node_id=1,
+                    transfer_id=session_id,
+                    chunk_index=index,
+                    size_bytes=received,
                     checksum=checksum
                 ))
 
             db.commit()
-            return auth_pb2.FileUploadResponse(success=True, message="File uploaded")
+            return auth_pb2.PutChunkResponse(success=True, message="Chunk stored", checksum=checksum)
+
+    except IntegrityError:
+        # Another upload of the same file or chunk committed first (unique index)
+        logging.warning("PutChunk conflicted with a concurrent upload")
+        return auth_pb2.PutChunkResponse(success=False, message="Concurrent upload conflict, please retry")
+    except Exception:
+        logging.exception("PutChunk failed")
+        return auth_pb2.PutChunkResponse(success=False, message="Internal server error")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _get_upload_status(request):
+    try:
+        with session_scope() as db:
+            transfer = _get_open_session(db, request.email, request.session_id)
+            if not transfer:
+                return auth_pb2.UploadSessionResponse(success=False, message="Upload session not found")
+
+            return auth_pb2.UploadSessionResponse(
+                success=True,
+                message="Upload in progress",
+                session_id=transfer.id,
+                chunk_size=transfer.chunk_size,
+                total_chunks=transfer.total_chunks,
+                missing_chunks=_missing_chunks(db, transfer)
+            )
 
-        except Exception:
-            logging.exception("UploadFile failed")
-            db.rollback()
-            return auth_pb2.FileUploadResponse(success=False, message="Internal server error")
-        finally:
-            db.close()
+    except Exception:
+        logging.exception("GetUploadStatus failed")
+        return auth_pb2.UploadSessionResponse(success=False, message="Internal server error")
 
 
-    def DownloadFile(self, request, context):
-        try:
-            safe_name = secure_filename(request.filename)
-            if not safe_name:
-                return auth_pb2.FileDownloadResponse(content=b"", message="Invalid filename")
+def _commit_upload(request):
+    claimed = None
+    assembled = None
+    unreferenced = None
+    try:
+        with session_scope() as db:
+            transfer = _get_open_session(db, request.email, request.session_id, lock=True)
+            if not transfer:
+                return auth_pb2.FileUploadResponse(success=False, message="Upload session not found")
+
+            if _missing_chunks(db, transfer):
+                return auth_pb2.FileUploadResponse(success=False, message="Upload incomplete")
 
-            user_dir = os.path.join(STORAGE_DIR, request.email)
-            filepath = os.path.join(user_dir, safe_name)
+            checksums = dict(
+                db.query(Chunk.chunk_index, Chunk.checksum).filter(Chunk.transfer_id == transfer.id).all()
+            )
+            # Claimed until this call completes or reopens it: PutChunk, a second
+            # CommitUpload and GetUploadStatus no longer find the session
+            transfer.status = "committing"
+            session_id, filename, total_bytes = transfer.id, transfer.filename, transfer.total_bytes
+            db.commit()
+            claimed = session_id
+
+        assembled, checksum, corrupt = upload_sessions.assemble(
+            UPLOAD_SESSION_DIR, session_id, checksums, blob_store.incoming_dir
+        )
+        if corrupt:
+            logging.warning("Upload session %s: chunks %s do not match their checksums", session_id, corrupt)
+            with session_scope() as db:
+                # Reported missing again, so the client resends them
+                db.query(Chunk).filter(
+                    Chunk.transfer_id == session_id,
+                    Chunk.chunk_index.in_(corrupt)
+                ).delete(synchronize_session=False)
+                db.commit()
+            return auth_pb2.FileUploadResponse(success=False, message="Upload incomplete")
+
+        blob_store.store(assembled, checksum, total_bytes, filename)
+        assembled = None
+        unreferenced = checksum
+
+        with session_scope() as db:
+            transfer = db.query(Transfer).filter(
+                Transfer.id == session_id,
+                Transfer.status == "committing"
+            ).with_for_update().first()
+            if not transfer:
+                # Expired while the chunks were assembled
+                claimed = None
+                return auth_pb2.FileUploadResponse(success=False, message="Upload session not found")
 
-            if not os.path.exists(filepath):
-                return auth_pb2.FileDownloadResponse(content=b"", message="File not found")
+            existing_file = db.query(File).filter(
+                File.owner_id == transfer.user_id,
+                File.filename == transfer.filename
+            ).with_for_update().first()
+            old_size = existing_file.size_bytes if existing_file else 0
 
-            with open(filepath, "rb") as f:
-                content = f.read()
+            reservation = quota.session_reservation(db, transfer.id)
+            if not quota.settle(db, transfer.user_id, reservation, transfer.total_bytes - old_size):
+                return auth_pb2.FileUploadResponse(success=False, message="Quota exceeded")
 
-            return auth_pb2.FileDownloadResponse(content=content, message="File downloaded")
+            old_content = _old_content(request.email, existing_file)
+            file_row = _replace_file_row(
+                db, transfer.user_id, existing_file, transfer.filename, transfer.total_bytes, checksum
+            )
+            db.query(Chunk).filter(Chunk.transfer_id == transfer.id).update(
+                {Chunk.file_id: file_row.id}, synchronize_session=False
+            )
 
-        except Exception:
-            logging.exception("DownloadFile failed")
-            return auth_pb2.FileDownloadResponse(content=b"", message="Internal server error")
+            created_at = transfer.created_at
+            transfer.file_id = file_row.id
+            transfer.status = "completed"
+            if created_at:
+                transfer.duration_ms = int((datetime.utcnow() - created_at).total_seconds() * 1000)
 
+            db.commit()
+            claimed = None
+            unreferenced = None
+
+        upload_sessions.discard(UPLOAD_SESSION_DIR, session_id)
+        _discard_content(old_content)
+        change_feed.publish(request.email, "upload")
+        return auth_pb2.FileUploadResponse(success=True, message="File uploaded", checksum=checksum)
+
+    except IntegrityError:
+        # Another upload of the same file or chunk committed first (unique index)
+        logging.warning("CommitUpload conflicted with a concurrent upload")
+        return auth_pb2.FileUploadResponse(success=False, message="Concurrent upload conflict, please retry")
+    except Exception:
+        logging.exception("CommitUpload failed")
+        return auth_pb2.FileUploadResponse(success=False, message="Internal server error")
+    finally:
+        if assembled and os.path.exists(assembled):
+            os.remove(assembled)
+        if unreferenced:
+            _unref_blob(unreferenced)
+        if claimed is not None:
+            try:
+                _run_tx(upload_sessions.reopen, claimed)
+            except Exception:
+                # Stays claimed until the session reaper expires it
+                logging.exception("Failed to reopen upload session %s", claimed)
+
+
+def _download_file(request):
+    try:
+        safe_name = secure_filename(request.filename)
+        if not safe_name:
+            return auth_pb2.FileDownloadResponse(content=b"", message="Invalid filename")
+
+        with session_scope() as db:
+            stored = db.execute(_stored_file_query(request.email, safe_name)).first()
+            chunks = blob_store.locate(db, stored.blob_hash) if stored and stored.blob_hash else []
+
+        if not stored:
+            return auth_pb2.FileDownloadResponse(content=b"", message="File not found")
 
-    def DeleteFile(self, request, context):
-        db: Session = SessionLocal()
         try:
+            f, _, _ = _open_content(request.email, safe_name, stored.blob_hash, stored.codec, chunks)
+        except FileNotFoundError:
+            return auth_pb2.FileDownloadResponse(content=b"", message="File not found")
+        with f:
+            content = f.read()
+
+        return auth_pb2.FileDownloadResponse(content=content, message="File downloaded")
+
+    except Exception:
+        logging.exception("DownloadFile failed")
+        return auth_pb2.FileDownloadResponse(content=b"", message="Internal server error")
+
+
+def _download_stream(request):
+    safe_name = secure_filename(request.filename)
+    if not safe_name:
+        raise RpcAbort(grpc.StatusCode.INVALID_ARGUMENT, "Invalid filename")
+
+    with session_scope() as db:
+        stored = db.execute(_stored_file_query(request.email, safe_name)).first()
+        chunks = blob_store.locate(db, stored.blob_hash) if stored and stored.blob_hash else []
+    if not stored:
+        raise RpcAbort(grpc.StatusCode.NOT_FOUND, "File not found")
+
+    try:
+        f, total_size, etag = _open_content(request.email, safe_name, stored.blob_hash, stored.codec, chunks)
+    except FileNotFoundError:
+        raise RpcAbort(grpc.StatusCode.NOT_FOUND, "File not found")
+
+    with f:
+        offset = request.offset
+        if offset < 0 or request.length < 0 or offset > total_size:
+            raise RpcAbort(grpc.StatusCode.OUT_OF_RANGE, "Requested range not satisfiable")
+
+        end = total_size if not request.length else min(total_size, offset + request.length)
+        f.seek(offset)
+
+        # Always send at least one message so the caller learns total_size.
+        if offset == end:
+            yield auth_pb2.FileDataChunk(data=b"", offset=offset, total_size=total_size, etag=etag)
+            return
+
+        while offset < end:
+            data = f.read(min(STREAM_CHUNK_SIZE, end - offset))
+            if not data:
+                break
+            yield auth_pb2.FileDataChunk(data=data, offset=offset, total_size=total_size, etag=etag)
+            offset += len(data)
+
+
+def _delete_file(request):
+    try:
+        with session_scope() as db:
             user = db.query(User).filter(User.email == request.email).first()
             if not user:
                 return auth_pb2.FileDeleteResponse(success=False, message="User not found")
@@ -245,57 +1098,45 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
             if not file:
                 return auth_pb2.FileDeleteResponse(success=False, message="File not found")
 
-            user_dir = os.path.join(STORAGE_DIR, request.email)
-            filepath = os.path.join(user_dir, safe_name)
-
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except Exception:
-                    logging.exception("Failed to remove file")
+            old_content = _old_content(request.email, file)
+            if file.blob_hash:
+                blob_store.release(db, file.blob_hash)
 
             db.query(Chunk).filter(Chunk.file_id == file.id).delete()
+            db.query(Transfer).filter(Transfer.file_id == file.id).delete()
 
-            user.used_bytes = max(0, user.used_bytes - file.size_bytes)
+            quota.free(db, user.id, file.size_bytes)
 
             db.delete(file)
             db.commit()
+            _discard_content(old_content)
+            change_feed.publish(request.email, "delete")
 
             return auth_pb2.FileDeleteResponse(success=True, message="File deleted")
 
-        except Exception:
-            logging.exception("DeleteFile failed")
-            db.rollback()
-            return auth_pb2.FileDeleteResponse(success=False, message="Internal server error")
-        finally:
-            db.close()
+    except Exception:
+        logging.exception("DeleteFile failed")
+        return auth_pb2.FileDeleteResponse(success=False, message="Internal server error")
 
 
-    def ListFiles(self, request, context):
-        db: Session = SessionLocal()
-        try:
-            user = db.query(User).filter(User.email == request.email).first()
-            if not user:
-                return auth_pb2.ListFilesResponse(files=[])
+def _list_files(request):
+    try:
+        query, page_size = _list_files_query(request)
+    except ValueError as e:
+        raise RpcAbort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
 
-            file_records = db.query(File).filter(File.owner_id == user.id).all()
-            file_infos = [
-                auth_pb2.FileInfo(filename=f.filename, size=f.size_bytes)
-                for f in file_records
-            ]
+    try:
+        with session_scope() as db:
+            return _list_files_response(request, db.execute(query).all(), page_size)
 
-            return auth_pb2.ListFilesResponse(files=file_infos)
+    except Exception:
+        logging.exception("ListFiles failed")
+        return auth_pb2.ListFilesResponse(files=[])
 
-        except Exception:
-            logging.exception("ListFiles failed")
-            return auth_pb2.ListFilesResponse(files=[])
-        finally:
-            db.close()
 
-
-    def GetQuota(self, request, context):
-        db: Session = SessionLocal()
-        try:
+def _get_quota(request):
+    try:
+        with session_scope() as db:
             user = db.query(User).filter(User.email == request.email).first()
             if not user:
                 return auth_pb2.QuotaResponse(used_bytes=0, total_bytes=0)
@@ -305,18 +1146,167 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
                 total_bytes=user.quota_bytes
             )
 
-        except Exception:
-            logging.exception("GetQuota failed")
-            return auth_pb2.QuotaResponse(used_bytes=0, total_bytes=0)
+    except Exception:
+        logging.exception("GetQuota failed")
+        return auth_pb2.QuotaResponse(used_bytes=0, total_bytes=0)
+
+
+def _get_storage_analytics(request):
+    try:
+        with session_scope() as db:
+            user = db.query(User.id, User.used_bytes, User.quota_bytes).filter(
+                User.email == request.email
+            ).first()
+            if not user:
+                return auth_pb2.AnalyticsResponse(success=False, message="User not found")
+
+            groups = db.execute(_analytics_query(user.id)).all()
+            return _analytics_response(request, user.used_bytes, user.quota_bytes, groups)
+
+    except Exception:
+        logging.exception("GetStorageAnalytics failed")
+        return auth_pb2.AnalyticsResponse(success=False, message="Internal server error")
+
+
+def _get_dashboard(request):
+    page = request.page if request.HasField("page") else None
+    if page and page.cursor:
+        try:
+            _decode_cursor(page.cursor, page.sort_by, page.descending)
+        except ValueError as e:
+            raise RpcAbort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    try:
+        with session_scope() as db:
+            user = db.query(User.id, User.used_bytes, User.quota_bytes).filter(
+                User.email == request.email
+            ).first()
+            if not user:
+                return auth_pb2.DashboardResponse(success=False, message="User not found")
+
+            total_files, total_bytes = db.execute(_file_totals_query(user.id)).one()
+            response = auth_pb2.DashboardResponse(
+                success=True,
+                message="OK",
+                used_bytes=user.used_bytes,
+                quota_bytes=user.quota_bytes,
+                total_files=total_files,
+                total_bytes=int(total_bytes)
+            )
+
+            if page:
+                query, page_size = _list_files_query(page, owner_id=user.id)
+                response.page.CopyFrom(_list_files_response(page, db.execute(query).all(), page_size))
+
+            return response
+
+    except Exception:
+        logging.exception("GetDashboard failed")
+        return auth_pb2.DashboardResponse(success=False, message="Internal server error")
+
+
+class AuthService(auth_pb2_grpc.AuthServiceServicer):
+
+    def Register(self, request, context):
+        return _call(context, _register, request)
+
+
+    def Login(self, request, context):
+        return _call(context, _login, request)
+
+
+    def VerifyOTP(self, request, context):
+        return _call(context, _verify_otp, request)
+
+
+    def UploadFile(self, request, context):
+        # Same write path as the streaming RPC, fed from the in-memory content.
+        return _call(context, _upload_stream, _iter_upload_chunks(request))
+
+
+    def UploadFileStream(self, request_iterator, context):
+        return _call(context, _upload_stream, request_iterator)
+
+
+    def UploadByHash(self, request, context):
+        return _call(context, _upload_by_hash, request)
+
+
+    def CreateUploadSession(self, request, context):
+        return _call(context, _create_upload_session, request)
+
+
+    def PutChunk(self, request_iterator, context):
+        return _call(context, _put_chunk, request_iterator)
+
+
+    def GetUploadStatus(self, request, context):
+        return _call(context, _get_upload_status, request)
+
+
+    def CommitUpload(self, request, context):
+        return _call(context, _commit_upload, request)
+
+
+    def DownloadFile(self, request, context):
+        return _call(context, _download_file, request)
+
+
+    def DownloadFileStream(self, request, context):
+        try:
+            yield from _download_stream(request)
+        except RpcAbort as e:
+            context.abort(e.code, e.message)
+
+
+    def DeleteFile(self, request, context):
+        return _call(context, _delete_file, request)
+
+
+    def ListFiles(self, request, context):
+        return _call(context, _list_files, request)
+
+
+    def GetQuota(self, request, context):
+        return _call(context, _get_quota, request)
+
+
+    def GetStorageAnalytics(self, request, context):
+        return _call(context, _get_storage_analytics, request)
+
+
+    def GetDashboard(self, request, context):
+        return _call(context, _get_dashboard, request)
+
+
+    def WatchChanges(self, request, context):
+        """
+        Stream file changes until the client goes away. Holds one worker
+        thread for its whole life; serve() adds a thread per allowed
+        subscriber so watchers never starve the other RPCs.
+        """
+        try:
+            sub = _watch_subscribe(context.invocation_metadata())
+        except RpcAbort as e:
+            context.abort(e.code, e.message)
+        try:
+            # Empty email first: the subscriber may have missed changes while disconnected
+            yield auth_pb2.ChangeEvent(email="", reason="subscribed")
+            while context.is_active():
+                change = sub.get(timeout=1.0)
+                if change:
+                    yield auth_pb2.ChangeEvent(email=change[0], reason=change[1])
         finally:
-            db.close()
+            change_feed.unsubscribe(sub)
 
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    init()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=RPC_THREADS + WATCH_MAX_SUBSCRIBERS))
     auth_pb2_grpc.add_AuthServiceServicer_to_server(AuthService(), server)
     server.add_insecure_port('[::]:50051')
     server.start()
+    start_workers()
 
     print("\n" + "=" * 70)
     print("🚀 CloudSim Auth Server Started (PRODUCTION MODE)")
@@ -327,7 +1317,11 @@ def serve():
     print("=" * 70 + "\n")
 
     logging.info("Server started on port 50051")
-    server.wait_for_termination()
+    try:
+        server.wait_for_termination()
+    finally:
+        # Cancels open WatchChanges streams, whose worker threads would otherwise block exit
+        server.stop(grace=5)
 
 
 if __name__ == "__main__":
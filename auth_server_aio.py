@@ -0,0 +1,192 @@
+import os
+import grpc
+import asyncio
+import logging
+from concurrent import futures
+
+import auth_pb2, auth_pb2_grpc
+import auth_server
+from auth_server import (
+    RpcAbort, _iter_upload_chunks, _feed,
+    _register, _login, _verify_otp, _upload_stream, _upload_steps, _upload_by_hash, _create_upload_session,
+    _put_chunk_steps, _get_upload_status, _commit_upload, _download_file, _download_stream, _delete_file,
+    _list_files, _get_quota, _get_storage_analytics, _get_dashboard, _watch_subscribe
+)
+
+# grpc.aio variant of auth_server.AuthService. The RPCs' logic lives in
+# auth_server.py, once; here each call runs it on a worker thread, so the
+# event loop only does the network side and never waits on the database,
+# the disks or bcrypt. Streams hold no thread while they wait on the client:
+# each uploaded message is awaited on the loop, then fed to the helper on a
+# worker thread, and each downloaded piece is read on one and sent from here.
+#
+#   AIO_RPC_THREADS  worker threads for the work of calls in progress
+#                    (default 32; each may hold a DB connection, see DB_POOL_SIZE)
+
+AIO_RPC_THREADS = int(os.getenv("AIO_RPC_THREADS", "32"))
+
+
+# ---------- Helpers ----------
+async def _first(iterator):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _receive(context, steps, request_iterator):
+    """auth_server._receive() for a request stream read on the loop."""
+    messages = request_iterator.__aiter__()
+    step = asyncio.ensure_future(asyncio.to_thread(_feed, steps))
+    try:
+        done, response = await asyncio.shield(step)
+        while not done:
+            msg = await _first(messages)
+            step = asyncio.ensure_future(asyncio.to_thread(_feed, steps, msg))
+            done, response = await asyncio.shield(step)
+        return response
+    except RpcAbort as e:
+        await context.abort(e.code, e.message)
+    finally:
+        # A cancelled call may leave a step running; the helper's cleanup waits for it
+        await asyncio.wait([step])
+        await asyncio.to_thread(steps.close)
+
+
+async def _call(context, fn, *args):
+    """fn(*args) on a worker thread, turning an RpcAbort into context.abort()."""
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except RpcAbort as e:
+        await context.abort(e.code, e.message)
+
+
+class AsyncAuthService(auth_pb2_grpc.AuthServiceServicer):
+
+    async def Register(self, request, context):
+        return await _call(context, _register, request)
+
+
+    async def Login(self, request, context):
+        return await _call(context, _login, request)
+
+
+    async def VerifyOTP(self, request, context):
+        return await _call(context, _verify_otp, request)
+
+
+    async def UploadFile(self, request, context):
+        return await _call(context, _upload_stream, _iter_upload_chunks(request))
+
+
+    async def UploadFileStream(self, request_iterator, context):
+        return await _receive(context, _upload_steps(), request_iterator)
+
+
+    async def UploadByHash(self, request, context):
+        return await _call(context, _upload_by_hash, request)
+
+
+    async def CreateUploadSession(self, request, context):
+        return await _call(context, _create_upload_session, request)
+
+
+    async def PutChunk(self, request_iterator, context):
+        return await _receive(context, _put_chunk_steps(), request_iterator)
+
+
+    async def GetUploadStatus(self, request, context):
+        return await _call(context, _get_upload_status, request)
+
+
+    async def CommitUpload(self, request, context):
+        return await _call(context, _commit_upload, request)
+
+
+    async def DownloadFile(self, request, context):
+        return await _call(context, _download_file, request)
+
+
+    async def DownloadFileStream(self, request, context):
+        stream = _download_stream(request)
+        try:
+            while True:
+                data = await asyncio.to_thread(next, stream, None)
+                if data is None:
+                    break
+                yield data
+        except RpcAbort as e:
+            await context.abort(e.code, e.message)
+        finally:
+            # Closes the file on the worker side, wherever the stream stopped
+            await asyncio.to_thread(stream.close)
+
+
+    async def DeleteFile(self, request, context):
+        return await _call(context, _delete_file, request)
+
+
+    async def ListFiles(self, request, context):
+        return await _call(context, _list_files, request)
+
+
+    async def GetQuota(self, request, context):
+        return await _call(context, _get_quota, request)
+
+
+    async def GetStorageAnalytics(self, request, context):
+        return await _call(context, _get_storage_analytics, request)
+
+
+    async def GetDashboard(self, request, context):
+        return await _call(context, _get_dashboard, request)
+
+
+    async def WatchChanges(self, request, context):
+        # Waits on the loop, not on a worker thread: publish() wakes it
+        loop, wakeup = asyncio.get_running_loop(), asyncio.Event()
+        try:
+            sub = _watch_subscribe(context.invocation_metadata(), lambda: loop.call_soon_threadsafe(wakeup.set))
+        except RpcAbort as e:
+            await context.abort(e.code, e.message)
+        try:
+            # Empty email first: the subscriber may have missed changes while disconnected
+            yield auth_pb2.ChangeEvent(email="", reason="subscribed")
+            while not context.done():
+                # Cleared before looking, so a change delivered after the look still wakes us
+                wakeup.clear()
+                change = sub.get(0)
+                if change is None:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), 1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                yield auth_pb2.ChangeEvent(email=change[0], reason=change[1])
+        finally:
+            auth_server.change_feed.unsubscribe(sub)
+
+
+async def serve(port: int = 50052):
+    auth_server.init()
+    asyncio.get_running_loop().set_default_executor(
+        futures.ThreadPoolExecutor(max_workers=AIO_RPC_THREADS, thread_name_prefix="rpc")
+    )
+    server = grpc.aio.server()
+    auth_pb2_grpc.add_AuthServiceServicer_to_server(AsyncAuthService(), server)
+    server.add_insecure_port(f"[::]:{port}")
+    await server.start()
+    auth_server.start_workers()
+
+    print("\n" + "=" * 70)
+    print("🚀 CloudSim Auth Server Started (grpc.aio)")
+    print("=" * 70)
+    print(f"📡 Listening on port: {port}")
+    print("=" * 70 + "\n")
+
+    logging.info("Async server started on port %d", port)
+    await server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,140 @@
+# bench_compression.py
+"""
+Disk usage and throughput of each storage codec (compression.py) on
+synthetic datasets shaped like typical uploads, next to raw storage:
+
+    python bench_compression.py --size-mb 32 --codecs zlib:1,zlib:6,lzma:0,lzma:6
+
+For every dataset it also prints what CompressionPolicy would decide from
+its sampled ratio. "write" is the compression rate, "read" a full
+sequential read, "range" the mean time for a random 64KB range read.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from compression import Codec, CompressionPolicy, DEFAULT_FRAME_SIZE, open_stored
+
+READ_SIZE = 1024 * 1024
+RANGE_SIZE = 64 * 1024
+RANGE_READS = 200
+
+
+def _log_lines(rng: random.Random):
+    levels = ["INFO", "INFO", "INFO", "DEBUG", "WARNING", "ERROR"]
+    paths = ["/dashboard", "/upload", "/download", "/api/files", "/login", "/analytics"]
+    t = 1_700_000_000
+    while True:
+        t += rng.randint(0, 3)
+        yield (f"2024-01-01T{t % 86400 // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}Z {rng.choice(levels)} "
+               f"req={rng.getrandbits(32):08x} {rng.choice(paths)} status={rng.choice([200, 200, 302, 404, 500])} "
+               f"ms={rng.randint(1, 900)}\n")
+
+
+def _csv_lines(rng: random.Random):
+    yield "id,user,email,country,amount,created_at\n"
+    n = 0
+    while True:
+        n += 1
+        yield (f"{n},user{rng.randint(1, 5000)},user{rng.randint(1, 5000)}@example.com,"
+               f"{rng.choice(['KE', 'US', 'DE', 'IN', 'BR'])},{rng.uniform(0, 1000):.2f},"
+               f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}\n")
+
+
+def _json_lines(rng: random.Random):
+    while True:
+        yield json.dumps({
+            "id": rng.getrandbits(40), "type": rng.choice(["upload", "download", "delete"]),
+            "file": {"name": f"file_{rng.randint(1, 999)}.txt", "size": rng.randint(1, 10 ** 7)},
+            "tags": rng.sample(["work", "home", "photos", "backup", "shared"], 2),
+        }) + "\n"
+
+
+def write_dataset(path: str, kind: str, size: int, seed: int = 42):
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        if kind == "random":
+            f.write(os.urandom(size))
+            return
+        lines = {"log": _log_lines, "csv": _csv_lines, "json": _json_lines}[kind](rng)
+        written = 0
+        while written < size:
+            block = "".join(next(lines) for _ in range(1000)).encode()[:size - written]
+            f.write(block)
+            written += len(block)
+
+
+def measure(path: str, size: int, compressed: bool):
+    rng = random.Random(7)
+    start = time.perf_counter()
+    f, _ = open_stored(path, compressed)
+    with f:
+        while f.read(READ_SIZE):
+            pass
+    read_s = time.perf_counter() - start
+
+    f, _ = open_stored(path, compressed)
+    with f:
+        start = time.perf_counter()
+        for _ in range(RANGE_READS):
+            f.seek(rng.randrange(max(1, size - RANGE_SIZE)))
+            f.read(RANGE_SIZE)
+        range_ms = (time.perf_counter() - start) / RANGE_READS * 1000
+    return read_s, range_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="storage compression benchmark")
+    parser.add_argument("--size-mb", type=float, default=16, help="size of each dataset")
+    parser.add_argument("--datasets", default="log,csv,json,random")
+    parser.add_argument("--codecs", default="zlib:1,zlib:6,lzma:0,lzma:6")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE)
+    parser.add_argument("--dir", help="scratch directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(dir=args.dir)
+    size = int(args.size_mb * 1024 * 1024)
+    mb = size / (1024 * 1024)
+    codecs = [Codec.parse(spec) for spec in args.codecs.split(",")]
+
+    try:
+        print(f"{args.size_mb:g}MB per dataset, {args.frame_size // 1024}KB frames")
+        print(f"{'dataset':<8}{'codec':<9}{'ratio':>7}{'stored MB':>11}{'write MB/s':>12}"
+              f"{'read MB/s':>11}{'range ms':>10}")
+        for kind in args.datasets.split(","):
+            raw_path = os.path.join(workdir, f"{kind}.raw")
+            write_dataset(raw_path, kind, size)
+
+            policy = CompressionPolicy(codecs[0], frame_size=args.frame_size)
+            with open(raw_path, "rb") as f:
+                sampled = policy.sampled_ratio(f, size)
+                decision = "compress" if policy.should_compress(f, size, kind) else "store raw"
+            print(f"{kind:<8}sampled ratio {sampled:.2f} -> policy would {decision}")
+
+            read_s, range_ms = measure(raw_path, size, compressed=False)
+            print(f"{'':<8}{'raw':<9}{1.0:>7.2f}{mb:>11.1f}{'':>12}{mb / read_s:>11.0f}{range_ms:>10.3f}")
+
+            for codec in codecs:
+                framed_path = os.path.join(workdir, f"{kind}.{codec.name}")
+                policy = CompressionPolicy(codec, min_ratio=0, frame_size=args.frame_size)
+                start = time.perf_counter()
+                stored = policy.compress_file(raw_path, framed_path, kind) or size
+                write_s = time.perf_counter() - start
+                if not os.path.exists(framed_path):
+                    print(f"{'':<8}{str(codec):<9}  larger than raw, would be stored raw")
+                    continue
+                read_s, range_ms = measure(framed_path, size, compressed=True)
+                print(f"{'':<8}{str(codec):<9}{size / stored:>7.2f}{stored / 1024 / 1024:>11.1f}"
+                      f"{mb / write_s:>12.1f}{mb / read_s:>11.0f}{range_ms:>10.3f}")
+                os.remove(framed_path)
+            os.remove(raw_path)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
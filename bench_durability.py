@@ -0,0 +1,91 @@
+# bench_durability.py
+"""
+Cost of each STORAGE_DURABILITY policy for the upload write path
+(stage to a temp file, sync, rename into place, sync the directory),
+with many writers at once as under concurrent uploads.
+
+    python bench_durability.py --dir storage/.bench --writers 32 --size 262144
+
+Run it on the filesystem that holds STORAGE_DIR: a tmpfs /tmp makes every
+sync free and the policies indistinguishable.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import List
+
+from durable_io import Durability, POLICIES
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _writer(durability: Durability, directory: str, worker: int, files: int,
+            payload: bytes, latencies: List[float]):
+    for n in range(files):
+        start = time.perf_counter()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".bench.", suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            durability.sync_file(f)
+        durability.replace(tmp_path, os.path.join(directory, f"w{worker}_{n}.bin"))
+        latencies.append(time.perf_counter() - start)
+
+
+def run_policy(policy: str, directory: str, writers: int, files: int, payload: bytes, window: float):
+    durability = Durability(policy, window)
+    os.makedirs(directory, exist_ok=True)
+    latencies: List[float] = []
+
+    threads = [
+        threading.Thread(target=_writer, args=(durability, directory, w, files, payload, latencies))
+        for w in range(writers)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(directory)
+
+    latencies.sort()
+    group = durability._group
+    return {
+        "files_per_s": len(latencies) / elapsed,
+        "mb_per_s": len(latencies) * len(payload) / elapsed / (1024 * 1024),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "batch": (group.syncs / group.batches) if group and group.batches else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="storage durability policy benchmark")
+    parser.add_argument("--dir", default=os.path.join("storage", ".bench"),
+                        help="scratch directory, removed afterwards")
+    parser.add_argument("--policies", default=",".join(POLICIES))
+    parser.add_argument("--writers", type=int, default=16, help="concurrent uploads")
+    parser.add_argument("--files", type=int, default=50, help="files per writer")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="bytes per file")
+    parser.add_argument("--window-ms", type=float, default=2.0, help="group commit window")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    print(f"writers={args.writers} files={args.files} size={args.size} dir={args.dir}")
+    print(f"{'policy':<12}{'files/s':>10}{'MB/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'syncs/batch':>13}")
+    for policy in args.policies.split(","):
+        r = run_policy(policy.strip(), args.dir, args.writers, args.files, payload, args.window_ms / 1000)
+        print(f"{policy:<12}{r['files_per_s']:>10.1f}{r['mb_per_s']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['batch']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
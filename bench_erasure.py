@@ -0,0 +1,63 @@
+# bench_erasure.py
+"""
+Encode and decode throughput of erasure.py's Reed-Solomon codes, in MB/s
+of chunk data, with the disk overhead of each next to n-way replication:
+
+    python bench_erasure.py --codes 4+2,6+3,10+4 --chunk-size 4194304
+
+"decode" reads a chunk back from its data fragments (a concatenation),
+"lost 1" and "lost m" with that many data fragments missing (a matrix
+inversion and one product per missing fragment), and "rebuild 1" is
+repair recomputing one lost parity fragment.
+"""
+import argparse
+import os
+import time
+
+from erasure import ReedSolomon
+
+
+def rate(fn, size: int, seconds: float) -> float:
+    """MB/s of fn() over size bytes, repeated for about seconds."""
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return runs * size / elapsed / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="erasure coding benchmark")
+    parser.add_argument("--codes", default="4+2,6+3,10+4")
+    parser.add_argument("--chunk-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each measurement")
+    args = parser.parse_args()
+
+    data = os.urandom(args.chunk_size)
+    print(f"{args.chunk_size // 1024}KB chunks, MB/s of chunk data")
+    print(f"{'code':<9}{'overhead':>9}{'survives':>9}{'encode':>9}{'decode':>9}{'lost 1':>9}"
+          f"{'lost m':>9}{'rebuild 1':>11}")
+    for spec in args.codes.split(","):
+        rs = ReedSolomon.parse(spec)
+        fragments = dict(enumerate(rs.encode(data)))
+        assert rs.decode(fragments, len(data)) == data
+        lost_one = {i: f for i, f in fragments.items() if i != 0}
+        lost_m = {i: f for i, f in fragments.items() if i >= rs.m}
+        assert rs.decode(lost_m, len(data)) == data
+
+        results = [
+            rate(lambda: rs.encode(data), len(data), args.seconds),
+            rate(lambda: rs.decode(fragments, len(data)), len(data), args.seconds),
+            rate(lambda: rs.decode(lost_one, len(data)), len(data), args.seconds),
+            rate(lambda: rs.decode(lost_m, len(data)), len(data), args.seconds),
+            rate(lambda: rs.reconstruct(lost_one, [rs.n - 1]), len(data), args.seconds),
+        ]
+        print(f"{str(rs):<9}{rs.n / rs.k:>8.2f}x{rs.m:>9}" + "".join(f"{r:>9.0f}" for r in results[:4])
+              + f"{results[4]:>11.0f}")
+    print(f"{'replicas':<9}{'':>9}{'':>9}  n copies cost n.00x and survive n-1 losses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench_hash_ring.py
+"""
+Balance and data movement of hash_ring.py's weighted consistent hashing,
+next to plain "hash mod N" placement:
+
+    python bench_hash_ring.py --chunks 200000 --vnodes 1,16,64,128,256
+
+Balance is the standard deviation, across nodes, of utilization
+(bytes placed / capacity) with the cluster filled to --fill; 0 means every
+disk fills at the same rate. Then one node joins and one leaves, and each
+strategy reports the share of the data whose node changed, next to the
+ideal (the share the joining or leaving node owns).
+"""
+import argparse
+import statistics
+from typing import Callable, Dict, List, Tuple
+
+from hash_ring import HashRing, ring_hash
+
+# name, capacity MB, bandwidth Mbps: the controller's cluster, scaled to MB
+DEFAULT_NODES = "node1:512000:1000,node2:1024000:2000,node3:512000:1000,node4:1024000:2000"
+DEFAULT_JOIN = "node5:1024000:2000"
+
+
+def parse_nodes(spec: str) -> List[Tuple[str, float, float]]:
+    nodes = []
+    for entry in spec.split(","):
+        name, capacity_mb, *bandwidth = entry.strip().split(":")
+        nodes.append((name, float(capacity_mb), float(bandwidth[0]) if bandwidth else 1000.0))
+    return nodes
+
+
+def build_ring(nodes, vnodes: int) -> HashRing:
+    ring = HashRing(vnodes=vnodes, reference_capacity_mb=nodes[0][1], reference_bandwidth_mbps=nodes[0][2])
+    for name, capacity_mb, bandwidth in nodes:
+        ring.add_node(name, capacity_mb, bandwidth)
+    return ring
+
+
+def ring_placer(nodes, vnodes: int) -> Callable[[str], str]:
+    return build_ring(nodes, vnodes).node_for
+
+
+def modulo_placer(nodes, _vnodes: int = 0) -> Callable[[str], str]:
+    names = [name for name, _, _ in nodes]
+    return lambda key: names[ring_hash(key) % len(names)]
+
+
+def utilization_stdev(nodes, owners: List[str], chunk_bytes: float) -> Tuple[float, float]:
+    """(stdev, max) of per-node utilization in percent."""
+    placed: Dict[str, int] = {name: 0 for name, _, _ in nodes}
+    for owner in owners:
+        placed[owner] += 1
+    utilization = [placed[name] * chunk_bytes / (capacity_mb * 1024 * 1024) * 100
+                   for name, capacity_mb, _ in nodes]
+    return statistics.pstdev(utilization), max(utilization)
+
+
+def moved(before: List[str], after: List[str]) -> float:
+    return sum(a != b for a, b in zip(before, after)) / len(before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="consistent hash ring benchmark")
+    parser.add_argument("--nodes", default=DEFAULT_NODES, help="name:capacity_mb:bandwidth_mbps,...")
+    parser.add_argument("--join", default=DEFAULT_JOIN, help="node added for the movement test")
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--fill", type=float, default=0.5, help="fraction of total capacity placed")
+    parser.add_argument("--vnodes", default="1,16,64,128,256")
+    args = parser.parse_args()
+
+    nodes = parse_nodes(args.nodes)
+    joined = nodes + parse_nodes(args.join)
+    leave = max(nodes, key=lambda node: node[1])
+    left = [node for node in nodes if node is not leave]
+
+    total_bytes = sum(capacity_mb for _, capacity_mb, _ in nodes) * 1024 * 1024 * args.fill
+    chunk_bytes = total_bytes / args.chunks
+    keys = [f"{ring_hash(str(i)):016x}.{i % 16}" for i in range(args.chunks)]
+
+    # Shares of a finely divided ring approach each node's weight share
+    join_ideal = build_ring(joined, 1024).shares()[joined[-1][0]]
+    leave_ideal = build_ring(nodes, 1024).shares()[leave[0]]
+
+    print(f"{len(nodes)} nodes, {args.chunks} chunks of {chunk_bytes / 1024 / 1024:.1f}MB, "
+          f"filled to {args.fill:.0%}")
+    print(f"join {joined[-1][0]} (ideal {join_ideal:.1%} moved), leave {leave[0]} (ideal {leave_ideal:.1%} moved)")
+    print(f"{'strategy':<14}{'util stdev %':>14}{'max util %':>12}{'join moved':>12}{'leave moved':>13}")
+
+    strategies = [("modulo", modulo_placer, 0)]
+    strategies += [(f"ring v={v}", ring_placer, int(v)) for v in args.vnodes.split(",")]
+    for label, make, vnodes in strategies:
+        before = list(map(make(nodes, vnodes), keys))
+        stdev, peak = utilization_stdev(nodes, before, chunk_bytes)
+        after_join = list(map(make(joined, vnodes), keys))
+        after_leave = list(map(make(left, vnodes), keys))
+        print(f"{label:<14}{stdev:>14.2f}{peak:>12.1f}{moved(before, after_join):>12.1%}"
+              f"{moved(before, after_leave):>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
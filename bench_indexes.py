@@ -0,0 +1,120 @@
+# bench_indexes.py
+"""
+Times the hot File / Chunk lookups before and after migrate_db() adds the
+composite indexes, on a freshly seeded database.
+
+    python bench_indexes.py                          # temporary SQLite file
+    python bench_indexes.py --url mysql+pymysql://root:pw@localhost/bench
+
+The target database is wiped first; never point --url at real data.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, File, Chunk, make_engine, migrate_db
+
+# Everything migrate_db() is expected to (re)create
+COMPOSITE_INDEXES = {
+    "files": ["uq_files_owner_filename", "ix_files_owner_size", "ix_files_owner_created"],
+    "chunks": ["uq_chunks_file_index", "uq_chunks_transfer_index"],
+}
+
+
+def seed(engine, users: int, files_per_user: int, chunks_per_file: int, duplicates: int):
+    """Create the pre-migration schema (no composite indexes) and fill it."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table_name, names in COMPOSITE_INDEXES.items():
+            for index in Base.metadata.tables[table_name].indexes:
+                if index.name in names:
+                    index.drop(conn)
+
+        conn.execute(insert(User), [
+            {"id": u, "email": f"user{u}@example.com", "password_hash": "x",
+             "quota_bytes": 1 << 40, "used_bytes": 0}
+            for u in range(1, users + 1)
+        ])
+
+        file_id = 0
+        for u in range(1, users + 1):
+            file_rows, chunk_rows = [], []
+            for n in range(files_per_user):
+                file_id += 1
+                file_rows.append({"id": file_id, "owner_id": u, "filename": f"file_{n:05d}.bin",
+                                  "size_bytes": chunks_per_file * 1024})
+                chunk_rows.extend({"file_id": file_id, "chunk_index": c, "size_bytes": 1024,
+                                   "node_id": 1, "checksum": "0" * 64}
+                                  for c in range(chunks_per_file))
+            conn.execute(insert(File), file_rows)
+            conn.execute(insert(Chunk), chunk_rows)
+
+        # Rows the old schema allowed and the unique indexes forbid
+        conn.execute(insert(File), [
+            {"owner_id": u, "filename": "file_00000.bin", "size_bytes": 1}
+            for u in random.sample(range(1, users + 1), duplicates)
+        ])
+
+
+def time_lookups(Session, users: int, files_per_user: int, chunks_per_file: int, count: int):
+    rng = random.Random(42)
+    with Session() as db:
+        start = time.perf_counter()
+        for _ in range(count):
+            db.query(File).filter(
+                File.owner_id == rng.randint(1, users),
+                File.filename == f"file_{rng.randrange(files_per_user):05d}.bin"
+            ).first()
+        mid = time.perf_counter()
+        for _ in range(count):
+            db.query(Chunk).filter(
+                Chunk.file_id == rng.randint(1, users * files_per_user),
+                Chunk.chunk_index == rng.randrange(chunks_per_file)
+            ).first()
+        end = time.perf_counter()
+    return (mid - start) / count * 1000, (end - mid) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="files/chunks composite index benchmark")
+    parser.add_argument("--url", help="database to wipe and use (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--files-per-user", type=int, default=100)
+    parser.add_argument("--chunks-per-file", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+
+    total_files = args.users * args.files_per_user
+    print(f"Seeding {args.users} users, {total_files} files, "
+          f"{total_files * args.chunks_per_file} chunks into {engine.url.render_as_string()}")
+    start = time.perf_counter()
+    seed(engine, args.users, args.files_per_user, args.chunks_per_file, duplicates=min(10, args.users))
+    print(f"  seeded in {time.perf_counter() - start:.1f}s")
+
+    shape = (args.users, args.files_per_user, args.chunks_per_file, args.lookups)
+    before = time_lookups(Session, *shape)
+
+    start = time.perf_counter()
+    summary = migrate_db(engine)
+    print(f"migrate_db: {time.perf_counter() - start:.1f}s {summary}")
+
+    after = time_lookups(Session, *shape)
+
+    print(f"{'lookup':<28}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for label, b, a in (("files(owner_id, filename)", before[0], after[0]),
+                        ("chunks(file_id, chunk_index)", before[1], after[1])):
+        print(f"{label:<28}{b:>12.3f}{a:>12.3f}{b / a:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_replication.py
+"""
+Hot-file read throughput against the replication factor, and the write
+cost of each replication mode, on a StorageVirtualNetwork whose nodes
+simulate their link bandwidth (one chunk at a time per node):
+
+    python bench_replication.py --nodes 8 --chunks 2 --replicas 1,2,3,4 --readers 16
+
+Every reader reads the whole hot file, chunk by chunk, through
+read_replica(); with least_loaded reads spread over all replicas, so the
+aggregate rate should grow with the replication factor until it runs out
+of nodes. "write ms" is the mean time to store one chunk on all replicas.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from hash_ring import HashRing
+from storage_disk import StorageDisk
+from storage_virtual_network import StorageVirtualNetwork, READ_POLICIES, REPLICATION_MODES
+from storage_virtual_node import StorageVirtualNode
+
+
+def build_network(workdir: str, nodes: int, bandwidth_mbps: int, replicas: int,
+                  mode: str, policy: str) -> StorageVirtualNetwork:
+    network = StorageVirtualNetwork(replication_factor=replicas, replication_mode=mode, read_policy=policy)
+    for i in range(nodes):
+        name = f"node{i + 1}"
+        disk = StorageDisk(1024, "SSD", os.path.join(workdir, name))
+        node = StorageVirtualNode(name, cpu_capacity=4, memory_capacity=16, storage_capacity_mb=1024,
+                                  bandwidth=bandwidth_mbps, disk=disk)
+        node.simulate_bandwidth = True
+        network.add_node(node)
+    # A ring of links, so chained writes and "nearest" reads have routes to follow
+    for i in range(nodes):
+        network.connect_nodes(f"node{i + 1}", f"node{(i + 1) % nodes + 1}", bandwidth_mbps)
+    return network
+
+
+def run(network: StorageVirtualNetwork, chunks: int, chunk_size: int, readers: int, rounds: int):
+    ring = HashRing.from_network(network)
+    payload = os.urandom(chunk_size)
+    keys = [f"hot.{i}" for i in range(chunks)]
+
+    start = time.perf_counter()
+    replicas = {key: network.write_replicas(key, payload, ring.preference(key), source="node1") for key in keys}
+    write_ms = (time.perf_counter() - start) / chunks * 1000
+
+    def reader():
+        for _ in range(rounds):
+            for key in keys:
+                network.read_replica(key, replicas[key], source="node1", expected_size=chunk_size)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    read_mb = readers * rounds * chunks * chunk_size / (1024 * 1024)
+    return write_ms, read_mb / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replication benchmark")
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--bandwidth", type=int, default=400, help="simulated Mbps per node")
+    parser.add_argument("--chunks", type=int, default=2, help="chunks in the hot file")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    parser.add_argument("--replicas", default="1,2,3,4")
+    parser.add_argument("--modes", default=",".join(REPLICATION_MODES))
+    parser.add_argument("--policies", default=",".join(READ_POLICIES))
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=2, help="times each reader reads the file")
+    args = parser.parse_args()
+
+    print(f"{args.nodes} nodes at {args.bandwidth}Mbps, hot file of {args.chunks} x "
+          f"{args.chunk_size // 1024}KB, {args.readers} readers")
+    print(f"{'replicas':>8}  {'mode':<10}{'policy':<14}{'write ms':>10}{'read MB/s':>11}")
+    for replicas in map(int, args.replicas.split(",")):
+        for mode in args.modes.split(","):
+            for policy in args.policies.split(","):
+                workdir = tempfile.mkdtemp()
+                try:
+                    network = build_network(workdir, args.nodes, args.bandwidth, replicas, mode, policy)
+                    write_ms, read_rate = run(network, args.chunks, args.chunk_size, args.readers, args.rounds)
+                finally:
+                    shutil.rmtree(workdir)
+                print(f"{replicas:>8}  {mode:<10}{policy:<14}{write_ms:>10.1f}{read_rate:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
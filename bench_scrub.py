@@ -0,0 +1,109 @@
+# bench_scrub.py
+"""
+Scrub throughput, and what a running scrub costs foreground reads, on a
+StorageVirtualNetwork whose nodes are filled with chunk-sized files:
+
+    python bench_scrub.py --nodes 4 --files 64 --readers 8 --rates 0,50,200,-1 --workers 4
+
+Each row runs the readers (each reading random chunks through
+read_chunk(), as placement does) for --seconds while a Scrubber at that
+rate in MB/s keeps making passes; rate 0 means no scrub at all and -1 an
+unthrottled one. "scrub MB/s" is what the scrubber verified per second,
+next to the readers' aggregate MB/s and per-read latency. The files stay
+in the page cache, so this measures the CPU the scrub takes from the
+readers (sha256 per byte) rather than disk contention.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from scrubber import Scrubber
+from storage_disk import StorageDisk
+from storage_virtual_network import StorageVirtualNetwork
+from storage_virtual_node import StorageVirtualNode
+
+
+def build_network(workdir: str, nodes: int, files: int, chunk_size: int) -> StorageVirtualNetwork:
+    network = StorageVirtualNetwork()
+    capacity_mb = files * chunk_size // (1024 * 1024) + 16
+    for i in range(nodes):
+        name = f"node{i + 1}"
+        disk = StorageDisk(capacity_mb, "SSD", os.path.join(workdir, name))
+        node = StorageVirtualNode(name, cpu_capacity=4, memory_capacity=16, storage_capacity_mb=capacity_mb,
+                                  bandwidth=1000, disk=disk)
+        network.add_node(node)
+        for j in range(files):
+            node.store_chunk(f"chunk{j}", os.urandom(chunk_size))
+    return network
+
+
+def run(network: StorageVirtualNetwork, files: int, chunk_size: int, readers: int, seconds: float,
+        rate: float, workers: int):
+    """(scrub MB/s, read MB/s, p50 ms, p99 ms) over seconds of reads with a scrub at rate going."""
+    stop = threading.Event()
+    scrubbed = []
+    scrubber = Scrubber(network, rate_mb=max(rate, 0), workers=workers)
+
+    def scrub():
+        while not stop.is_set():
+            scrubbed.append(scrubber.run_once().bytes)
+
+    latencies = []
+
+    def reader(seed: int):
+        rng, names = random.Random(seed), list(network.nodes)
+        while not stop.is_set():
+            start = time.perf_counter()
+            network.nodes[rng.choice(names)].read_chunk(f"chunk{rng.randrange(files)}")
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    if rate:
+        threads.append(threading.Thread(target=scrub))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    scrubber.stop()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    mb = 1024 * 1024
+    return (sum(scrubbed) / seconds / mb, len(latencies) * chunk_size / seconds / mb,
+            statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scrubber benchmark")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--files", type=int, default=64, help="chunk files per node")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rates", default="0,50,200,-1", help="scrub MB/s caps (0 = no scrub, -1 = unthrottled)")
+    parser.add_argument("--workers", type=int, default=4, help="scrub threads")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        network = build_network(workdir, args.nodes, args.files, args.chunk_size)
+        print(f"{args.nodes} nodes x {args.files} files of {args.chunk_size // 1024}KB, "
+              f"{args.readers} readers, {args.workers} scrub workers")
+        print(f"{'scrub cap':>10}{'scrub MB/s':>12}{'read MB/s':>11}{'p50 ms':>9}{'p99 ms':>9}")
+        for rate in map(float, args.rates.split(",")):
+            label = "off" if rate == 0 else "none" if rate < 0 else f"{rate:g}"
+            scrub_rate, read_rate, p50, p99 = run(network, args.files, args.chunk_size, args.readers,
+                                                  args.seconds, rate, args.workers)
+            print(f"{label:>10}{scrub_rate:>12.1f}{read_rate:>11.1f}{p50:>9.2f}{p99:>9.2f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
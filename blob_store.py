@@ -0,0 +1,377 @@
+# blob_store.py
+"""
+Content-addressed storage for uploaded files.
+
+Each distinct content is stored once, at <root>/<hash[:2]>/<hash> named by
+its sha256, and File.blob_hash points at it. The blobs table counts the
+File rows referencing each blob, so identical uploads (by one user or by
+many) share one copy on disk. Quota is still charged per File row.
+
+Reference protocol, so a concurrent upload never loses a blob to cleanup:
+
+- an upload calls store(), which commits an acquire() first, so the
+  count keeps collect() away while put() writes the content outside any
+  transaction; only record() takes the blobs row lock, briefly. The
+  upload then points its File row at the blob in a transaction of its
+  own, or calls unref() if it gives up. (UploadByHash, which writes
+  nothing, calls acquire() and is_stored() in that one transaction.)
+- a File that stops pointing at a blob calls release() in its transaction,
+  and collect() once that has committed; collect() deletes the row only if
+  the count is still 0 and removes the file before committing, so a racing
+  upload either keeps the blob referenced or waits and then re-creates it
+
+With a CompressionPolicy, put() stores compressible content in
+compression.py's framed format and record() notes the codec on the blobs
+row, which open() uses to decompress.
+
+With a ChunkPlacement (placement.py), put() writes the stored bytes to the
+storage nodes instead of <root>, record() adds the blob's chunks rows, and
+readers pass locate()'s result to open(). Either way is_stored() is the
+"already have it" check. Two uploads of the same new content may both
+put() it; the first to record() wins and the other deletes the chunks it
+placed that the winner's rows do not name.
+
+tier_cold() erasure-codes the replicated chunks of blobs a ColdDataPolicy
+(erasure.py) calls cold, and repair() rebuilds lost fragments; both switch
+a blob's chunks rows under its blobs row lock, so collect() waits for them.
+
+Files stored before the blob store have blob_hash NULL and stay at
+storage/<email>/<filename> until `python blob_store.py` imports them
+(run it with the servers stopped).
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from typing import BinaryIO, List, Optional, Tuple
+
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from compression import CompressionPolicy, FramedReader, open_stored
+from durable_io import Durability
+from erasure import ColdDataPolicy
+from models import Blob, Chunk, File, User, session_scope, file_extension
+from placement import ChunkLocation, ChunkPlacement
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            file_hash.update(data)
+    return file_hash.hexdigest()
+
+
+class BlobStore:
+
+    def __init__(self, root: str, durability: Durability, compression: Optional[CompressionPolicy] = None,
+                 placement: Optional[ChunkPlacement] = None):
+        self.root = root
+        self.durability = durability
+        self.compression = compression
+        self.placement = placement
+        # Uploads are staged here, on the same filesystem, so put() is a rename
+        self.incoming_dir = os.path.join(root, ".incoming")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def is_stored(self, db: Session, digest: str) -> bool:
+        """Whether digest's content is on disk here or on the nodes."""
+        if os.path.exists(self.path(digest)):
+            return True
+        return self.placement is not None and db.execute(
+            select(Chunk.id).where(Chunk.blob_hash == digest).limit(1)
+        ).first() is not None
+
+    def put(self, staged_path: str, digest: str,
+            filename: str = "") -> Tuple[Optional[str], int, Optional[List[ChunkLocation]]]:
+        """
+        Move a fully written file into the store under digest (the caller
+        has checked is_stored()), compressed if the policy says so (filename
+        only feeds its extension check). Returns (codec or None, bytes
+        stored, chunk locations or None if kept locally) for record().
+        """
+        codec = None
+        stored_bytes = os.path.getsize(staged_path)
+        if self.compression:
+            framed_path = staged_path + ".mcz"
+            framed_bytes = self.compression.compress_file(staged_path, framed_path, file_extension(filename))
+            if framed_bytes is not None:
+                os.remove(staged_path)
+                staged_path, codec, stored_bytes = framed_path, str(self.compression.codec), framed_bytes
+
+        if self.placement and stored_bytes:
+            locations = self.placement.write(staged_path, digest)
+            os.remove(staged_path)
+            return codec, stored_bytes, locations
+
+        target = self.path(digest)
+        directory = os.path.dirname(target)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            self.durability.sync_dir(self.root)
+
+        with open(staged_path, "r+b") as f:
+            self.durability.sync_file(f)
+        self.durability.replace(staged_path, target)
+        return codec, stored_bytes, None
+
+    def remove(self, digest: str, locations: List[ChunkLocation] = ()):
+        """Delete a blob's content: its local file, and the chunks claim_garbage() returned."""
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+        if locations and self.placement:
+            self.placement.delete(digest, locations)
+
+    def open(self, digest: str, compressed: bool, locations: List[ChunkLocation] = ()) -> Tuple[BinaryIO, int]:
+        """Open a blob for reading, from the nodes if locate() found chunks; returns (file object, size)."""
+        if not locations:
+            return open_stored(self.path(digest), compressed)
+        f = self.placement.open(digest, locations)
+        if compressed:
+            f = FramedReader(f)
+        return f, f.size
+
+    # ---------- Reference counts (caller commits) ----------
+    def acquire(self, db: Session, digest: str, size: int):
+        """Count one more File referencing digest, creating its row; call before put()."""
+        bump = update(Blob).where(Blob.hash == digest).values(refcount=Blob.refcount + 1)
+        if db.execute(bump).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                db.execute(insert(Blob).values(hash=digest, size_bytes=size, refcount=1))
+        except IntegrityError:
+            # A concurrent upload of the same content inserted it first
+            db.execute(bump)
+
+    def record(self, db: Session, digest: str, codec: Optional[str], stored_bytes: int,
+               locations: Optional[List[ChunkLocation]] = None):
+        """Note how put() stored a new blob."""
+        db.execute(update(Blob).where(Blob.hash == digest).values(codec=codec, stored_bytes=stored_bytes))
+        if locations is not None:
+            self.placement.record(db, digest, locations)
+
+    def locate(self, db: Session, digest: str) -> List[ChunkLocation]:
+        """Where a blob's chunks are on the nodes; empty if it is stored locally."""
+        return self.placement.locate(db, digest) if self.placement else []
+
+    def store(self, staged_path: str, digest: str, size: int, filename: str = ""):
+        """
+        Take a reference to digest's content for a File about to point at
+        it, moving the staged file into the store unless identical content
+        is there already. Commits its own short transactions and holds no
+        lock while the bytes are compressed and placed; the caller points
+        the File at digest afterwards, or calls unref() if it does not.
+        """
+        with session_scope() as db:
+            self.acquire(db, digest, size)
+            db.commit()
+        try:
+            with session_scope() as db:
+                stored = self.is_stored(db, digest)
+            if stored:
+                os.remove(staged_path)
+                return
+            codec, stored_bytes, locations = self.put(staged_path, digest, filename)
+            duplicate = None
+            with session_scope() as db:
+                db.execute(select(Blob.hash).where(Blob.hash == digest).with_for_update())
+                recorded = self.locate(db, digest)
+                if locations is not None and recorded:
+                    # A concurrent upload of the same content recorded its chunks first
+                    duplicate = self.placement.subtract(digest, locations, recorded)
+                else:
+                    self.record(db, digest, codec, stored_bytes, locations)
+                db.commit()
+            if duplicate:
+                self.placement.delete(digest, duplicate)
+        except Exception:
+            self.unref(digest)
+            raise
+
+    def unref(self, digest: str):
+        """Drop a reference store() took for a File that never pointed at the blob."""
+        with session_scope() as db:
+            self.release(db, digest)
+            db.commit()
+        with session_scope() as db:
+            self.collect(db, digest)
+            db.commit()
+
+    def release(self, db: Session, digest: str):
+        db.execute(update(Blob).where(Blob.hash == digest, Blob.refcount > 0).values(
+            refcount=Blob.refcount - 1
+        ))
+
+    def claim_garbage(self, db: Session, digest: str) -> Optional[List[ChunkLocation]]:
+        """
+        Delete digest's rows if nothing references it and return its chunk
+        locations (empty if stored locally), or None if it is still in use.
+        The caller passes them to remove(), then commits.
+        """
+        if db.execute(delete(Blob).where(Blob.hash == digest, Blob.refcount <= 0)).rowcount != 1:
+            return None
+        return self.placement.claim(db, digest) if self.placement else []
+
+    def collect(self, db: Session, digest: str) -> bool:
+        """After a release() has committed: remove the blob if it is no longer referenced."""
+        locations = self.claim_garbage(db, digest)
+        if locations is None:
+            return False
+        self.remove(digest, locations)
+        return True
+
+    # ---------- Maintenance ----------
+    def recount(self, db: Session) -> int:
+        """Reset every refcount from the files table; returns how many had drifted."""
+        actual = select(func.count(File.id)).where(File.blob_hash == Blob.hash).scalar_subquery()
+        return db.execute(
+            update(Blob).where(Blob.refcount != actual).values(refcount=actual)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def sweep(self) -> int:
+        """Collect every unreferenced blob, one transaction each; returns how many were removed."""
+        with session_scope() as db:
+            garbage = db.execute(select(Blob.hash).where(Blob.refcount <= 0)).scalars().all()
+        removed = 0
+        for digest in garbage:
+            with session_scope() as db:
+                if self.collect(db, digest):
+                    removed += 1
+                db.commit()
+        return removed
+
+    def _relocate(self, digest: str, relocate) -> Optional[List[ChunkLocation]]:
+        """
+        Move a placed blob's chunks with relocate(locations) -> new locations
+        and switch its rows over, in one transaction under the blobs row
+        lock; returns the chunks left unreferenced (None if nothing changed).
+        """
+        with session_scope() as db:
+            locations = self.placement.locate(db, digest)
+        if not locations:
+            return None
+        moved = relocate(locations)
+        if moved == locations:
+            return None
+        with session_scope() as db:
+            live = db.execute(
+                select(Blob.hash).where(Blob.hash == digest, Blob.refcount > 0).with_for_update()
+            ).first()
+            if live is None or self.placement.locate(db, digest) != locations:
+                # Collected or moved by someone else meanwhile: drop what relocate() wrote
+                db.rollback()
+                self.placement.delete(digest, [location for location in moved if location not in locations])
+                return None
+            stale = self.placement.replace(db, digest, moved)
+            db.commit()
+        return stale
+
+    def tier_cold(self, policy: ColdDataPolicy, grace: float = 30.0) -> int:
+        """
+        Erasure-code the placed blobs the policy calls cold; returns how many.
+        Their replicas are deleted grace seconds after the last switch, so
+        downloads that located them just before can finish.
+        """
+        if self.placement is None:
+            return 0
+        if policy.code.n > len(self.placement.network.nodes):
+            logging.warning("Not erasure-coding cold blobs: %s needs %d nodes, only %d are configured",
+                            policy.code, policy.code.n, len(self.placement.network.nodes))
+            return 0
+        with session_scope() as db:
+            cold = db.execute(
+                select(Blob.hash).where(
+                    Blob.refcount > 0, Blob.created_at < policy.cutoff(), Blob.stored_bytes >= policy.min_bytes,
+                    select(Chunk.id).where(Chunk.blob_hash == Blob.hash, Chunk.erasure.is_(None)).exists()
+                )
+            ).scalars().all()
+
+        stale = []
+        for digest in cold:
+            encode = lambda locations: self.placement.encode(digest, locations, policy.code)
+            try:
+                replaced = self._relocate(digest, encode)
+            except OSError as e:
+                logging.warning("Blob %s stays replicated: %s", digest, e)
+                continue
+            if replaced is not None:
+                stale.append((digest, replaced))
+        if stale:
+            time.sleep(grace)
+        for digest, locations in stale:
+            self.placement.delete(digest, locations)
+        return len(stale)
+
+    def repair(self) -> int:
+        """Rebuild the lost fragments of every erasure-coded blob; returns how many blobs needed it."""
+        if self.placement is None:
+            return 0
+        with session_scope() as db:
+            coded = db.execute(
+                select(Chunk.blob_hash).where(Chunk.blob_hash.isnot(None), Chunk.erasure.isnot(None)).distinct()
+            ).scalars().all()
+        repaired = 0
+        for digest in coded:
+            stale = self._relocate(digest, lambda locations: self.placement.rebuild(digest, locations))
+            if stale is not None:
+                self.placement.delete(digest, stale)
+                repaired += 1
+        return repaired
+
+    def import_legacy(self, storage_dir: str) -> int:
+        """Move files stored under storage_dir/<email>/<filename> into the store; returns how many."""
+        with session_scope() as db:
+            legacy = db.execute(
+                select(File.id, File.filename, User.email).join(User, File.owner_id == User.id)
+                .where(File.blob_hash.is_(None))
+            ).all()
+
+        imported = 0
+        for file_id, filename, email in legacy:
+            path = os.path.join(storage_dir, email, filename)
+            if not os.path.exists(path):
+                logging.warning("Legacy file %s is missing, leaving it unimported", path)
+                continue
+            digest = hash_file(path)
+            self.store(path, digest, os.path.getsize(path), filename)
+            with session_scope() as db:
+                db.execute(update(File).where(File.id == file_id).values(blob_hash=digest))
+                db.commit()
+            imported += 1
+        return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="blob store maintenance")
+    parser.add_argument("--storage-dir", default="storage")
+    parser.add_argument("--grace", type=float, default=30.0,
+                        help="seconds to keep replicas of newly erasure-coded blobs for readers in flight")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    durability = Durability.from_env()
+    store = BlobStore(os.path.join(args.storage_dir, "blobs"), durability, CompressionPolicy.from_env(),
+                      ChunkPlacement.from_env(args.storage_dir, durability))
+    print(f"imported {store.import_legacy(args.storage_dir)} legacy files")
+    with session_scope() as db:
+        drifted = store.recount(db)
+        db.commit()
+    print(f"corrected {drifted} refcounts")
+    print(f"removed {store.sweep()} unreferenced blobs")
+    if store.placement:
+        cold_policy = ColdDataPolicy.from_env()
+        if cold_policy:
+            print(f"erasure-coded {store.tier_cold(cold_policy, args.grace)} cold blobs as {cold_policy.code}")
+        print(f"rebuilt lost fragments of {store.repair()} blobs")
@@ -0,0 +1,76 @@
+# change_feed.py
+import logging
+import queue
+import threading
+from typing import Callable, Optional, Set, Tuple
+
+# (email, reason); an empty email means "anything may have changed"
+Change = Tuple[str, str]
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue of changes. If the subscriber falls behind
+    and the queue overflows, pending changes are discarded and the next get()
+    returns a single catch-all change instead.
+    """
+
+    def __init__(self, max_pending: int = 1000, on_change: Optional[Callable[[], None]] = None):
+        self._queue: "queue.Queue[Change]" = queue.Queue(maxsize=max_pending)
+        self._overflowed = False
+        # Called from the publishing thread after each delivery, e.g. to wake an event loop
+        self._on_change = on_change
+
+    def deliver(self, change: Change):
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self._overflowed = True
+        if self._on_change:
+            self._on_change()
+
+    def get(self, timeout: float) -> Optional[Change]:
+        """Next change, or None if nothing arrived within timeout (0: do not wait)."""
+        if self._overflowed:
+            self._overflowed = False
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            return ("", "overflow")
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeFeed:
+    """
+    In-process fan-out of "this user's files changed" notifications, served
+    to front-ends over AuthService.WatchChanges so they can drop cached views.
+    """
+
+    def __init__(self, max_subscribers: int = 0):
+        self.max_subscribers = max_subscribers  # 0 = no limit
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, max_pending: int = 1000,
+                  on_change: Optional[Callable[[], None]] = None) -> Optional[Subscription]:
+        """A new subscription, or None if max_subscribers are already subscribed."""
+        sub = Subscription(max_pending, on_change)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, email: str, reason: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.deliver((email, reason))
+        if subscribers:
+            logging.debug("Change for %s (%s) sent to %d subscribers", email, reason, len(subscribers))
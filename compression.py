@@ -0,0 +1,232 @@
+# compression.py
+"""
+Framed compression for stored files.
+
+A compressed file is cut into fixed-size frames that are compressed
+independently and followed by an index of frame offsets, so a byte range
+is served by decompressing only the frames it overlaps:
+
+    header  "MCZ1" codec:u8 frame_size:u32 raw_size:u64
+    frames  one compressed block per frame_size bytes of input
+    index   frame_count x offset:u64
+    footer  index_offset:u64 "MCZ1"
+
+CompressionPolicy decides per file whether compressing pays: types that are
+already compressed are skipped by extension, everything else by compressing
+a few samples and checking the ratio.
+"""
+import io
+import lzma
+import math
+import os
+import struct
+import zlib
+from typing import BinaryIO, Optional, Tuple
+
+MAGIC = b"MCZ1"
+_HEADER = struct.Struct("<4sBIQ")
+_FOOTER = struct.Struct("<Q4s")
+_OFFSET = struct.Struct("<Q")
+
+DEFAULT_FRAME_SIZE = 256 * 1024
+
+# What reading a damaged framed file raises: a torn header, footer or index, or a frame that will not decompress
+CORRUPT_ERRORS = (OSError, ValueError, EOFError, IndexError, struct.error, zlib.error, lzma.LZMAError)
+
+# Formats that are compressed already; compressing them again only costs CPU
+SKIP_EXTENSIONS = frozenset({
+    "zip", "gz", "tgz", "bz2", "xz", "zst", "7z", "rar", "jar", "apk",
+    "jpg", "jpeg", "png", "gif", "webp", "heic", "avif",
+    "mp3", "m4a", "aac", "ogg", "flac", "mp4", "m4v", "mkv", "mov", "avi", "webm",
+    "pdf", "docx", "xlsx", "pptx", "odt", "ods", "epub",
+})
+
+
+class Codec:
+    """A stdlib compressor and its level, written as "zlib", "zlib:9" or "lzma:1"."""
+
+    IDS = {"zlib": 1, "lzma": 2}
+    DEFAULT_LEVELS = {"zlib": 6, "lzma": 1}
+
+    def __init__(self, name: str, level: Optional[int] = None):
+        if name not in self.IDS:
+            raise ValueError(f"Unknown codec {name!r}, expected one of {sorted(self.IDS)}")
+        self.name = name
+        self.id = self.IDS[name]
+        self.level = self.DEFAULT_LEVELS[name] if level is None else level
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Codec"]:
+        """Codec for a spec string; None for "" or "none"."""
+        spec = spec.strip().lower()
+        if spec in ("", "none"):
+            return None
+        name, _, level = spec.partition(":")
+        return cls(name, int(level) if level else None)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.id == 1:
+            return zlib.compress(data, self.level)
+        return lzma.compress(data, preset=self.level)
+
+    def __str__(self):
+        return f"{self.name}:{self.level}"
+
+
+def _decompress(codec_id: int, data: bytes) -> bytes:
+    if codec_id == 1:
+        return zlib.decompress(data)
+    if codec_id == 2:
+        return lzma.decompress(data)
+    raise ValueError(f"Unknown codec id {codec_id}")
+
+
+def write_framed(src: BinaryIO, dst: BinaryIO, raw_size: int, codec: Codec,
+                 frame_size: int = DEFAULT_FRAME_SIZE) -> int:
+    """Compress raw_size bytes from src into dst; returns the bytes written."""
+    start = dst.tell()
+    dst.write(_HEADER.pack(MAGIC, codec.id, frame_size, raw_size))
+    offsets = []
+    for data in iter(lambda: src.read(frame_size), b""):
+        offsets.append(dst.tell() - start)
+        dst.write(codec.compress(data))
+    index_offset = dst.tell() - start
+    dst.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+    dst.write(_FOOTER.pack(index_offset, MAGIC))
+    return dst.tell() - start
+
+
+def compress_bytes(data: bytes, codec: Codec, frame_size: int = DEFAULT_FRAME_SIZE) -> bytes:
+    out = io.BytesIO()
+    write_framed(io.BytesIO(data), out, len(data), codec, frame_size)
+    return out.getvalue()
+
+
+class FramedReader:
+    """Seekable, read-only view of the original bytes of a framed file."""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        magic, self._codec_id, self.frame_size, self.size = _HEADER.unpack(f.read(_HEADER.size))
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        index_offset, end_magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError("Not a framed compressed file")
+
+        count = math.ceil(self.size / self.frame_size)
+        f.seek(index_offset)
+        self._offsets = [offset for (offset,) in _OFFSET.iter_unpack(f.read(count * _OFFSET.size))]
+        self._offsets.append(index_offset)
+
+        self._pos = 0
+        self._frame_index = -1
+        self._frame = b""
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def _load(self, index: int) -> bytes:
+        if index != self._frame_index:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            self._f.seek(start)
+            self._frame = _decompress(self._codec_id, self._f.read(end - start))
+            self._frame_index = index
+        return self._frame
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = self.size - self._pos
+        pieces = []
+        while n > 0 and self._pos < self.size:
+            index = self._pos // self.frame_size
+            start = self._pos - index * self.frame_size
+            piece = self._load(index)[start:start + n]
+            pieces.append(piece)
+            self._pos += len(piece)
+            n -= len(piece)
+        return b"".join(pieces)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_stored(path: str, compressed: bool) -> Tuple[BinaryIO, int]:
+    """Open stored content for reading; returns the file object and the original size."""
+    f = open(path, "rb")
+    if compressed:
+        try:
+            reader = FramedReader(f)
+        except Exception:
+            f.close()
+            raise
+        return reader, reader.size
+    return f, os.fstat(f.fileno()).st_size
+
+
+class CompressionPolicy:
+    """
+    Whether and how to compress one file. Files smaller than min_size, with
+    an extension in SKIP_EXTENSIONS, or whose sampled zlib ratio is below
+    min_ratio are stored raw; the rest are compressed with codec.
+    """
+
+    def __init__(self, codec: Codec, min_ratio: float = 1.2, frame_size: int = DEFAULT_FRAME_SIZE,
+                 samples: int = 4, sample_size: int = 64 * 1024, min_size: int = 4096):
+        self.codec = codec
+        self.min_ratio = min_ratio
+        self.frame_size = frame_size
+        self.samples = samples
+        self.sample_size = sample_size
+        self.min_size = min_size
+
+    @classmethod
+    def from_env(cls) -> Optional["CompressionPolicy"]:
+        """STORAGE_COMPRESSION=zlib[:level] or lzma[:level] turns compression on (default none)."""
+        codec = Codec.parse(os.getenv("STORAGE_COMPRESSION", "none"))
+        if codec is None:
+            return None
+        return cls(codec, float(os.getenv("STORAGE_COMPRESSION_MIN_RATIO", "1.2")))
+
+    def sampled_ratio(self, f: BinaryIO, size: int) -> float:
+        """Raw/compressed ratio of a few evenly spaced samples, at fast zlib level 1."""
+        raw = compressed = 0
+        step = max(size // self.samples, self.sample_size)
+        for offset in range(0, size, step):
+            f.seek(offset)
+            data = f.read(self.sample_size)
+            raw += len(data)
+            compressed += len(zlib.compress(data, 1))
+        f.seek(0)
+        return raw / compressed if compressed else 1.0
+
+    def should_compress(self, f: BinaryIO, size: int, extension: str) -> bool:
+        if size < self.min_size or extension in SKIP_EXTENSIONS:
+            return False
+        return self.sampled_ratio(f, size) >= self.min_ratio
+
+    def compress_file(self, src_path: str, dst_path: str, extension: str) -> Optional[int]:
+        """Write a framed copy of src_path to dst_path if worthwhile; returns its size, or None."""
+        size = os.path.getsize(src_path)
+        with open(src_path, "rb") as src:
+            if not self.should_compress(src, size, extension):
+                return None
+            with open(dst_path, "wb") as dst:
+                stored = write_framed(src, dst, size, self.codec, self.frame_size)
+        if stored >= size:
+            os.remove(dst_path)
+            return None
+        return stored
@@ -2,21 +2,38 @@
 import multiprocessing as mp
 import time
 import hashlib
+from multiprocessing.connection import Connection
 from typing import Dict, Tuple, Optional
 from node_process import node_loop
+from node_codec import CommandEncoder
+
+# One encoder per command pipe: interned symbols are only valid on the pipe
+# that defined them.
+_encoders: Dict[Connection, CommandEncoder] = {}
 
 def make_node_process(node_id: str, cpu: int, mem: int, storage_mb: int, bw_mbps: int):
-    cmd_q = mp.Queue()
+    # Commands go over a pipe as raw bytes (send_bytes), so they are not pickled
+    # again on top of node_codec's packing the way mp.Queue would
+    cmd_recv, cmd_send = mp.Pipe(duplex=False)
     resp_q = mp.Queue()
+    _encoders[cmd_send] = CommandEncoder()
     proc = mp.Process(
         target=node_loop,
-        args=(node_id, cpu, mem, storage_mb, bw_mbps, cmd_q, resp_q),
+        args=(node_id, cpu, mem, storage_mb, bw_mbps, cmd_recv, resp_q),
         daemon=True
     )
-    return proc, cmd_q, resp_q
+    return proc, cmd_send, resp_q
 
-def send(cmd_q: mp.Queue, resp_q: mp.Queue, cmd: dict, wait=True, timeout=5.0) -> Optional[dict]:
-    cmd_q.put(cmd)
+def send(cmd_conn: Connection, resp_q: mp.Queue, cmd: dict, wait=True, timeout=5.0) -> Optional[dict]:
+    encoder = _encoders.get(cmd_conn)
+    try:
+        if encoder:
+            cmd_conn.send_bytes(encoder.encode(cmd))
+        else:
+            cmd_conn.send(cmd)
+    except OSError:
+        # The node process has exited and closed its end
+        return {"ok": False, "error": "node stopped"}
     if not wait:
         return None
     try:
@@ -76,15 +93,15 @@ def main():
     }
 
     # Create processes
-    nodes: Dict[str, Tuple[mp.Process, mp.Queue, mp.Queue]] = {}
+    nodes: Dict[str, Tuple[mp.Process, Connection, mp.Queue]] = {}
     for nid, (cpu, mem, storage_mb, bw) in spec.items():
-        proc, cmd_q, resp_q = make_node_process(nid, cpu, mem, storage_mb, bw)
-        nodes[nid] = (proc, cmd_q, resp_q)
+        proc, cmd_conn, resp_q = make_node_process(nid, cpu, mem, storage_mb, bw)
+        nodes[nid] = (proc, cmd_conn, resp_q)
 
     # Start processes and nodes
-    for nid, (proc, cmd_q, resp_q) in nodes.items():
+    for nid, (proc, cmd_conn, resp_q) in nodes.items():
         proc.start()
-        send(cmd_q, resp_q, {"op": "start"})
+        send(cmd_conn, resp_q, {"op": "start"})
         time.sleep(0.05)
 
     # Wire up connections (bidirectional)
@@ -119,8 +136,8 @@ def main():
         if not res.get("ok"):
             print(f"[controller] ERROR: initiate_transfer failed on {nid}: {res}")
             # Stop if we can't initiate cleanly
-            for id2, (proc, cmd_q, resp_q) in nodes.items():
-                send(cmd_q, resp_q, {"op": "stop"})
+            for id2, (proc, cmd_conn, resp_q) in nodes.items():
+                send(cmd_conn, resp_q, {"op": "stop"})
                 proc.join(timeout=2.0)
             return
 
@@ -162,8 +179,8 @@ def main():
     print("[controller] transfer loop ended; beginning shutdown...")
 
     # Shutdown nodes
-    for nid, (proc, cmd_q, resp_q) in nodes.items():
-        send(cmd_q, resp_q, {"op": "stop"})
+    for nid, (proc, cmd_conn, resp_q) in nodes.items():
+        send(cmd_conn, resp_q, {"op": "stop"})
         proc.join(timeout=2.0)
 
     # Final report
@@ -0,0 +1,127 @@
+# hash_ring.py
+"""
+Consistent hashing of chunk names onto storage nodes.
+
+Each node owns a number of points ("virtual nodes") on a 64-bit ring,
+proportional to its weight, and a key belongs to the first point at or
+after its own hash. Adding or removing a node only moves the keys between
+its points and their predecessors, about 1/N of the data, where modulo
+hashing would move nearly all of it.
+
+A node's weight is its capacity, nudged by its bandwidth:
+
+    weight = capacity_mb / reference_capacity_mb
+             * (bandwidth_mbps / reference_bandwidth_mbps) ** bandwidth_exponent
+
+The references are fixed when the ring is built (from_network() uses the
+initial nodes' averages; otherwise the first node added), so one node
+joining does not reshuffle everyone else's points.
+bench_hash_ring.py measures balance and data moved per membership change.
+"""
+import bisect
+import hashlib
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_VNODES = 256
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+
+    def __init__(self, vnodes: int = DEFAULT_VNODES, bandwidth_exponent: float = 0.25,
+                 reference_capacity_mb: Optional[float] = None, reference_bandwidth_mbps: Optional[float] = None):
+        self.vnodes = vnodes
+        self.bandwidth_exponent = bandwidth_exponent
+        self.reference_capacity_mb = reference_capacity_mb
+        self.reference_bandwidth_mbps = reference_bandwidth_mbps
+        self.weights: Dict[str, float] = {}
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+    @classmethod
+    def from_network(cls, network, **kwargs) -> "HashRing":
+        """A ring over every node of a StorageVirtualNetwork, weighted by its disk and bandwidth."""
+        specs = {
+            name: (node.disk.disk_size_bytes / (1024 * 1024), node.bandwidth / 1_000_000)
+            for name, node in network.nodes.items()
+        }
+        if specs:
+            kwargs.setdefault("reference_capacity_mb", sum(c for c, _ in specs.values()) / len(specs))
+            kwargs.setdefault("reference_bandwidth_mbps", sum(b for _, b in specs.values()) / len(specs))
+        ring = cls(**kwargs)
+        for name in sorted(specs):
+            ring.add_node(name, *specs[name])
+        return ring
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.weights
+
+    def weight(self, capacity_mb: float, bandwidth_mbps: float) -> float:
+        if self.reference_capacity_mb is None:
+            self.reference_capacity_mb = capacity_mb
+        if self.reference_bandwidth_mbps is None:
+            self.reference_bandwidth_mbps = bandwidth_mbps
+        return (capacity_mb / self.reference_capacity_mb
+                * (bandwidth_mbps / self.reference_bandwidth_mbps) ** self.bandwidth_exponent)
+
+    def add_node(self, name: str, capacity_mb: float, bandwidth_mbps: float = 1000):
+        if name in self.weights:
+            self.remove_node(name)
+        weight = self.weight(capacity_mb, bandwidth_mbps)
+        self.weights[name] = weight
+        for i in range(max(1, round(self.vnodes * weight))):
+            point = ring_hash(f"{name}#{i}")
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, name)
+
+    def remove_node(self, name: str):
+        if self.weights.pop(name, None) is None:
+            return
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != name]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("Hash ring has no nodes")
+        index = bisect.bisect_left(self._points, ring_hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def preference(self, key: str) -> Iterator[str]:
+        """Distinct nodes in ring order from key's owner: where to go when the owner is full or down."""
+        if not self._points:
+            return
+        start = bisect.bisect_left(self._points, ring_hash(key))
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.weights):
+                    return
+
+    def nodes_for(self, key: str, count: int) -> List[str]:
+        """The first count distinct nodes for key (fewer if the ring is smaller)."""
+        nodes = []
+        for name in self.preference(key):
+            nodes.append(name)
+            if len(nodes) == count:
+                break
+        return nodes
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the ring each node owns, i.e. its expected share of the keys."""
+        span = 1 << 64
+        owned = {name: 0 for name in self.weights}
+        for i, (point, owner) in enumerate(zip(self._points, self._owners)):
+            previous = self._points[i - 1] if i else self._points[-1] - span
+            owned[owner] += point - previous
+        return {name: size / span for name, size in owned.items()}
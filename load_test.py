@@ -0,0 +1,131 @@
+# load_test.py
+"""
+Concurrent-client load test for AuthService.
+
+Runs the same workload against each target for a fixed duration and reports
+throughput and latency percentiles, e.g. to compare the threaded server
+(auth_server.py, :50051) with the grpc.aio one (auth_server_aio.py, :50052):
+
+    python load_test.py --targets localhost:50051,localhost:50052 \
+        --email user@example.com --clients 200 --op download
+
+The user must already exist; upload/download use a file named
+load_test.bin under that account (download uploads it once first).
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import grpc
+
+import auth_pb2, auth_pb2_grpc
+
+LOAD_TEST_FILE = "load_test.bin"
+PIECE_SIZE = 1024 * 1024
+
+
+def _upload_requests(email: str, payload: bytes):
+    for offset in range(0, len(payload), PIECE_SIZE):
+        yield auth_pb2.FileChunkRequest(
+            email=email,
+            filename=LOAD_TEST_FILE,
+            data=payload[offset:offset + PIECE_SIZE],
+            total_size=len(payload)
+        )
+
+
+async def _call(stub, op: str, email: str, payload: bytes) -> bool:
+    if op == "quota":
+        r = await stub.GetQuota(auth_pb2.QuotaRequest(email=email))
+        return r.total_bytes > 0
+    if op == "list":
+        await stub.ListFiles(auth_pb2.ListFilesRequest(email=email))
+        return True
+    if op == "download":
+        received = 0
+        async for chunk in stub.DownloadFileStream(
+                auth_pb2.FileRangeRequest(email=email, filename=LOAD_TEST_FILE)):
+            received += len(chunk.data)
+        return received == len(payload)
+    if op == "upload":
+        r = await stub.UploadFileStream(_upload_requests(email, payload))
+        return r.success
+    raise ValueError(f"unknown op {op}")
+
+
+async def _client(stub, op: str, email: str, payload: bytes, deadline: float,
+                  latencies: List[float], stats: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            ok = await _call(stub, op, email, payload)
+        except grpc.RpcError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            stats["errors"] += 1
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_target(target: str, op: str, email: str, clients: int,
+                     duration: float, payload: bytes) -> Dict[str, float]:
+    async with grpc.aio.insecure_channel(target) as channel:
+        stub = auth_pb2_grpc.AuthServiceStub(channel)
+
+        if op == "download":
+            r = await stub.UploadFileStream(_upload_requests(email, payload))
+            if not r.success:
+                raise RuntimeError(f"{target}: could not upload {LOAD_TEST_FILE}: {r.message}")
+
+        latencies: List[float] = []
+        stats = {"errors": 0}
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _client(stub, op, email, payload, deadline, latencies, stats)
+            for _ in range(clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": stats["errors"],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AuthService load test")
+    parser.add_argument("--targets", default="localhost:50051,localhost:50052",
+                        help="comma-separated host:port list, run one after another")
+    parser.add_argument("--email", required=True, help="existing user to run the workload as")
+    parser.add_argument("--op", choices=["quota", "list", "download", "upload"], default="quota")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent in-flight calls")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per target")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="file size for upload/download")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+
+    print(f"op={args.op} clients={args.clients} duration={args.duration}s size={args.size}")
+    print(f"{'target':<24}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for target in args.targets.split(","):
+        r = await run_target(target.strip(), args.op, args.email, args.clients, args.duration, payload)
+        print(f"{target:<24}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+# mail_queue.py
+import logging
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from email.message import Message
+from typing import List, Optional
+
+from utils import build_otp_message
+
+
+class SmtpSink:
+    """
+    Sends mail over a single SMTP connection that is kept open between sends.
+    STARTTLS and login happen once per connection, not once per message.
+    """
+
+    def __init__(self, host: str = "smtp.gmail.com", port: int = 587,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 idle_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.username = username or os.getenv("GMAIL_SENDER")
+        self.password = password or os.getenv("GMAIL_APP_PWD")
+        self.idle_timeout = idle_timeout
+        self.from_email = self.username
+
+        self._conn: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        if not self.username or not self.password:
+            raise RuntimeError("Set GMAIL_SENDER and GMAIL_APP_PWD environment variables")
+        conn = smtplib.SMTP(self.host, self.port, timeout=30)
+        conn.starttls(context=ssl.create_default_context())
+        conn.login(self.username, self.password)
+        return conn
+
+    def send(self, msg: Message):
+        # Servers drop idle sessions; check with NOOP before reusing an old one.
+        if self._conn is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            try:
+                self._conn.noop()
+            except smtplib.SMTPException:
+                self.reset()
+        if self._conn is None:
+            self._conn = self._connect()
+        self._conn.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def reset(self):
+        """Drop the current connection; the next send reconnects."""
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except Exception:
+                pass
+            self._conn = None
+
+    close = reset
+
+
+class LocalSink:
+    """
+    Keeps messages in memory instead of sending them, for tests and load runs.
+    If outbox_dir is given each message is also written there as an .eml file.
+    """
+
+    def __init__(self, outbox_dir: Optional[str] = None, from_email: str = "noreply@cloudsim.local"):
+        self.outbox_dir = outbox_dir
+        self.from_email = from_email
+        self.sent: List[Message] = []
+        if outbox_dir:
+            os.makedirs(outbox_dir, exist_ok=True)
+
+    def send(self, msg: Message):
+        self.sent.append(msg)
+        if self.outbox_dir:
+            name = f"{time.time_ns()}-{msg['To']}.eml"
+            with open(os.path.join(self.outbox_dir, name), "w") as f:
+                f.write(msg.as_string())
+        logging.info("LocalSink: message to %s", msg["To"])
+
+    def reset(self):
+        pass
+
+    close = reset
+
+
+class MailQueue:
+    """
+    Outbound mail queue drained by one background sender thread.
+    Bursts are sent back to back over the sink's open connection (up to
+    max_batch per wake-up). A failed send is retried with exponential backoff,
+    and dropped after max_retries attempts.
+    """
+
+    def __init__(self, sink, max_batch: int = 50, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, max_size: int = 10000):
+        self.sink = sink
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.sent = 0
+        self.failed = 0
+
+        self._queue: "queue.Queue[Message]" = queue.Queue(maxsize=max_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "MailQueue":
+        """OTP_MAIL_SINK=local selects LocalSink (writing to OTP_OUTBOX_DIR if set); default is SMTP."""
+        if os.getenv("OTP_MAIL_SINK", "smtp").lower() == "local":
+            return cls(LocalSink(os.getenv("OTP_OUTBOX_DIR")))
+        return cls(SmtpSink())
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop after sending whatever is already queued (bounded by timeout)."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.sink.close()
+
+    def enqueue(self, msg: Message) -> bool:
+        """Queue a message; False if the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(msg)
+            return True
+        except queue.Full:
+            logging.error("Mail queue full, dropping message to %s", msg["To"])
+            return False
+
+    def send_otp(self, to_email: str, otp: str) -> bool:
+        return self.enqueue(build_otp_message(to_email, otp, self.sink.from_email))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> deque:
+        try:
+            batch = deque([self._queue.get(timeout=0.25)])
+        except queue.Empty:
+            return deque()
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            attempts = 0
+            while batch:
+                msg = batch[0]
+                try:
+                    self.sink.send(msg)
+                except Exception as e:
+                    attempts += 1
+                    self.sink.reset()
+                    if attempts > self.max_retries:
+                        logging.error("Giving up on mail to %s after %d attempts: %s", msg["To"], attempts, e)
+                        self.failed += 1
+                        batch.popleft()
+                        attempts = 0
+                        continue
+                    delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+                    logging.warning("Mail to %s failed (%s), retrying in %.1fs", msg["To"], e, delay)
+                    if self._stop_event.wait(delay):
+                        break
+                    continue
+                self.sent += 1
+                batch.popleft()
+                attempts = 0
@@ -0,0 +1,215 @@
+# node_codec.py
+import pickle
+import struct
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# --------- Wire layout ---------
+# Every encoded command is a run of records, each starting with a 1-byte opcode.
+# Strings (file IDs, node IDs) are interned: the first time the encoder sees one
+# it emits an OP_INTERN record ahead of the command, and afterwards only the
+# 2-byte symbol travels. Command pipes are FIFO per node, so the decoder always
+# sees the definition before its first use.
+#
+#   OP_INTERN        B H H <utf-8 bytes>     opcode, symbol, length, text
+#   OP_PROCESS_CHUNK B H I H ?               opcode, file sym, chunk_id, source sym, is_final_hop
+#   OP_GET_STATS     B                       opcode
+#   OP_RESET         B                       opcode; forget every symbol
+#   OP_PICKLE        <pickle>                a whole command, pickled
+#
+# Every transfer brings a new file ID, so the table would grow without bound:
+# once it holds max_symbols strings the encoder starts a message with OP_RESET
+# and numbers from 0 again. Any other op (start, stop, add_connection,
+# initiate_transfer, ...) is rare and is pickled whole; pickle's own PROTO
+# opcode (0x80) marks it, so every command is bytes and can be sent with
+# Connection.send_bytes() without being pickled a second time.
+
+OP_INTERN = 0x01
+OP_PROCESS_CHUNK = 0x02
+OP_GET_STATS = 0x03
+OP_RESET = 0x04
+OP_PICKLE = 0x80
+
+MAX_SYMBOLS = 0x10000
+
+_OPCODE = struct.Struct("!B")
+_INTERN = struct.Struct("!BHH")
+_PROCESS_CHUNK = struct.Struct("!BHIH?")
+
+Command = Union[bytes, Dict[str, Any]]
+
+
+class CommandEncoder:
+    """Encodes controller commands for one node's command pipe."""
+
+    def __init__(self, max_symbols: int = MAX_SYMBOLS):
+        self.max_symbols = min(max_symbols, MAX_SYMBOLS)
+        self._symbols: Dict[str, int] = {}
+
+    def _intern(self, texts: List[str]) -> Tuple[bytes, Dict[str, int], Dict[str, int]]:
+        """
+        OP_RESET/OP_INTERN records defining texts, the table they extend and
+        the new symbols. Nothing is stored: encode() commits the symbols once
+        the whole message has been packed.
+        """
+        symbols = self._symbols
+        new = [text for text in dict.fromkeys(texts) if text not in symbols]
+        out: List[bytes] = []
+        if len(symbols) + len(new) > self.max_symbols:
+            out.append(_OPCODE.pack(OP_RESET))
+            symbols, new = {}, list(dict.fromkeys(texts))
+        pending: Dict[str, int] = {}
+        for text in new:
+            raw = text.encode("utf-8")
+            pending[text] = len(symbols) + len(pending)
+            out.append(_INTERN.pack(OP_INTERN, pending[text], len(raw)) + raw)
+        return b"".join(out), symbols, pending
+
+    def encode(self, cmd: Dict[str, Any]) -> bytes:
+        """Return the packed form of a hot command, or the pickled dict otherwise."""
+        op = cmd.get("op")
+        if op == "process_chunk":
+            # Fast path: both strings already interned
+            file_sym = self._symbols.get(cmd["file_id"])
+            src_sym = self._symbols.get(cmd["source_node"])
+            if file_sym is not None and src_sym is not None:
+                return _PROCESS_CHUNK.pack(OP_PROCESS_CHUNK, file_sym, cmd["chunk_id"], src_sym, cmd["is_final_hop"])
+            records, symbols, pending = self._intern([cmd["file_id"], cmd["source_node"]])
+            sym = lambda text: pending[text] if text in pending else symbols[text]
+            msg = records + _PROCESS_CHUNK.pack(
+                OP_PROCESS_CHUNK, sym(cmd["file_id"]), cmd["chunk_id"], sym(cmd["source_node"]), cmd["is_final_hop"]
+            )
+            # Packed whole: commit the symbols (or the reset) only now
+            if symbols is not self._symbols:
+                self._symbols = symbols
+            symbols.update(pending)
+            return msg
+        if op == "get_stats":
+            return _OPCODE.pack(OP_GET_STATS)
+        return pickle.dumps(cmd, pickle.HIGHEST_PROTOCOL)
+
+
+class CommandDecoder:
+    """Decodes commands produced by a matching CommandEncoder."""
+
+    def __init__(self):
+        self._strings: Dict[int, str] = {}
+
+    def decode(self, msg: Command) -> Optional[Dict[str, Any]]:
+        """The command in msg; raises KeyError for an unknown symbol and ValueError for a bad record."""
+        if not isinstance(msg, (bytes, bytearray)):
+            return msg
+        if msg[:1] == bytes([OP_PICKLE]):
+            return pickle.loads(msg)
+
+        # Fast path: steady-state chunk command with no new symbols attached.
+        if len(msg) == _PROCESS_CHUNK.size and msg[0] == OP_PROCESS_CHUNK:
+            _, file_sym, chunk_id, src_sym, is_final = _PROCESS_CHUNK.unpack(msg)
+            strings = self._strings
+            return {
+                "op": "process_chunk",
+                "file_id": strings[file_sym],
+                "chunk_id": chunk_id,
+                "source_node": strings[src_sym],
+                "is_final_hop": is_final
+            }
+
+        view = memoryview(msg)
+        pos = 0
+        cmd = None
+        while pos < len(view):
+            opcode = view[pos]
+            if opcode == OP_INTERN:
+                _, sym, length = _INTERN.unpack_from(view, pos)
+                pos += _INTERN.size
+                self._strings[sym] = bytes(view[pos:pos + length]).decode("utf-8")
+                pos += length
+            elif opcode == OP_RESET:
+                pos += _OPCODE.size
+                self._strings.clear()
+            elif opcode == OP_PROCESS_CHUNK:
+                _, file_sym, chunk_id, src_sym, is_final = _PROCESS_CHUNK.unpack_from(view, pos)
+                pos += _PROCESS_CHUNK.size
+                cmd = {
+                    "op": "process_chunk",
+                    "file_id": self._strings[file_sym],
+                    "chunk_id": chunk_id,
+                    "source_node": self._strings[src_sym],
+                    "is_final_hop": is_final
+                }
+            elif opcode == OP_GET_STATS:
+                pos += _OPCODE.size
+                cmd = {"op": "get_stats"}
+            else:
+                raise ValueError(f"unknown opcode {opcode:#x}")
+        return cmd
+
+
+# ---------- Microbenchmark ----------
+# In-process encode/decode cost, then the path commands really take: to a node
+# process through mp.Queue (pickled dicts) or a Pipe (pickled, or packed and
+# sent with send_bytes), timed until the node has decoded the last one.
+
+def _drain_queue(q, n: int, done):
+    for _ in range(n):
+        q.get()
+    done.set()
+
+
+def _drain_pipe(conn, packed: bool, n: int, done):
+    decoder = CommandDecoder()
+    for _ in range(n):
+        if packed:
+            decoder.decode(conn.recv_bytes())
+        else:
+            conn.recv()
+    done.set()
+
+
+if __name__ == "__main__":
+    import hashlib
+    import multiprocessing as mp
+    import time
+
+    file_id = hashlib.md5(b"large_dataset.zip").hexdigest()
+    cmds = [{
+        "op": "process_chunk",
+        "file_id": file_id,
+        "chunk_id": i,
+        "source_node": "node1",
+        "is_final_hop": bool(i % 2)
+    } for i in range(100_000)]
+
+    def bench(label, encode, decode):
+        start = time.perf_counter()
+        wire = [encode(c) for c in cmds]
+        mid = time.perf_counter()
+        for w in wire:
+            decode(w)
+        end = time.perf_counter()
+        size = sum(len(w) for w in wire) / len(wire)
+        print(f"{label:<12} encode {(mid - start) / len(cmds) * 1e9:7.0f} ns/msg | "
+              f"decode {(end - mid) / len(cmds) * 1e9:7.0f} ns/msg | avg {size:6.1f} bytes")
+
+    bench("pickle", lambda c: pickle.dumps(c, pickle.HIGHEST_PROTOCOL), pickle.loads)
+    enc, dec = CommandEncoder(), CommandDecoder()
+    bench("struct", enc.encode, dec.decode)
+
+    def end_to_end(label, reader, args, send):
+        done = mp.Event()
+        proc = mp.Process(target=reader, args=args + (len(cmds), done))
+        proc.start()
+        start = time.perf_counter()
+        for c in cmds:
+            send(c)
+        done.wait()
+        elapsed = time.perf_counter() - start
+        proc.join()
+        print(f"{label:<12} end to end {elapsed / len(cmds) * 1e9:7.0f} ns/msg")
+
+    q = mp.Queue()
+    end_to_end("queue+pickle", _drain_queue, (q,), q.put)
+    recv, send = mp.Pipe(duplex=False)
+    end_to_end("pipe+pickle", _drain_pipe, (recv, False), send.send)
+    recv, send = mp.Pipe(duplex=False)
+    enc = CommandEncoder()
+    end_to_end("pipe+codec", _drain_pipe, (recv, True), lambda c: send.send_bytes(enc.encode(c)))
@@ -1,8 +1,10 @@
 # node_process.py
 import multiprocessing as mp
 import time
+from multiprocessing.connection import Connection
 from typing import Dict, Any
 from storage_virtual_node import StorageVirtualNode
+from node_codec import CommandDecoder
 
 # --------- Command keys ---------
 # { "op": "start" }
@@ -11,9 +13,12 @@ from storage_virtual_node import StorageVirtualNode
 # { "op": "initiate_transfer", "file_id": "...", "file_name": "...", "file_size": 100*1024*1024 }
 # { "op": "process_chunk", "file_id": "...", "chunk_id": 0, "source_node": "node1", "is_final_hop": True }
 # { "op": "get_stats" }
+#
+# Commands arrive on a pipe as node_codec.py bytes: process_chunk and get_stats
+# packed, every other op a pickled dict.
 
 def node_loop(node_id: str, cpu_capacity: int, memory_capacity: int, storage_capacity_mb: int,
-              bandwidth_mbps: int, cmd_q: mp.Queue, resp_q: mp.Queue):
+              bandwidth_mbps: int, cmd_conn: Connection, resp_q: mp.Queue):
     node = StorageVirtualNode(
         node_id=node_id,
         cpu_capacity=cpu_capacity,
@@ -22,14 +27,24 @@ def node_loop(node_id: str, cpu_capacity: int, memory_capacity: int, storage_cap
         bandwidth=bandwidth_mbps
     )
 
+    decoder = CommandDecoder()
     running = True
     started = False
 
     while running:
+        if not cmd_conn.poll(0.25):
+            continue
+        try:
+            msg = cmd_conn.recv_bytes()
+        except EOFError:
+            # The controller is gone
+            break
         try:
-            cmd: Dict[str, Any] = cmd_q.get(timeout=0.25)
-        except Exception:
-            cmd = None
+            cmd: Dict[str, Any] = decoder.decode(msg)
+        except Exception as e:
+            print(f"[{node_id}] Dropping undecodable command ❌ {e!r}")
+            resp_q.put({"node": node_id, "ok": False, "error": f"undecodable command: {e!r}"})
+            continue
 
         if cmd is None:
             continue
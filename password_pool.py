@@ -0,0 +1,117 @@
+# password_pool.py
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+from utils import hash_password, check_password
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password operations are already waiting."""
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 16) -> int:
+    """Return the highest bcrypt cost whose hash time on this host stays within target_ms."""
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        hash_password("calibration", rounds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > target_ms:
+            break
+        best = rounds
+    return best
+
+
+class PasswordPool:
+    """
+    Runs bcrypt on a dedicated process pool so password work never holds the
+    GIL of the gRPC server's worker threads.
+    At most max_pending operations may be queued or running; beyond that
+    callers get PasswordPoolBusy straight away instead of piling up.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 rounds: Optional[int] = None, timeout: float = 10.0):
+        self.workers = workers or int(os.getenv("BCRYPT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+        self.max_pending = max_pending or int(os.getenv("BCRYPT_MAX_PENDING", self.workers * 4))
+        self.timeout = timeout
+
+        if rounds is None:
+            target_ms = os.getenv("BCRYPT_TARGET_MS")
+            rounds = calibrate_rounds(float(target_ms)) if target_ms else int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.rounds = rounds
+
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise PasswordPoolBusy(f"{self.max_pending} password operations already pending")
+            if self._executor is None:
+                # spawn, not fork: forking a process that already runs gRPC threads is unsafe
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=mp.get_context("spawn"))
+            future = self._executor.submit(fn, *args)
+            self.pending += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def _run(self, fn, *args):
+        return self._submit(fn, *args).result(timeout=self.timeout)
+
+    def hash_password(self, password: str) -> str:
+        return self._run(hash_password, password, self.rounds)
+
+    def check_password(self, password: str, hashed: str) -> bool:
+        return self._run(check_password, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if the hash was made with a lower cost than the pool now uses."""
+        try:
+            return int(hashed.split("$")[2]) < self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# ---------- Calibration benchmark ----------
+if __name__ == "__main__":
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+
+    print(f"bcrypt {bcrypt.__version__} on {os.cpu_count()} CPUs")
+    for rounds in range(10, 15):
+        start = time.perf_counter()
+        hash_password("benchmark", rounds)
+        print(f"  rounds={rounds:<2} {(time.perf_counter() - start) * 1000:8.1f} ms/hash")
+
+    rounds = calibrate_rounds(target_ms)
+    print(f"highest cost within {target_ms:.0f} ms: rounds={rounds}")
+
+    pool = PasswordPool(rounds=rounds)
+    requests = pool.workers * 4
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as callers:
+        list(callers.map(lambda _: pool.hash_password("benchmark"), range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"pool: {pool.workers} workers, {requests} concurrent hashes in {elapsed:.2f}s "
+          f"({requests / elapsed:.1f} hashes/s)")
+    pool.shutdown()
@@ -0,0 +1,469 @@
+# placement.py
+"""
+Spreads stored blobs across the storage nodes.
+
+With STORAGE_NODES set, BlobStore.put() hands each blob's stored bytes
+(compressed or not) to ChunkPlacement instead of keeping them under
+storage/blobs. They are cut into chunk_size pieces, written to the nodes'
+disks in parallel as <hash>.<index>, and recorded as chunks rows
+(blob_hash, chunk_index, node_id, size, sha256) against the nodes table.
+Downloads read through ChunkedReader, which fetches the next few chunks
+from their nodes at once, so capacity and read bandwidth grow with the
+number of nodes a blob is striped over.
+
+    STORAGE_NODES       name:capacity_mb[:bandwidth_mbps],... (unset = keep blobs local)
+    STORAGE_CHUNK_SIZE  bytes per chunk (default 4 MiB)
+    STORAGE_READ_AHEAD  chunks a reader fetches ahead (default one per node)
+    STORAGE_RING_VNODES ring points for a node of average size (default 256)
+    STORAGE_REPLICAS    copies of each chunk (default 1)
+    STORAGE_REPLICATION parallel or chain (see storage_virtual_network.py)
+    STORAGE_READ_POLICY least_loaded or nearest replica first
+    STORAGE_LINKS       a-b:bandwidth_mbps,... routes between the nodes
+    STORAGE_GATEWAY     node the servers are attached to, where routes start
+
+Node disks live under <storage_dir>/nodes/<name>. Each chunk goes to the
+node hash_ring.py maps its name to (weighted by capacity and bandwidth) and
+its successors on the ring, one per replica, skipping nodes that are full
+or offline. There is one chunks row per replica, and reads fall back to
+the next replica when one is missing. The rows, not the ring, say where a
+chunk is, so changing STORAGE_NODES never strands data; the ring only
+steers new writes. Blobs stored before placement was turned on stay on
+local disk and are still served from there.
+
+A chunk can instead be erasure-coded (erasure.py): encode() turns each
+replicated chunk into k+m fragments, <hash>.<index>.<fragment>, on as many
+distinct nodes, with one chunks row per fragment (chunks.erasure names the
+code and chunks.fragment the fragment). Reads fetch k fragments at once, data
+fragments first, and rebuild() recomputes lost fragments onto other nodes.
+rebalancer.py moves chunks off nodes that end up fuller than the rest, and
+scrubber.py has restore() rewrite copies that fail their disk checksum.
+"""
+import bisect
+import hashlib
+import itertools
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from durable_io import Durability
+from erasure import ReedSolomon, erasure_code
+from hash_ring import DEFAULT_VNODES, HashRing
+from models import Chunk, Node
+from storage_disk import StorageDisk
+from storage_virtual_network import StorageVirtualNetwork
+from storage_virtual_node import StorageVirtualNode
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# (chunk_index, nodes, size, sha256, erasure code) of one stored chunk. With
+# no code the nodes hold a replica each; with one (e.g. "rs:6+3") nodes[i]
+# holds fragment i, or is None if that fragment has no row.
+ChunkLocation = Tuple[int, Tuple[Optional[str], ...], int, str, Optional[str]]
+
+
+def chunk_name(digest: str, index: int, fragment: Optional[int] = None) -> str:
+    return f"{digest}.{index}" if fragment is None else f"{digest}.{index}.{fragment}"
+
+
+def parse_chunk_name(name: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    """(digest, index, fragment) of a chunk_name(); None for any other file name."""
+    digest, _, rest = name.partition(".")
+    parts = rest.split(".")
+    if not digest or not 1 <= len(parts) <= 2 or not all(part.isdigit() for part in parts):
+        return None
+    return digest, int(parts[0]), int(parts[1]) if len(parts) == 2 else None
+
+
+def stored_size(location: ChunkLocation) -> int:
+    """Bytes the chunk takes on each of its nodes: the chunk, or one fragment of it."""
+    _, _, size, _, code = location
+    return size if code is None else erasure_code(code).fragment_size(size)
+
+
+class ChunkPlacement:
+
+    def __init__(self, network: StorageVirtualNetwork, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 read_ahead: Optional[int] = None, workers: Optional[int] = None,
+                 ring: Optional[HashRing] = None, gateway: Optional[str] = None):
+        if not network.nodes:
+            raise ValueError("ChunkPlacement needs at least one storage node")
+        self.network = network
+        self.ring = ring or HashRing.from_network(network)
+        self.gateway = gateway
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead or max(2, len(network.nodes))
+        self.workers = workers or 4 * len(network.nodes)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="placement")
+
+    @classmethod
+    def from_env(cls, storage_dir: str, durability: Optional[Durability] = None) -> Optional["ChunkPlacement"]:
+        """Nodes from STORAGE_NODES (see the module docstring); None when it is unset."""
+        spec = os.getenv("STORAGE_NODES", "").strip()
+        if not spec:
+            return None
+        network = StorageVirtualNetwork(
+            replication_factor=int(os.getenv("STORAGE_REPLICAS", "1")),
+            replication_mode=os.getenv("STORAGE_REPLICATION", "parallel").lower(),
+            read_policy=os.getenv("STORAGE_READ_POLICY", "least_loaded").lower()
+        )
+        for entry in spec.split(","):
+            name, capacity_mb, *bandwidth = entry.strip().split(":")
+            # No disk-level compression: blob_store.py compresses whole blobs before they are split
+            disk = StorageDisk(int(capacity_mb), "SSD", os.path.join(storage_dir, "nodes", name),
+                               durability=durability)
+            network.add_node(StorageVirtualNode(
+                name, cpu_capacity=4, memory_capacity=16, storage_capacity_mb=int(capacity_mb),
+                bandwidth=int(bandwidth[0]) if bandwidth else 1000, disk=disk
+            ))
+        for link in filter(None, os.getenv("STORAGE_LINKS", "").split(",")):
+            ends, _, bandwidth = link.strip().partition(":")
+            a, b = ends.split("-")
+            network.connect_nodes(a, b, int(bandwidth or 1000))
+        if network.replication_factor > len(network.nodes):
+            logging.warning("STORAGE_REPLICAS=%s but only %s storage nodes",
+                            network.replication_factor, len(network.nodes))
+
+        ring = HashRing.from_network(network, vnodes=int(os.getenv("STORAGE_RING_VNODES", DEFAULT_VNODES)))
+        return cls(network, int(os.getenv("STORAGE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)),
+                   int(os.getenv("STORAGE_READ_AHEAD", "0")) or None, ring=ring,
+                   gateway=os.getenv("STORAGE_GATEWAY") or None)
+
+    # ---------- Node I/O ----------
+    def _write_chunk(self, digest: str, index: int, data: bytes) -> ChunkLocation:
+        key = chunk_name(digest, index)
+        replicas = self.network.write_replicas(key, data, self.ring.preference(key), self.gateway)
+        if not replicas:
+            raise OSError(f"No storage node has room for chunk {index} of {digest}")
+        if len(replicas) < self.network.replication_factor:
+            logging.warning("Chunk %s of %s has only %s of %s replicas",
+                            index, digest, len(replicas), self.network.replication_factor)
+        return index, tuple(replicas), len(data), hashlib.sha256(data).hexdigest(), None
+
+    def read_chunk(self, digest: str, location: ChunkLocation) -> bytes:
+        index, nodes, size, _, code = location
+        if code is not None:
+            return self._decode_chunk(digest, location)
+        data = self.network.read_replica(chunk_name(digest, index), nodes, self.gateway, size)
+        if data is None:
+            raise FileNotFoundError(f"No replica of chunk {index} of {digest} is readable ({', '.join(nodes)})")
+        return data
+
+    # ---------- Erasure-coded chunks ----------
+    def _decode_chunk(self, digest: str, location: ChunkLocation) -> bytes:
+        index, nodes, size, _, code = location
+        rs = erasure_code(code)
+        fragments = self.network.read_fragments(chunk_name(digest, index), nodes, rs.k, rs.fragment_size(size))
+        if len(fragments) < rs.k:
+            raise FileNotFoundError(f"Only {len(fragments)} of the {rs.k} fragments chunk {index} of {digest} "
+                                    f"needs are readable")
+        return rs.decode(fragments, size)
+
+    def _encode_chunk(self, digest: str, location: ChunkLocation, rs: ReedSolomon) -> ChunkLocation:
+        index, _, size, checksum, code = location
+        if code is not None:
+            return location
+        key = chunk_name(digest, index)
+        data = self.read_chunk(digest, location)
+        if hashlib.sha256(data).hexdigest() != checksum:
+            raise OSError(f"Chunk {index} of {digest} does not match its checksum, not encoding it")
+        placed = self.network.write_fragments(key, dict(enumerate(rs.encode(data))), self.ring.preference(key))
+        # Fragments no node took are None; encode() deletes the rest, as delete() needs this pool
+        return index, tuple(placed[i] for i in range(rs.n)), size, checksum, str(rs)
+
+    def encode(self, digest: str, locations: List[ChunkLocation], rs: ReedSolomon) -> List[ChunkLocation]:
+        """
+        Write every replicated chunk of a blob as rs fragments, chunks in
+        parallel; returns the new locations for replace(). The replicas are
+        left alone, for delete() once the new rows have committed.
+        """
+        if rs.n > len(self.network.nodes):
+            raise OSError(f"{rs} needs {rs.n} nodes, only {len(self.network.nodes)} are configured")
+        futures = [self._pool.submit(self._encode_chunk, digest, location, rs) for location in locations]
+        encoded = []
+        try:
+            for future in futures:
+                encoded.append(future.result())
+        except Exception:
+            for future in futures:
+                if not future.cancel() and not future.exception():
+                    encoded.append(future.result())
+            self.delete(digest, [location for location in encoded if location not in locations])
+            raise
+        short = [location for location in encoded if None in location[1]]
+        if short:
+            self.delete(digest, [location for location in encoded if location not in locations])
+            index, nodes = short[0][:2]
+            raise OSError(f"Only {rs.n - nodes.count(None)} of {rs.n} nodes took fragments "
+                          f"of chunk {index} of {digest}")
+        return encoded
+
+    def _rebuild_chunk(self, digest: str, location: ChunkLocation) -> ChunkLocation:
+        index, nodes, size, checksum, code = location
+        if code is None:
+            return location
+        rs = erasure_code(code)
+        key = chunk_name(digest, index)
+        fragments = self.network.read_fragments(key, nodes, rs.n, rs.fragment_size(size))
+        lost = [i for i in range(rs.n) if i not in fragments]
+        if not lost:
+            return location
+        if len(fragments) < rs.k:
+            logging.error("Chunk %s of %s has %s of %s fragments left, it cannot be rebuilt",
+                          index, digest, len(fragments), rs.k)
+            return location
+        # New homes avoid nodes that hold another fragment of this chunk
+        holders = {nodes[i] for i in fragments}
+        candidates = (name for name in self.ring.preference(key) if name not in holders)
+        placed = self.network.write_fragments(key, rs.reconstruct(fragments, lost), candidates)
+        rebuilt = [i for i in lost if placed[i] is not None]
+        logging.info("Rebuilt fragments %s of chunk %s of %s", rebuilt, index, digest)
+        if len(rebuilt) < len(lost):
+            logging.warning("No node took fragments %s of chunk %s of %s",
+                            [i for i in lost if placed[i] is None], index, digest)
+        # A fragment left unrebuilt keeps its old row, unless its node now holds another one
+        targets = {placed[i] for i in rebuilt}
+        nodes = tuple(placed.get(i) or (None if name in targets else name) for i, name in enumerate(nodes))
+        return index, nodes, size, checksum, code
+
+    def rebuild(self, digest: str, locations: List[ChunkLocation]) -> List[ChunkLocation]:
+        """
+        Recompute the lost fragments of a blob's erasure-coded chunks onto
+        other nodes, chunks in parallel (each reads its fragments in
+        parallel too); returns the locations with the new homes, for replace().
+        """
+        return list(self._pool.map(lambda location: self._rebuild_chunk(digest, location), locations))
+
+    def restore(self, digest: str, location: ChunkLocation, name: str, fragment: Optional[int] = None) -> bool:
+        """
+        Rewrite node name's copy of a chunk (or its fragment) from the other
+        copies, checked against the chunk's sha256; False if no good source is left.
+        """
+        index, nodes, size, checksum, code = location
+        node = self.network.nodes.get(name)
+        if node is None:
+            return False
+        if code is None:
+            key = chunk_name(digest, index)
+            for other in nodes:
+                if other == name:
+                    continue
+                data = self.network.read_replica(key, (other,), self.gateway, size)
+                if data is not None and hashlib.sha256(data).hexdigest() == checksum:
+                    return node.store_chunk(key, data)
+            return False
+        rs = erasure_code(code)
+        others = tuple(None if i == fragment else holder for i, holder in enumerate(nodes))
+        fragments = self.network.read_fragments(chunk_name(digest, index), others, rs.n - 1, rs.fragment_size(size))
+        # Any k intact fragments will do; a damaged one makes the decode miss the checksum
+        for used in itertools.islice(itertools.combinations(sorted(fragments), rs.k), 64):
+            subset = {i: fragments[i] for i in used}
+            if hashlib.sha256(rs.decode(subset, size)).hexdigest() == checksum:
+                rebuilt = rs.reconstruct(subset, [fragment])[fragment]
+                return node.store_chunk(chunk_name(digest, index, fragment), rebuilt)
+        return False
+
+    def write(self, path: str, digest: str) -> List[ChunkLocation]:
+        """Store the file at path on the nodes; returns where each chunk went, for record()."""
+        in_flight: List[Future] = []
+        locations: List[ChunkLocation] = []
+        try:
+            with open(path, "rb") as f:
+                for index, data in enumerate(iter(lambda: f.read(self.chunk_size), b"")):
+                    # Bounded, so a large blob is never held in memory whole
+                    if len(in_flight) >= self.workers:
+                        locations.append(in_flight.pop(0).result())
+                    in_flight.append(self._pool.submit(self._write_chunk, digest, index, data))
+            for future in in_flight:
+                locations.append(future.result())
+        except Exception:
+            for future in in_flight:
+                if not future.cancel() and not future.exception():
+                    locations.append(future.result())
+            self.delete(digest, locations)
+            raise
+        return locations
+
+    def delete(self, digest: str, locations: List[ChunkLocation]):
+        """Remove the chunks (every replica, or every fragment with a node) from the nodes."""
+        def remove(stored):
+            key, name = stored
+            node = self.network.nodes.get(name)
+            if node is None:
+                logging.warning("Chunk %s is on unknown node %s, leaving it", key, name)
+                return
+            node.delete_chunk(key)
+
+        list(self._pool.map(remove, [
+            (chunk_name(digest, index, None if code is None else i), name)
+            for index, nodes, _, _, code in locations
+            for i, name in enumerate(nodes) if name is not None
+        ]))
+
+    def open(self, digest: str, locations: List[ChunkLocation]) -> "ChunkedReader":
+        return ChunkedReader(self, digest, locations)
+
+    # ---------- Rows (caller commits) ----------
+    def node_ids(self, db: Session) -> Dict[str, int]:
+        """nodes.id of every configured node, adding rows for new ones."""
+        names = set(self.network.nodes)
+        ids = dict(db.execute(select(Node.name, Node.id).where(Node.name.in_(names))).all())
+        for name in names - ids.keys():
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Node).values(
+                        name=name, capacity_bytes=self.network.nodes[name].disk.disk_size_bytes,
+                        used_bytes=0, status="online"
+                    ))
+            except IntegrityError:
+                # Registered concurrently by another server
+                pass
+        if len(ids) < len(names):
+            ids = dict(db.execute(select(Node.name, Node.id).where(Node.name.in_(names))).all())
+        return ids
+
+    def _add_used(self, db: Session, ids: Dict[str, int], locations: List[ChunkLocation], sign: int):
+        used: Dict[str, int] = {}
+        for location in locations:
+            for name in filter(None, location[1]):
+                used[name] = used.get(name, 0) + stored_size(location)
+        for name, size in used.items():
+            if name in ids:
+                db.execute(update(Node).where(Node.id == ids[name]).values(used_bytes=Node.used_bytes + sign * size))
+
+    def record(self, db: Session, digest: str, locations: List[ChunkLocation]):
+        ids = self.node_ids(db)
+        # size_bytes and checksum are the whole chunk's, on fragment rows too
+        db.execute(insert(Chunk), [
+            {"blob_hash": digest, "chunk_index": index, "size_bytes": size, "node_id": ids[name],
+             "checksum": checksum, "erasure": code, "fragment": None if code is None else i}
+            for index, nodes, size, checksum, code in locations
+            for i, name in enumerate(nodes) if name is not None
+        ])
+        self._add_used(db, ids, locations, 1)
+
+    def locate(self, db: Session, digest: str) -> List[ChunkLocation]:
+        rows = db.execute(
+            select(Chunk.chunk_index, Chunk.erasure, Chunk.fragment, Node.name, Chunk.size_bytes, Chunk.checksum)
+            .join(Node, Node.id == Chunk.node_id)
+            .where(Chunk.blob_hash == digest)
+            .order_by(Chunk.chunk_index, Chunk.id)
+        ).all()
+        locations = []
+        for index, group in itertools.groupby(rows, key=lambda row: row.chunk_index):
+            chunk_rows = list(group)
+            first = chunk_rows[0]
+            code = first.erasure
+            if code is None:
+                nodes = tuple(row.name for row in chunk_rows)
+            else:
+                holders = {row.fragment: row.name for row in chunk_rows}
+                nodes = tuple(holders.get(i) for i in range(erasure_code(code).n))
+            locations.append((index, nodes, first.size_bytes, first.checksum, code))
+        return locations
+
+    def claim(self, db: Session, digest: str) -> List[ChunkLocation]:
+        """Drop a blob's chunk rows; returns their locations for delete() once committed."""
+        locations = self.locate(db, digest)
+        db.execute(delete(Chunk).where(Chunk.blob_hash == digest))
+        self._add_used(db, self.node_ids(db), locations, -1)
+        return locations
+
+    def move_row(self, db: Session, chunk_id: int, source: str, target: str, size: int) -> bool:
+        """Point one chunks row from node source to node target (size bytes stored); False if it is not on source."""
+        ids = self.node_ids(db)
+        if not db.execute(
+            update(Chunk).where(Chunk.id == chunk_id, Chunk.node_id == ids[source]).values(node_id=ids[target])
+        ).rowcount:
+            return False
+        db.execute(update(Node).where(Node.id == ids[source]).values(used_bytes=Node.used_bytes - size))
+        db.execute(update(Node).where(Node.id == ids[target]).values(used_bytes=Node.used_bytes + size))
+        return True
+
+    def replace(self, db: Session, digest: str, locations: List[ChunkLocation]) -> List[ChunkLocation]:
+        """
+        Point a blob's rows at new locations (from encode() or rebuild());
+        returns what is no longer referenced, for delete() once committed.
+        """
+        old = self.claim(db, digest)
+        self.record(db, digest, locations)
+        return self.subtract(digest, old, locations)
+
+    @staticmethod
+    def subtract(digest: str, locations: List[ChunkLocation], kept: List[ChunkLocation]) -> List[ChunkLocation]:
+        """locations without the files kept also has on the same node, for delete()."""
+        def stored(location):
+            index, nodes, _, _, code = location
+            return {(chunk_name(digest, index, None if code is None else i), name) for i, name in enumerate(nodes)}
+
+        kept_files = set().union(*map(stored, kept))
+        # A replica's name never repeats as a fragment's, so only fragments that stayed put are kept
+        return [
+            (index, tuple(None if (chunk_name(digest, index, None if code is None else i), name) in kept_files
+                          else name for i, name in enumerate(nodes)), size, checksum, code)
+            for index, nodes, size, checksum, code in locations
+        ]
+
+
+class ChunkedReader:
+    """
+    Seekable, read-only view of a blob stored on the nodes. Reading chunk i
+    also starts fetching chunks i+1 .. i+read_ahead-1 on the placement's
+    pool, so a sequential read pulls from several nodes at once.
+    """
+
+    def __init__(self, placement: ChunkPlacement, digest: str, locations: List[ChunkLocation]):
+        self._placement = placement
+        self._digest = digest
+        self._locations = locations
+        self._starts = list(itertools.accumulate((location[2] for location in locations), initial=0))
+        self.size = self._starts[-1]
+        self._pos = 0
+        self._pending: Dict[int, Future] = {}
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def _chunk(self, index: int) -> bytes:
+        window = range(index, min(index + self._placement.read_ahead, len(self._locations)))
+        for stale in [i for i in self._pending if i not in window]:
+            self._pending.pop(stale).cancel()
+        for i in window:
+            if i not in self._pending:
+                self._pending[i] = self._placement._pool.submit(
+                    self._placement.read_chunk, self._digest, self._locations[i]
+                )
+        return self._pending[index].result()
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = self.size - self._pos
+        pieces = []
+        while n > 0 and self._pos < self.size:
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            start = self._pos - self._starts[index]
+            piece = self._chunk(index)[start:start + n]
+            pieces.append(piece)
+            self._pos += len(piece)
+            n -= len(piece)
+        return b"".join(pieces)
+
+    def close(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
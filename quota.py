@@ -0,0 +1,176 @@
+# quota.py
+"""
+Quota reservations.
+
+An upload first reserves its bytes with one conditional UPDATE
+(used_bytes + n <= quota_bytes), committed straight away, so concurrent
+uploads from one user never hold a row lock while they stream. When the
+upload lands, settle() swaps the reservation for the real size change in
+the same transaction that writes the File row; if it fails, release()
+gives the bytes back. Every reservation is also a quota_reservations row,
+so reconcile() can recompute used_bytes from the files table plus live
+reservations, and reclaim reservations whose upload died with its server.
+
+All functions take a sync Session and leave committing to the caller
+(the asyncio server calls them from its worker threads like any other).
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, insert, func, case
+from sqlalchemy.orm import Session
+
+from models import User, File, QuotaReservation, session_scope
+
+# How long a reservation outlives its last grow() before reconcile() may reclaim it
+RESERVATION_TTL = int(os.getenv("QUOTA_RESERVATION_TTL", "3600"))
+# Upload sessions may be resumed much later
+SESSION_RESERVATION_TTL = int(os.getenv("QUOTA_SESSION_RESERVATION_TTL", str(24 * 3600)))
+# Streams of unknown size reserve at least this much at a time
+RESERVE_STEP = 16 * 1024 * 1024
+
+
+def _add_used(db: Session, user_id: int, nbytes: int, credit: int = None) -> bool:
+    """used_bytes += nbytes; with a credit, only if the result stays within quota_bytes + credit."""
+    stmt = update(User).where(User.id == user_id)
+    if credit is not None and nbytes > 0:
+        stmt = stmt.where(User.used_bytes + nbytes <= User.quota_bytes + credit)
+    return db.execute(stmt.values(used_bytes=User.used_bytes + nbytes)).rowcount == 1
+
+
+def reserve(db: Session, user_id: int, nbytes: int, credit: int = 0,
+            transfer_id: int = None, ttl: int = RESERVATION_TTL) -> Optional[int]:
+    """
+    Hold nbytes of the user's quota; returns the reservation id, or None if
+    it does not fit. credit is space the upload will free when it lands
+    (the size of the file it replaces).
+    """
+    if nbytes < 0:
+        raise ValueError(f"Cannot reserve a negative size ({nbytes} bytes)")
+    if not _add_used(db, user_id, nbytes, credit):
+        return None
+    return db.execute(insert(QuotaReservation).values(
+        user_id=user_id,
+        transfer_id=transfer_id,
+        bytes=nbytes,
+        credit=credit,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+    )).inserted_primary_key[0]
+
+
+def grow(db: Session, reservation_id: int, nbytes: int, ttl: int = RESERVATION_TTL) -> bool:
+    """Add nbytes to a live reservation under the same quota check; False if it does not fit."""
+    if nbytes < 0:
+        raise ValueError(f"Cannot grow a reservation by a negative size ({nbytes} bytes)")
+    row = db.execute(
+        select(QuotaReservation.user_id, QuotaReservation.credit).where(QuotaReservation.id == reservation_id)
+    ).first()
+    if row is None or not _add_used(db, row.user_id, nbytes, row.credit):
+        return False
+    db.execute(update(QuotaReservation).where(QuotaReservation.id == reservation_id).values(
+        bytes=QuotaReservation.bytes + nbytes,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+    ))
+    return True
+
+
+def settle(db: Session, user_id: int, reservation_id: Optional[int], new_bytes: int) -> bool:
+    """
+    Replace the reservation with the upload's real effect on used_bytes
+    (new_bytes: new size minus the size of the file it replaced), inside the
+    caller's transaction. If the reservation already expired the change is
+    re-checked against the quota; False means it no longer fits.
+    """
+    reserved = None
+    if reservation_id is not None:
+        reserved = db.execute(
+            select(QuotaReservation.bytes).where(QuotaReservation.id == reservation_id)
+        ).scalar()
+
+    if reserved is None:
+        return _add_used(db, user_id, new_bytes, credit=0)
+
+    db.execute(delete(QuotaReservation).where(QuotaReservation.id == reservation_id))
+    return _add_used(db, user_id, new_bytes - reserved)
+
+
+def release(db: Session, reservation_id: int):
+    """Give a reservation's bytes back (failed or abandoned upload)."""
+    row = db.execute(
+        select(QuotaReservation.user_id, QuotaReservation.bytes).where(QuotaReservation.id == reservation_id)
+    ).first()
+    if row is None:
+        return
+    # Only the caller whose DELETE hits the row gives the bytes back
+    if db.execute(delete(QuotaReservation).where(QuotaReservation.id == reservation_id)).rowcount == 1:
+        db.execute(update(User).where(User.id == row.user_id).values(
+            used_bytes=case((User.used_bytes > row.bytes, User.used_bytes - row.bytes), else_=0)
+        ))
+
+
+def session_reservation(db: Session, transfer_id: int) -> Optional[int]:
+    return db.execute(
+        select(QuotaReservation.id).where(QuotaReservation.transfer_id == transfer_id)
+    ).scalar()
+
+
+def free(db: Session, user_id: int, nbytes: int):
+    """used_bytes -= nbytes, floored at zero (file deleted)."""
+    db.execute(update(User).where(User.id == user_id).values(
+        used_bytes=case((User.used_bytes > nbytes, User.used_bytes - nbytes), else_=0)
+    ))
+
+
+def reconcile(db: Session) -> int:
+    """
+    Drop expired reservations, then reset every user's used_bytes to the
+    size of their stored files plus their live reservations. Returns the
+    number of users whose counter had drifted.
+    """
+    db.execute(delete(QuotaReservation).where(QuotaReservation.expires_at < datetime.utcnow()))
+
+    expected = (
+        select(func.coalesce(func.sum(File.size_bytes), 0))
+        .where(File.owner_id == User.id).scalar_subquery()
+        + select(func.coalesce(func.sum(QuotaReservation.bytes), 0))
+        .where(QuotaReservation.user_id == User.id).scalar_subquery()
+    )
+    return db.execute(
+        update(User).where(User.used_bytes != expected).values(used_bytes=expected)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+class QuotaReconciler:
+    """Runs reconcile() every interval seconds on a daemon thread."""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else float(os.getenv("QUOTA_RECONCILE_INTERVAL", "300"))
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="quota-reconcile", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run_once(self) -> int:
+        with session_scope() as db:
+            drifted = reconcile(db)
+            db.commit()
+        if drifted:
+            logging.warning("Quota reconcile corrected used_bytes for %d users", drifted)
+        return drifted
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Quota reconcile failed")
@@ -0,0 +1,200 @@
+# rebalancer.py
+"""
+Moves chunks off storage nodes that fill faster than the rest.
+
+The ring places chunks by weight, but nodes still drift apart: nodes join
+empty, a full or offline node pushes writes onto its successors, and
+erasure coding and deletions free space unevenly. Every interval the
+Rebalancer compares each online node's disk utilization with the
+cluster's (total used / total capacity). Nodes more than tolerance
+percentage points above it hand chunks to the emptiest nodes that hold no
+copy or fragment of the same chunk, until they are back at the average
+or the pass has moved max_pass_bytes.
+
+A move goes over the same path as placement's own I/O (read_chunk() on
+the source, store_chunk() on the target, both holding the nodes' links),
+then re-points the chunks row under the blob's row lock, so a concurrent
+delete either sees the new row or makes the move give up. The source copy
+is deleted grace seconds later, for readers that located it just before.
+Moves share a TokenBucket of bandwidth_mbps, so migration never takes
+more than that from the nodes' links and foreground transfers keep the rest.
+
+    STORAGE_REBALANCE_INTERVAL   seconds between passes (default 60, 0 = off)
+    STORAGE_REBALANCE_TOLERANCE  points above average before a node sheds (default 10)
+    STORAGE_REBALANCE_MBPS       migration bandwidth cap (default 100)
+    STORAGE_REBALANCE_GRACE      seconds before a moved chunk's old copy goes (default 30)
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from models import Blob, Chunk, Node, session_scope
+from placement import ChunkPlacement, chunk_name, stored_size
+
+
+class TokenBucket:
+    """Paces callers to rate bytes per second on average, letting up to burst through at once."""
+
+    def __init__(self, rate: float, burst: float, stop_event: Optional[threading.Event] = None):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop_event = stop_event or threading.Event()
+
+    def consume(self, n: int):
+        """Take n tokens, waiting for the debt to refill if there are not enough (or until stopped)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self._stop_event.wait(wait)
+
+
+class Rebalancer:
+    """Runs run_once() every interval seconds on a daemon thread."""
+
+    def __init__(self, placement: ChunkPlacement, interval: float = 60, tolerance: float = 10,
+                 bandwidth_mbps: float = 100, grace: float = 30, max_pass_bytes: Optional[int] = None):
+        self.placement = placement
+        self.network = placement.network
+        self.interval = interval
+        self.tolerance = tolerance
+        self.grace = grace
+        # Bounded so one pass cannot keep a late delete waiting on a huge backlog
+        self.max_pass_bytes = max_pass_bytes or 64 * placement.chunk_size
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.throttle = TokenBucket(bandwidth_mbps * 1_000_000 / 8, placement.chunk_size, self._stop_event)
+
+    @classmethod
+    def from_env(cls, placement: ChunkPlacement) -> "Rebalancer":
+        return cls(placement,
+                   interval=float(os.getenv("STORAGE_REBALANCE_INTERVAL", "60")),
+                   tolerance=float(os.getenv("STORAGE_REBALANCE_TOLERANCE", "10")),
+                   bandwidth_mbps=float(os.getenv("STORAGE_REBALANCE_MBPS", "100")),
+                   grace=float(os.getenv("STORAGE_REBALANCE_GRACE", "30")))
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="rebalance", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Rebalance pass failed")
+
+    # ---------- Planning ----------
+    def utilization(self) -> Dict[str, float]:
+        """Disk utilization (0-100) of every online node."""
+        return {name: node.disk.utilization_percent()
+                for name, node in self.network.nodes.items() if node.online}
+
+    def _chunks_on(self, db, name: str, limit: int) -> List[Tuple]:
+        """Chunks rows on node name, largest first, with the nodes holding the rest of each chunk."""
+        rows = db.execute(
+            select(Chunk.id, Chunk.blob_hash, Chunk.chunk_index, Chunk.erasure, Chunk.fragment,
+                   Chunk.size_bytes, Chunk.checksum)
+            .join(Node, Node.id == Chunk.node_id)
+            .where(Node.name == name, Chunk.blob_hash.isnot(None))
+            .order_by(Chunk.size_bytes.desc())
+            .limit(limit)
+        ).all()
+        held: Dict[Tuple[str, int], set] = {}
+        for blob_hash, index, holder in db.execute(
+            select(Chunk.blob_hash, Chunk.chunk_index, Node.name).join(Node, Node.id == Chunk.node_id)
+            .where(Chunk.blob_hash.in_({row.blob_hash for row in rows}))
+        ):
+            held.setdefault((blob_hash, index), set()).add(holder)
+        return [(row, held[row.blob_hash, row.chunk_index]) for row in rows]
+
+    # ---------- Moving ----------
+    def move(self, row, source: str, target: str) -> bool:
+        """Copy one chunks row's data from source to target and re-point the row; False if it was not moved."""
+        key = chunk_name(row.blob_hash, row.chunk_index, row.fragment)
+        size = stored_size((row.chunk_index, (), row.size_bytes, row.checksum, row.erasure))
+        self.throttle.consume(size)
+        data = self.network.nodes[source].read_chunk(key)
+        if data is None or len(data) != size:
+            logging.warning("Chunk %s on %s is unreadable, not moving it", key, source)
+            return False
+        if row.erasure is None and hashlib.sha256(data).hexdigest() != row.checksum:
+            logging.warning("Chunk %s on %s does not match its checksum, not moving it", key, source)
+            return False
+        if not self.network.nodes[target].store_chunk(key, data):
+            return False
+
+        with session_scope() as db:
+            live = db.execute(
+                select(Blob.hash).where(Blob.hash == row.blob_hash, Blob.refcount > 0).with_for_update()
+            ).first()
+            if live is None or not self.placement.move_row(db, row.id, source, target, size):
+                # Deleted (or moved) meanwhile: the copy just written has no row
+                db.rollback()
+                self.network.nodes[target].delete_chunk(key)
+                return False
+            db.commit()
+        return True
+
+    def run_once(self) -> int:
+        """One pass; returns the bytes moved."""
+        online = {name: node.disk for name, node in self.network.nodes.items() if node.online}
+        if len(online) < 2:
+            return 0
+        capacity = {name: disk.disk_size_bytes for name, disk in online.items()}
+        # Projected bytes per node as moves are made, so targets fill evenly
+        used = {name: disk.get_used_space() for name, disk in online.items()}
+        average = sum(used.values()) / sum(capacity.values()) * 100
+        percent = {name: used[name] / capacity[name] * 100 for name in online}
+
+        # As in HDFS's balancer: nodes above average + tolerance shed load, and
+        # so does any node above average while some node is below average -
+        # tolerance. A node is a source or a target in a pass, never both, so
+        # no chunk comes back to a node that still has its old copy to delete.
+        needy = any(p < average - self.tolerance for p in percent.values())
+        sources = sorted((name for name in online
+                          if percent[name] > average + self.tolerance or (needy and percent[name] > average)),
+                         key=lambda name: -percent[name])
+        targets = [name for name in online if name not in sources and percent[name] < average]
+
+        moved_bytes, stale = 0, []
+        for source in sources:
+            with session_scope() as db:
+                candidates = self._chunks_on(db, source, limit=256)
+            for row, holders in candidates:
+                excess = used[source] - average * capacity[source] / 100
+                if excess <= 0 or moved_bytes >= self.max_pass_bytes or self._stop_event.is_set():
+                    break
+                size = stored_size((row.chunk_index, (), row.size_bytes, row.checksum, row.erasure))
+                fits = [name for name in targets if name not in holders
+                        and (used[name] + size) / capacity[name] * 100 <= average]
+                if not fits:
+                    continue
+                target = min(fits, key=lambda name: used[name] / capacity[name])
+                if self.move(row, source, target):
+                    used[source] -= size
+                    used[target] += size
+                    moved_bytes += size
+                    stale.append((source, chunk_name(row.blob_hash, row.chunk_index, row.fragment)))
+
+        if stale:
+            logging.info("Rebalance moved %d chunks (%d bytes) off %s", len(stale), moved_bytes, ", ".join(sources))
+            self._stop_event.wait(self.grace)
+            for source, key in stale:
+                self.network.nodes[source].delete_chunk(key)
+        return moved_bytes
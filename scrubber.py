@@ -0,0 +1,153 @@
+# scrubber.py
+"""
+Finds and repairs stored data that has gone bad on the nodes' disks.
+
+Every file a StorageDisk stores gets a sha256 sidecar written with it
+(see storage_disk.py), so bit rot, torn writes and files changed behind
+the disk's back all show up as a mismatch when the file is re-hashed.
+Every interval the Scrubber re-hashes every file on every online node,
+on a pool of workers threads (hashlib releases the GIL while it hashes,
+so the workers really run at once) taking files from the nodes in turn.
+Reads share a TokenBucket of rate_mb MB/s, so a pass never takes more of
+the disks than that from foreground reads and writes; bench_scrub.py
+measures both sides.
+
+A corrupt file is logged and, if it is a placement chunk (placement.py),
+rewritten by ChunkPlacement.restore(): from another replica that matches
+the chunk's sha256, or for an erasure-coded chunk recomputed from the
+other fragments. Files nothing else has a copy of are only reported.
+
+    STORAGE_SCRUB_INTERVAL  seconds between passes (default 86400, 0 = off)
+    STORAGE_SCRUB_RATE      MB/s a pass reads at most (default 50)
+    STORAGE_SCRUB_WORKERS   files hashed at once (default 4)
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from models import session_scope
+from placement import ChunkPlacement, parse_chunk_name
+from rebalancer import TokenBucket
+from storage_virtual_network import StorageVirtualNetwork
+
+
+@dataclass
+class ScrubReport:
+    files: int = 0
+    bytes: int = 0
+    unverified: int = 0  # gone before it was read, or stored without a checksum
+    corrupt: List[Tuple[str, str]] = field(default_factory=list)  # (node, file)
+    repaired: List[Tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rate_mb(self) -> float:
+        return self.bytes / self.seconds / (1024 * 1024) if self.seconds else 0.0
+
+
+class Scrubber:
+    """Runs run_once() every interval seconds on a daemon thread."""
+
+    def __init__(self, network: StorageVirtualNetwork, placement: Optional[ChunkPlacement] = None,
+                 interval: float = 86400, rate_mb: float = 50, workers: int = 4):
+        self.network = network
+        self.placement = placement
+        self.interval = interval
+        self.workers = workers
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        rate = rate_mb * 1024 * 1024
+        self.throttle = TokenBucket(rate, rate / 10, self._stop_event) if rate_mb > 0 else None
+
+    @classmethod
+    def from_env(cls, placement: ChunkPlacement) -> "Scrubber":
+        return cls(placement.network, placement,
+                   interval=float(os.getenv("STORAGE_SCRUB_INTERVAL", "86400")),
+                   rate_mb=float(os.getenv("STORAGE_SCRUB_RATE", "50")),
+                   workers=int(os.getenv("STORAGE_SCRUB_WORKERS", "4")))
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="scrub", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Scrub pass failed")
+
+    # ---------- Checking ----------
+    def check(self, name: str, file_name: str) -> Tuple[Optional[bool], int]:
+        """verify_file() of one file on node name, paced by the throttle; also returns its size."""
+        if self._stop_event.is_set():
+            return None, 0
+        disk = self.network.nodes[name].disk
+        size = disk.file_size(file_name)
+        if self.throttle:
+            self.throttle.consume(size)
+        return disk.verify_file(file_name), size
+
+    def repair(self, name: str, file_name: str) -> bool:
+        """Rewrite a corrupt chunk file on node name from its other copies; False if it cannot be."""
+        parsed = parse_chunk_name(file_name)
+        if self.placement is None or parsed is None:
+            return False
+        digest, index, fragment = parsed
+        with session_scope() as db:
+            location = next((location for location in self.placement.locate(db, digest)
+                             if location[0] == index), None)
+        if location is None or (location[4] is None) != (fragment is None):
+            return False
+        nodes = location[1]
+        holds = name in nodes if fragment is None else fragment < len(nodes) and nodes[fragment] == name
+        if not holds:
+            # Not where the rows put it: a copy left behind by a move, not worth restoring
+            return False
+        if self.network.nodes[name].disk.verify_file(file_name) is not False:
+            # Rewritten or deleted since it was read
+            return True
+        return self.placement.restore(digest, location, name, fragment)
+
+    def run_once(self) -> ScrubReport:
+        """One pass over every online node's files."""
+        report, start = ScrubReport(), time.perf_counter()
+        listings = [[(name, file_name) for file_name in node.disk.list_files()]
+                    for name, node in self.network.nodes.items() if node.online]
+        # Round robin over the nodes, so every disk is read at once and none bears the whole rate
+        files = [entry for batch in itertools.zip_longest(*listings) for entry in batch if entry]
+        def check(entry):
+            try:
+                return self.check(*entry)
+            except Exception:
+                # One unreadable file is reported, not the end of the pass
+                logging.exception("Could not scrub %s on %s", entry[1], entry[0])
+                return None, 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scrub") as pool:
+            for (name, file_name), (verdict, size) in zip(files, pool.map(check, files)):
+                if verdict is None:
+                    report.unverified += 1
+                    continue
+                report.files += 1
+                report.bytes += size
+                if verdict:
+                    continue
+                logging.error("%s on %s does not match its checksum", file_name, name)
+                report.corrupt.append((name, file_name))
+                if self.repair(name, file_name):
+                    logging.info("Repaired %s on %s", file_name, name)
+                    report.repaired.append((name, file_name))
+        report.seconds = time.perf_counter() - start
+        logging.info("Scrubbed %d files (%d bytes) at %.1f MB/s: %d corrupt, %d repaired",
+                     report.files, report.bytes, report.rate_mb, len(report.corrupt), len(report.repaired))
+        return report
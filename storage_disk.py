@@ -1,28 +1,71 @@
+import hashlib
+import io
 import os
+import tempfile
+import threading
+from typing import List, Optional
+
+from compression import CORRUPT_ERRORS, CompressionPolicy, FramedReader, compress_bytes
+from durable_io import Durability
+
+# Suffix of files stored in compression.py's framed format
+COMPRESSED_SUFFIX = ".mcz"
+
+# Suffix of the sidecar holding a file's sha256 (of its uncompressed bytes),
+# written with the file and checked by verify_file(); not counted as used space
+CHECKSUM_SUFFIX = ".sha256"
+
+HASH_READ_SIZE = 1024 * 1024
 
 class StorageDisk:
-    def __init__(self, disk_size_mb: int, disk_type: str, mount_path: str):
+    def __init__(self, disk_size_mb: int, disk_type: str, mount_path: str,
+                 compression: Optional[CompressionPolicy] = None,
+                 durability: Optional[Durability] = None):
         """
         Simulates a virtual disk for a node.
         :param disk_size_mb: Size of the disk in MB
         :param disk_type: Type of disk (SSD, HDD, USB, etc.)
         :param mount_path: Folder path on host machine to represent this disk
+        :param compression: Optional policy for compressing stored files
+        :param durability: Optional fsync policy; files are then staged and renamed into place
         """
         self.disk_size_bytes = disk_size_mb * 1024 * 1024
         self.disk_type = disk_type
         self.mount_path = mount_path
+        self.compression = compression
+        self.durability = durability
 
         # Ensure the folder exists
         os.makedirs(self.mount_path, exist_ok=True)
 
-    def get_used_space(self) -> int:
-        """Calculate used space in bytes by summing file sizes in mount_path."""
+        # Bytes in mount_path: walked once, then kept current by store/delete,
+        # so a disk holding many chunks is not re-walked on every write.
+        self._used_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _walk_used_space(self) -> int:
         total = 0
         for root, _, files in os.walk(self.mount_path):
             for f in files:
-                total += os.path.getsize(os.path.join(root, f))
+                if not f.endswith(CHECKSUM_SUFFIX):
+                    total += os.path.getsize(os.path.join(root, f))
         return total
 
+    def get_used_space(self) -> int:
+        """Used space in bytes (the sum of file sizes in mount_path)."""
+        if self._used_bytes is None:
+            with self._lock:
+                if self._used_bytes is None:
+                    self._used_bytes = self._walk_used_space()
+        return self._used_bytes
+
+    @staticmethod
+    def _size_of(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
     def get_free_space(self) -> int:
         """Return free space in bytes."""
         return self.disk_size_bytes - self.get_used_space()
@@ -40,14 +83,52 @@ class StorageDisk:
         :param data: File contents as bytes
         :return: True if stored successfully, False if not enough space
         """
-        if len(data) > self.get_free_space():
-            print(f"❌ Not enough space on {self.disk_type} disk at {self.mount_path}")
-            return False
-
         path = os.path.join(self.mount_path, file_name)
+        stored, stored_path, stale_path = data, path, path + COMPRESSED_SUFFIX
+        if self.compression:
+            extension = os.path.splitext(file_name)[1].lstrip(".").lower()
+            if self.compression.should_compress(io.BytesIO(data), len(data), extension):
+                framed = compress_bytes(data, self.compression.codec, self.compression.frame_size)
+                if len(framed) < len(data):
+                    stored, stored_path, stale_path = framed, path + COMPRESSED_SUFFIX, path
+
+        self.get_used_space()
+        with self._lock:
+            # Space held by an earlier version of this file is freed by the write
+            replaced = self._size_of(stored_path) + self._size_of(stale_path)
+            if len(stored) - replaced > self.disk_size_bytes - self._used_bytes:
+                print(f"❌ Not enough space on {self.disk_type} disk at {self.mount_path}")
+                return False
+            self._used_bytes += len(stored) - replaced
+
+        # The checksum lands before the data it describes: a crash in between leaves
+        # the old data failing verify_file() (and repaired from a replica) rather
+        # than new data no sidecar vouches for
+        checksum = hashlib.sha256(data).hexdigest().encode()
+        if self.durability:
+            staged = self._stage(checksum), self._stage(stored)
+            self.durability.replace(staged[0], path + CHECKSUM_SUFFIX)
+            self.durability.replace(staged[1], stored_path)
+        else:
+            self._write(path + CHECKSUM_SUFFIX, checksum)
+            self._write(stored_path, stored)
+        # Drop the other form left by an earlier version of this file
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+        return True
+
+    def _stage(self, data: bytes) -> str:
+        """Write data to a durable temporary file next to the disk's files and return its path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.mount_path, prefix=".", suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            self.durability.sync_file(f)
+        return tmp_path
+
+    @staticmethod
+    def _write(path: str, data: bytes):
         with open(path, "wb") as f:
             f.write(data)
-        return True
 
     def retrieve_file(self, file_name: str) -> bytes | None:
         """
@@ -56,11 +137,84 @@ class StorageDisk:
         :return: File contents as bytes, or None if not found
         """
         path = os.path.join(self.mount_path, file_name)
+        if os.path.exists(path + COMPRESSED_SUFFIX):
+            with FramedReader(open(path + COMPRESSED_SUFFIX, "rb")) as f:
+                return f.read()
         if os.path.exists(path):
             with open(path, "rb") as f:
                 return f.read()
         return None
 
+    def list_files(self) -> List[str]:
+        """Names of the stored files, in either form."""
+        names = set()
+        for entry in os.listdir(self.mount_path):
+            if entry.startswith(".") or entry.endswith(CHECKSUM_SUFFIX):
+                continue
+            names.add(entry[:-len(COMPRESSED_SUFFIX)] if entry.endswith(COMPRESSED_SUFFIX) else entry)
+        return sorted(names)
+
+    def file_size(self, file_name: str) -> int:
+        """Bytes a file takes on disk (0 if it is not stored)."""
+        path = os.path.join(self.mount_path, file_name)
+        return self._size_of(path) + self._size_of(path + COMPRESSED_SUFFIX)
+
+    def checksum(self, file_name: str) -> Optional[str]:
+        """The sha256 recorded when the file was written, or None if there is none."""
+        try:
+            with open(os.path.join(self.mount_path, file_name + CHECKSUM_SUFFIX), "rb") as f:
+                return f.read().decode(errors="replace").strip()
+        except FileNotFoundError:
+            return None
+
+    def verify_file(self, file_name: str) -> Optional[bool]:
+        """
+        Re-hash a stored file and compare it with its recorded checksum.
+        :param file_name: Name of the file to check
+        :return: True if it matches, False if it is corrupt, None if the file or its checksum is missing
+        """
+        expected = self.checksum(file_name)
+        path = os.path.join(self.mount_path, file_name)
+        compressed = os.path.exists(path + COMPRESSED_SUFFIX)
+        digest = hashlib.sha256()
+        try:
+            with open(path + COMPRESSED_SUFFIX if compressed else path, "rb") as raw:
+                if expected is None:
+                    return None
+                f = FramedReader(raw) if compressed else raw
+                for data in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                    digest.update(data)
+        except FileNotFoundError:
+            return None
+        except CORRUPT_ERRORS:
+            # A framed file too damaged to decompress
+            return False
+        return digest.hexdigest() == expected
+
+    def delete_file(self, file_name: str) -> int:
+        """
+        Delete a file in either stored form.
+        :param file_name: Name of the file to delete
+        :return: Bytes freed (0 if it was not stored)
+        """
+        path = os.path.join(self.mount_path, file_name)
+        freed = 0
+        self.get_used_space()
+        for candidate in (path, path + COMPRESSED_SUFFIX):
+            with self._lock:
+                size = self._size_of(candidate)
+                try:
+                    os.remove(candidate)
+                except FileNotFoundError:
+                    continue
+                self._used_bytes -= size
+            freed += size
+        try:
+            os.remove(path + CHECKSUM_SUFFIX)
+        except FileNotFoundError:
+            pass
+        return freed
+
 
 # ---------- Quick test block ----------
 if __name__ == "__main__":
@@ -1,22 +1,54 @@
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import hashlib
+import itertools
+import math
+import random
+import threading
 import time
 import networkx as nx
 from storage_virtual_node import StorageVirtualNode, FileTransfer, TransferStatus
 
+# How write_replicas() sends a chunk to its replicas:
+#   parallel  the writer sends every copy itself, all at once
+#   chain     the writer sends one copy, and each replica forwards it to the
+#             nearest remaining one along the routes (as in HDFS pipelines)
+REPLICATION_MODES = ("parallel", "chain")
+
+# How read_replica() orders the replicas of a chunk:
+#   least_loaded  fewest reads in flight per unit of bandwidth, then route length
+#   nearest       shortest route from the reader, then load
+READ_POLICIES = ("least_loaded", "nearest")
+
 class StorageVirtualNetwork:
-    def __init__(self):
+    def __init__(self, replication_factor: int = 1, replication_mode: str = "parallel",
+                 read_policy: str = "least_loaded"):
+        if replication_mode not in REPLICATION_MODES:
+            raise ValueError(f"Unknown replication mode {replication_mode!r}, expected one of {REPLICATION_MODES}")
+        if read_policy not in READ_POLICIES:
+            raise ValueError(f"Unknown read policy {read_policy!r}, expected one of {READ_POLICIES}")
         self.nodes: Dict[str, StorageVirtualNode] = {}
         self.transfer_operations: Dict[str, Dict[str, FileTransfer]] = defaultdict(dict)
 
+        # Replicated chunk storage
+        self.replication_factor = max(1, replication_factor)
+        self.replication_mode = replication_mode
+        self.read_policy = read_policy
+        self._route_lengths: Dict[str, Dict[str, int]] = {}
+        self._reads_in_flight: Dict[str, int] = defaultdict(int)
+        self._load_lock = threading.Lock()
+        self._replica_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="replica")
+
     def add_node(self, node: StorageVirtualNode):
         self.nodes[node.node_id] = node
+        self._route_lengths.clear()
 
     def connect_nodes(self, node1_id: str, node2_id: str, bandwidth: int):
         if node1_id in self.nodes and node2_id in self.nodes:
             self.nodes[node1_id].add_connection(node2_id, bandwidth)
             self.nodes[node2_id].add_connection(node1_id, bandwidth)
+            self._route_lengths.clear()
             return True
         return False
 
@@ -109,6 +141,134 @@ class StorageVirtualNetwork:
 
         return (chunks_done, False)
 
+    # ---------- Replicated chunks ----------
+    def route_length(self, source: Optional[str], target: str) -> float:
+        """Hops from source to target (0 without a source, inf if unreachable); cached per source."""
+        if source is None or source == target:
+            return 0
+        lengths = self._route_lengths.get(source)
+        if lengths is None:
+            G = self._build_graph()
+            lengths = nx.single_source_shortest_path_length(G, source) if source in G else {}
+            self._route_lengths[source] = lengths
+        return lengths.get(target, math.inf)
+
+    def _chain_order(self, source: Optional[str], targets: List[str]) -> List[str]:
+        """Targets in the order a chain visits them: each hop to the nearest remaining one."""
+        order, remaining, current = [], list(targets), source
+        while remaining:
+            current = min(remaining, key=lambda name: self.route_length(current, name))
+            remaining.remove(current)
+            order.append(current)
+        return order
+
+    def _store_replica(self, name: str, key: str, data: bytes) -> bool:
+        node = self.nodes.get(name)
+        return node is not None and node.store_chunk(key, data)
+
+    def write_replicas(self, key: str, data: bytes, candidates: Iterable[str],
+                       source: Optional[str] = None) -> List[str]:
+        """
+        Store data as key on the first replication_factor candidates that
+        accept it (full or offline ones are skipped); returns those nodes.
+        """
+        stored: List[str] = []
+        candidates = iter(candidates)
+        while len(stored) < self.replication_factor:
+            batch = list(itertools.islice(candidates, self.replication_factor - len(stored)))
+            if not batch:
+                break
+            if self.replication_mode == "chain":
+                for name in self._chain_order(stored[-1] if stored else source, batch):
+                    if self._store_replica(name, key, data):
+                        stored.append(name)
+            else:
+                results = self._replica_pool.map(lambda name: self._store_replica(name, key, data), batch)
+                stored.extend(name for name, ok in zip(batch, results) if ok)
+        return stored
+
+    def rank_replicas(self, replicas: Iterable[str], source: Optional[str] = None) -> List[str]:
+        """Replicas in the order read_policy would try them; offline and unknown nodes are left out."""
+        live = [name for name in replicas if name in self.nodes and self.nodes[name].online]
+
+        def load(name: str) -> float:
+            # Expected wait: reads queued ahead of this one, scaled by the node's bandwidth
+            return (self._reads_in_flight[name] + 1) / (self.nodes[name].bandwidth or 1)
+
+        if self.read_policy == "nearest":
+            key = lambda name: (self.route_length(source, name), load(name), random.random())
+        else:
+            key = lambda name: (load(name), self.route_length(source, name), random.random())
+        return sorted(live, key=key)
+
+    def read_replica(self, key: str, replicas: Iterable[str], source: Optional[str] = None,
+                     expected_size: Optional[int] = None) -> Optional[bytes]:
+        """Read key from the best replica, falling back to the others; None if none has it intact."""
+        for name in self.rank_replicas(replicas, source):
+            data = self._read_from(name, key)
+            if data is not None and (expected_size is None or len(data) == expected_size):
+                return data
+            print(f"⚠️ Replica of {key} on {name} is unavailable, trying the next one")
+        return None
+
+    def _read_from(self, name: str, key: str) -> Optional[bytes]:
+        with self._load_lock:
+            self._reads_in_flight[name] += 1
+        try:
+            return self.nodes[name].read_chunk(key)
+        finally:
+            with self._load_lock:
+                self._reads_in_flight[name] -= 1
+
+    # ---------- Erasure-coded chunks (erasure.py) ----------
+    def write_fragments(self, key: str, fragments: Dict[int, bytes],
+                        candidates: Iterable[str]) -> Dict[int, Optional[str]]:
+        """
+        Store fragment i as key.i, each on its own candidate, all at once;
+        a fragment a candidate refuses moves to the next unused one. Returns
+        the node of each fragment (None where the candidates ran out).
+        """
+        placed: Dict[int, Optional[str]] = dict.fromkeys(fragments)
+        pending = list(fragments)
+        candidates = iter(candidates)
+        while pending:
+            batch = list(zip(pending, itertools.islice(candidates, len(pending))))
+            if not batch:
+                break
+            results = self._replica_pool.map(
+                lambda job: self._store_replica(job[1], f"{key}.{job[0]}", fragments[job[0]]), batch
+            )
+            for (i, name), ok in zip(batch, results):
+                if ok:
+                    placed[i] = name
+            pending = [i for i, name in placed.items() if name is None]
+        return placed
+
+    def read_fragments(self, key: str, nodes: Sequence[Optional[str]], needed: int,
+                       expected_size: Optional[int] = None) -> Dict[int, bytes]:
+        """
+        Read needed fragments of key in parallel, lowest numbers (the data
+        fragments) first, starting another whenever one is unavailable.
+        Returns fragment number -> bytes; fewer than needed if too many are lost.
+        """
+        live = [i for i, name in enumerate(nodes)
+                if name in self.nodes and self.nodes[name].online]
+        got: Dict[int, bytes] = {}
+        running: Dict[Future, int] = {}
+        while len(got) < needed and (live or running):
+            while live and len(got) + len(running) < needed:
+                i = live.pop(0)
+                running[self._replica_pool.submit(self._read_from, nodes[i], f"{key}.{i}")] = i
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                data = future.result()
+                if data is not None and (expected_size is None or len(data) == expected_size):
+                    got[i] = data
+                else:
+                    print(f"⚠️ Fragment {i} of {key} on {nodes[i]} is unavailable")
+        return got
+
     def get_network_stats(self) -> Dict[str, float]:
         total_bandwidth = sum(n.bandwidth for n in self.nodes.values()) or 1
         used_bandwidth = sum(n.network_utilization for n in self.nodes.values())
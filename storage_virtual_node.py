@@ -8,6 +8,7 @@ import hashlib
 from ipaddress import IPv4Address
 from network_card import NetworkCard
 from storage_disk import StorageDisk
+from compression import CompressionPolicy
 
 class TransferStatus(Enum):
     PENDING = auto()
@@ -35,7 +36,8 @@ class FileTransfer:
 
 class StorageVirtualNode:
     def __init__(self, node_id: str, cpu_capacity: int,
-                 memory_capacity: int, storage_capacity_mb: int, bandwidth: int):
+                 memory_capacity: int, storage_capacity_mb: int, bandwidth: int,
+                 disk: Optional[StorageDisk] = None):
         self.node_id = node_id
         self.cpu_capacity = cpu_capacity
 
@@ -48,11 +50,12 @@ class StorageVirtualNode:
         self.memory_capacity = memory_capacity
         self.bandwidth = bandwidth * 1000000  # Mbps → bps
 
-        # Attach a virtual disk
-        self.disk = StorageDisk(
+        # Attach a virtual disk (or the one given, e.g. by placement.py)
+        self.disk = disk or StorageDisk(
             disk_size_mb=storage_capacity_mb,
             disk_type="SSD",  # you can vary this per node
-            mount_path=f"./{self.node_id}_disk"
+            mount_path=f"./{self.node_id}_disk",
+            compression=CompressionPolicy.from_env()  # STORAGE_COMPRESSION, off by default
         )
 
         # Current utilization & transfers
@@ -72,6 +75,12 @@ class StorageVirtualNode:
         self._threads: List[threading.Thread] = []
         self._stop_event = threading.Event()
 
+        # Chunk I/O: an offline node refuses it; with simulate_bandwidth each
+        # chunk holds the node's link for size / bandwidth, one at a time.
+        self.online = True
+        self.simulate_bandwidth = False
+        self._link = threading.Lock()
+
     # ---------- Network ----------
     def add_connection(self, node_id: str, bandwidth: int):
         self.connections[node_id] = bandwidth * 1000000
@@ -91,7 +100,11 @@ class StorageVirtualNode:
         }
 
     def finalize_file_transfer(self, transfer: FileTransfer):
-        """Store the completed file into this node's disk."""
+        """
+        Store the completed file into this node's disk. A simulated transfer
+        carries no real bytes to check against its chunks; the disk's checksum
+        sidecar covers the stored file from here on (see scrubber.py).
+        """
         fake_data = b"0" * transfer.total_size
         success = self.disk.store_file(transfer.file_name, fake_data)
 
@@ -107,6 +120,39 @@ class StorageVirtualNode:
             self.failed_transfers += 1
             print(f"[{self.node_id} | {self.ip}] Failed to store file ❌ {transfer.file_id} (not enough space)")
 
+    # ---------- Chunk storage (placement.py) ----------
+    def _occupy_link(self, size: int):
+        if self.simulate_bandwidth and self.bandwidth:
+            with self._link:
+                self.network_utilization = self.bandwidth
+                time.sleep(size * 8 / self.bandwidth)
+                self.network_utilization = 0
+
+    def store_chunk(self, chunk_name: str, data: bytes) -> bool:
+        """Write one chunk of a stored blob to this node's disk; False if offline or the disk is full."""
+        if not self.online:
+            return False
+        self._occupy_link(len(data))
+        if not self.disk.store_file(chunk_name, data):
+            self.failed_transfers += 1
+            return False
+        self.total_requests_processed += 1
+        self.total_data_transferred += len(data)
+        return True
+
+    def read_chunk(self, chunk_name: str) -> Optional[bytes]:
+        if not self.online:
+            return None
+        data = self.disk.retrieve_file(chunk_name)
+        if data is not None:
+            self._occupy_link(len(data))
+            self.total_requests_processed += 1
+            self.total_data_transferred += len(data)
+        return data
+
+    def delete_chunk(self, chunk_name: str) -> int:
+        return self.disk.delete_file(chunk_name)
+
     # ---------- Autonomous behaviors ----------
     def listen_network(self):
         while not self._stop_event.is_set():
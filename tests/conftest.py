@@ -0,0 +1,18 @@
+# tests/conftest.py
+"""
+The modules live at the repository root and import each other by bare name;
+tests run them against a throwaway SQLite database in a temporary working
+directory (auth_server keeps its storage/ relative to the cwd).
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="marketcloud-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}")
+os.environ.setdefault("OTP_MAIL_SINK", "local")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.chdir(WORK_DIR)
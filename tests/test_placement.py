@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+
+from erasure import erasure_code
+from placement import ChunkPlacement, parse_chunk_name
+from storage_disk import StorageDisk
+from storage_virtual_network import StorageVirtualNetwork
+from storage_virtual_node import StorageVirtualNode
+
+
+def build_placement(nodes: int, workers: int) -> ChunkPlacement:
+    root = tempfile.mkdtemp(prefix="placement-")
+    network = StorageVirtualNetwork(replication_factor=nodes)
+    for i in range(nodes):
+        name = f"node{i}"
+        network.add_node(StorageVirtualNode(name, cpu_capacity=4, memory_capacity=16, storage_capacity_mb=64,
+                                            bandwidth=1000, disk=StorageDisk(64, "SSD", os.path.join(root, name))))
+    return ChunkPlacement(network, chunk_size=1024, workers=workers)
+
+
+def store(placement: ChunkPlacement, digest: str, chunks: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="blob-"), "blob")
+    with open(path, "wb") as f:
+        f.write(os.urandom(chunks * placement.chunk_size))
+    return placement.write(path, digest)
+
+
+def encode_within(placement, digest, locations, rs, timeout=30.0):
+    """Run encode() on another thread; the exception it raised, or None."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = placement.encode(digest, locations, rs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "encode() hung"
+    return outcome.get("error")
+
+
+def test_encode_refuses_a_code_wider_than_the_cluster():
+    placement = build_placement(nodes=4, workers=16)
+    locations = store(placement, "a" * 64, chunks=40)
+    error = encode_within(placement, "a" * 64, locations, erasure_code("rs:6+3"))
+    assert isinstance(error, OSError)
+
+
+def test_encode_cleans_up_when_more_chunks_fail_than_there_are_workers():
+    placement = build_placement(nodes=9, workers=4)
+    digest = "b" * 64
+    locations = store(placement, digest, chunks=40)
+    for name in ("node0", "node1", "node2", "node3", "node4"):
+        placement.network.nodes[name].online = False
+    error = encode_within(placement, digest, locations, erasure_code("rs:6+3"))
+    assert isinstance(error, OSError)
+    for name in ("node5", "node6", "node7", "node8"):
+        disk = placement.network.nodes[name].disk
+        fragments = [parsed for parsed in map(parse_chunk_name, os.listdir(disk.mount_path))
+                     if parsed is not None and parsed[2] is not None]
+        assert fragments == []
+
+
+def test_encode_places_every_fragment():
+    placement = build_placement(nodes=9, workers=4)
+    digest = "c" * 64
+    locations = store(placement, digest, chunks=8)
+    rs = erasure_code("rs:6+3")
+    assert encode_within(placement, digest, locations, rs) is None
+    encoded = placement.encode(digest, locations, rs)
+    assert all(code == str(rs) and None not in nodes for _, nodes, _, _, code in encoded)
@@ -0,0 +1,84 @@
+# tests/test_quota.py
+import uuid
+
+import grpc
+import pytest
+
+import auth_pb2
+import models
+import quota
+from models import User, session_scope
+
+models.init_db()
+
+
+@pytest.fixture
+def user():
+    """A user with a 1000-byte quota, none of it used."""
+    with session_scope() as db:
+        row = User(email=f"{uuid.uuid4().hex}@test", password_hash="x", quota_bytes=1000, used_bytes=0)
+        db.add(row)
+        db.commit()
+        return row.id, row.email
+
+
+def used_bytes(user_id: int) -> int:
+    with session_scope() as db:
+        return db.get(User, user_id).used_bytes
+
+
+def test_reserve_rejects_negative_size(user):
+    user_id, _ = user
+    with session_scope() as db:
+        with pytest.raises(ValueError):
+            quota.reserve(db, user_id, -10 ** 9)
+    assert used_bytes(user_id) == 0
+
+
+def test_grow_rejects_negative_size(user):
+    user_id, _ = user
+    with session_scope() as db:
+        reservation = quota.reserve(db, user_id, 100)
+        db.commit()
+        with pytest.raises(ValueError):
+            quota.grow(db, reservation, -10 ** 9)
+    assert used_bytes(user_id) == 100
+
+
+def test_reserve_stays_within_quota(user):
+    user_id, _ = user
+    with session_scope() as db:
+        assert quota.reserve(db, user_id, 900) is not None
+        assert quota.reserve(db, user_id, 900) is None
+        db.commit()
+    assert used_bytes(user_id) == 900
+
+
+def test_upload_with_negative_total_size_is_rejected(user):
+    import auth_server
+    auth_server.init()
+    user_id, email = user
+    messages = iter([auth_pb2.FileChunkRequest(email=email, filename="a.bin", data=b"x", total_size=-10 ** 9)])
+    with pytest.raises(auth_server.RpcAbort) as aborted:
+        auth_server._upload_stream(messages)
+    assert aborted.value.code == grpc.StatusCode.INVALID_ARGUMENT
+    assert used_bytes(user_id) == 0
+
+    # The quota still holds for the uploads that follow
+    for _ in range(2):
+        auth_server._upload_stream(iter([
+            auth_pb2.FileChunkRequest(email=email, filename=f"{uuid.uuid4().hex}.bin", data=b"x" * 900,
+                                      total_size=900)
+        ]))
+    assert used_bytes(user_id) <= 1000
+
+
+def test_upload_cut_short_is_not_stored(user):
+    import auth_server
+    auth_server.init()
+    user_id, email = user
+    response = auth_server._upload_stream(iter([
+        auth_pb2.FileChunkRequest(email=email, filename="short.bin", data=b"x" * 100, total_size=500)
+    ]))
+    assert not response.success
+    assert used_bytes(user_id) == 0
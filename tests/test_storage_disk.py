@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import pytest
+
+from compression import Codec, CompressionPolicy
+from storage_disk import COMPRESSED_SUFFIX, StorageDisk
+
+DATA = b"the quick brown fox jumps over the lazy dog\n" * 20000
+
+
+@pytest.fixture(params=["zlib", "lzma"])
+def disk(request):
+    disk = StorageDisk(64, "SSD", tempfile.mkdtemp(prefix="disk-"),
+                       compression=CompressionPolicy(Codec.parse(request.param), frame_size=64 * 1024))
+    assert disk.store_file("blob", DATA)
+    assert os.path.exists(stored(disk))
+    return disk
+
+
+def stored(disk: StorageDisk) -> str:
+    return os.path.join(disk.mount_path, "blob" + COMPRESSED_SUFFIX)
+
+
+def test_intact_file_verifies(disk):
+    assert disk.verify_file("blob") is True
+
+
+def test_corrupt_frame_is_reported(disk):
+    with open(stored(disk), "r+b") as f:
+        f.seek(64)
+        f.write(b"\xff" * 64)
+    assert disk.verify_file("blob") is False
+
+
+@pytest.mark.parametrize("keep", [0, 10, 30, 200])
+def test_truncated_file_is_reported(disk, keep):
+    with open(stored(disk), "r+b") as f:
+        f.truncate(keep)
+    assert disk.verify_file("blob") is False
+
+
+def test_missing_file_is_unverified(disk):
+    os.remove(stored(disk))
+    assert disk.verify_file("blob") is None
@@ -0,0 +1,76 @@
+# ttl_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Per-user cache of read-only values that expire after ttl seconds.
+    invalidate(user) drops everything cached for that user and bumps its
+    generation; set() only stores a value fetched under the current
+    generation, so a response that raced an invalidation is never cached.
+    At most max_users users are kept, least recently used evicted first.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+
+        self.hits = 0
+        self.misses = 0
+
+        # user -> [generation, {key: (expires_at, value)}]
+        self._users: "OrderedDict[str, list]" = OrderedDict()
+        self._next_generation = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, user: str) -> list:
+        entry = self._users.get(user)
+        if entry is None:
+            self._next_generation += 1
+            entry = self._users[user] = [self._next_generation, {}]
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user)
+        return entry
+
+    def generation(self, user: str) -> int:
+        """Take before fetching a value; pass to set() afterwards."""
+        with self._lock:
+            return self._entry(user)[0]
+
+    def get(self, user: str, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._users.get(user)
+            item: Optional[Tuple[float, Any]] = entry[1].get(key) if entry else None
+            if item is None or item[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._users.move_to_end(user)
+            self.hits += 1
+            return item[1]
+
+    def set(self, user: str, key: Hashable, value: Any, generation: int):
+        with self._lock:
+            entry = self._users.get(user)
+            # Gone (evicted/cleared) or invalidated since generation() was taken
+            if entry is None or entry[0] != generation:
+                return
+            entry[1][key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, user: str):
+        with self._lock:
+            if user in self._users:
+                self._next_generation += 1
+                self._users[user] = [self._next_generation, {}]
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"users": len(self._users), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,161 @@
+# upload_sessions.py
+"""
+Staged chunks of resumable upload sessions, and expiry of abandoned ones.
+
+CreateUploadSession opens a transfers row with status "in_progress".
+PutChunk streams each chunk into a private temp file and only once it is
+complete renames it to <session>.<index>.chunk and records its sha256 in
+a chunks row, both under the transfer's row lock, so a failed or retried
+PutChunk never touches a chunk already received. CommitUpload claims the
+session ("committing"), then assemble() re-hashes every chunk against its
+row while it builds the file; chunks that no longer match are dropped and
+the session reopened for them to be sent again.
+
+Sessions nobody commits keep their chunk files and quota reservation
+until the SessionReaper expires them: every interval it marks the open
+sessions older than ttl "expired", releases their reservations and
+deletes their files.
+
+    UPLOAD_SESSION_TTL            seconds a session may stay open
+                                  (default QUOTA_SESSION_RESERVATION_TTL)
+    UPLOAD_SESSION_REAP_INTERVAL  seconds between expiry passes (default 3600, 0 = off)
+"""
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+
+import quota
+from models import Chunk, Transfer, session_scope
+
+# A committing session's claim is dropped by reopen(), or by expiry if its server died
+OPEN_STATUSES = ("in_progress", "committing")
+
+READ_SIZE = 1024 * 1024
+
+
+def chunk_path(directory: str, session_id: int, index: int) -> str:
+    return os.path.join(directory, f"{session_id}.{index}.chunk")
+
+
+def stage_chunk(directory: str, session_id: int, index: int) -> Tuple[int, str]:
+    """mkstemp() for a chunk being received; discard() also finds it if the stream is abandoned."""
+    return tempfile.mkstemp(dir=directory, prefix=f".{session_id}.{index}.", suffix=".part")
+
+
+def discard(directory: str, session_id: int):
+    """Delete every file a session left: its chunks and any chunk still being received."""
+    for path in (glob.glob(os.path.join(directory, f"{session_id}.*"))
+                 + glob.glob(os.path.join(directory, f".{session_id}.*"))):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def assemble(directory: str, session_id: int, checksums: Dict[int, str],
+             out_dir: str) -> Tuple[Optional[str], str, List[int]]:
+    """
+    Concatenate a session's chunks into a new file in out_dir, checking each
+    against the sha256 its chunks row recorded. Returns (path, sha256 of the
+    whole file, []), or (None, "", indexes of the chunks that are missing or
+    do not match).
+    """
+    fd, path = tempfile.mkstemp(dir=out_dir, suffix=".part")
+    file_hash = hashlib.sha256()
+    corrupt = []
+    with os.fdopen(fd, "wb") as out:
+        for index in range(len(checksums)):
+            chunk_hash = hashlib.sha256()
+            try:
+                with open(chunk_path(directory, session_id, index), "rb") as f:
+                    for data in iter(lambda: f.read(READ_SIZE), b""):
+                        chunk_hash.update(data)
+                        if not corrupt:
+                            out.write(data)
+                            file_hash.update(data)
+            except FileNotFoundError:
+                corrupt.append(index)
+                continue
+            if chunk_hash.hexdigest() != checksums.get(index):
+                corrupt.append(index)
+    if corrupt:
+        os.remove(path)
+        return None, "", corrupt
+    return path, file_hash.hexdigest(), []
+
+
+# ---------- Session state (caller commits) ----------
+def reopen(db: Session, session_id: int):
+    """Give a claimed session back to its client, e.g. after a failed CommitUpload."""
+    db.execute(update(Transfer).where(Transfer.id == session_id, Transfer.status == "committing")
+               .values(status="in_progress"))
+
+
+def expire(db: Session, cutoff: datetime) -> List[int]:
+    """
+    Mark the open sessions created before cutoff "expired", dropping their
+    chunks rows and reservations; returns their ids for discard() once committed.
+    """
+    ids = db.execute(
+        select(Transfer.id).where(Transfer.status.in_(OPEN_STATUSES), Transfer.created_at < cutoff)
+        .with_for_update()
+    ).scalars().all()
+    if not ids:
+        return []
+    for session_id in ids:
+        reservation = quota.session_reservation(db, session_id)
+        if reservation is not None:
+            quota.release(db, reservation)
+    db.execute(delete(Chunk).where(Chunk.transfer_id.in_(ids)))
+    db.execute(update(Transfer).where(Transfer.id.in_(ids)).values(status="expired"))
+    return ids
+
+
+class SessionReaper:
+    """Runs run_once() every interval seconds on a daemon thread."""
+
+    def __init__(self, directory: str, ttl: float = quota.SESSION_RESERVATION_TTL, interval: float = 3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, directory: str) -> "SessionReaper":
+        return cls(directory,
+                   ttl=float(os.getenv("UPLOAD_SESSION_TTL", str(quota.SESSION_RESERVATION_TTL))),
+                   interval=float(os.getenv("UPLOAD_SESSION_REAP_INTERVAL", "3600")))
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="session-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run_once(self) -> int:
+        with session_scope() as db:
+            expired = expire(db, datetime.utcnow() - timedelta(seconds=self.ttl))
+            db.commit()
+        for session_id in expired:
+            discard(self.directory, session_id)
+        if expired:
+            logging.info("Expired %d abandoned upload sessions", len(expired))
+        return len(expired)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Upload session expiry failed")
@@ -9,9 +9,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-def hash_password(password: str) -> str:
-    """Hash a password with bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password(password: str, rounds: int = 12) -> str:
+    """Hash a password with bcrypt at the given cost (log2 rounds)."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
 def check_password(password: str, hashed: str) -> bool:
     """Verify a password against its hash."""
@@ -21,14 +21,8 @@ def generate_otp() -> str:
     """Generate a random 6-digit OTP."""
     return str(random.randint(100000, 999999))
 
-def send_otp(to_email: str, otp: str) -> bool:
-    """Send OTP via Gmail SMTP using environment variables."""
-    from_email = os.getenv("GMAIL_SENDER")      # e.g. your Gmail address
-    from_password = os.getenv("GMAIL_APP_PWD")  # your Gmail app password
-
-    if not from_email or not from_password:
-        raise RuntimeError("Set GMAIL_SENDER and GMAIL_APP_PWD environment variables")
-
+def build_otp_message(to_email: str, otp: str, from_email: str) -> MIMEMultipart:
+    """Build the OTP email."""
     subject = "Your OTP Code for the Cloud Security Simulator"
     body = f"Your OTP code is: {otp}\nThis code expires in 5 minutes."
 
@@ -37,6 +31,17 @@ def send_otp(to_email: str, otp: str) -> bool:
     msg['To'] = to_email
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def send_otp(to_email: str, otp: str) -> bool:
+    """Send OTP via Gmail SMTP using environment variables (one connection per call, see mail_queue.py)."""
+    from_email = os.getenv("GMAIL_SENDER")      # e.g. your Gmail address
+    from_password = os.getenv("GMAIL_APP_PWD")  # your Gmail app password
+
+    if not from_email or not from_password:
+        raise RuntimeError("Set GMAIL_SENDER and GMAIL_APP_PWD environment variables")
+
+    msg = build_otp_message(to_email, otp, from_email)
 
     try:
         with smtplib.SMTP('smtp.gmail.com', 587) as server: